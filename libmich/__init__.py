@@ -25,10 +25,10 @@ Provides "utils" directory with:
 - CRC32C: function to compute CRC-32C checksum, taken from google code
 - DH: class to compute Diffe-Hellman keys, taken from the python OpenID project
 - PRF1862: class to compute NIST 186-2 pseudo random generation, derived from SHA1.py
-- inet: IP / TCP checksum routines, taken from scapy
+- inet: IP / TCP checksum routines, taken from scapy, with incremental update and batch computation
 - conv: routines for converting network addresses
 - perf: tests for checking execution at parsing / building messages, with time measurement
-- CrcMoose: large sets of CRC checksums, taken from the Ray Burr on the Internet (but not use in any part of the project, yet)
+- CrcMoose: large sets of CRC checksums, taken from the Ray Burr on the Internet, computed with cached tables (also used by CRC16)
 - IntEncoder: returns encoding format required for integral values (used in asn1)
 - repr: contains functions (originally in core/element) to print elements in various ways (show, hex, bin, ...)
 - pointer: to handle reference in a dynamic way with Python dict
@@ -55,11 +55,12 @@ Provides "formats" repo with:
 - EAPAKA: EAP-SIM (RFC 4186) and EAP-AKA (RFC 4187) messages formats with some crypto automation
 - IKEv2: IKEv2 (RFC 5996) messages format with some crypto automation
 - IP: Ethernet, 8021Q, IPv4, IPv6, TCP and UDP headers format
+- dissect: header-only fast dissector for Ethernet / 8021Q / IPv4 / IPv6 / UDP / TCP / GTP-U packets
 - PPP: few Point-to-Point Protocol headers format
 - RTP: Real-Time Protocol headers format
-- SCTP: SCTP (RFC 4960) headers and messages format
+- SCTP: SCTP (RFC 4960) headers and messages format, zero-copy chunk iterator, and association reassembly for captured traffic
 - SIGTRAN: M2UA (RFC 3331), M3UA (RFC 4666) and SUA (RFC 3868) basic header format implementation
-- TLS: TLS (RFC 5246) basic messages format without crypto support
+- TLS: TLS (RFC 5246) basic messages format without crypto support, and streaming record and handshake parser for captured TCP streams
 # mobile-oriented protocols:
 - GTP: GTPv1 and GTPv2 signalling messages and user-plane headers format (TS 29.060 and 29.281)
 - L1CTL: wrapper for L1CTL protocol from libosmocore, as used in osmocom-bb serial communication
@@ -95,7 +96,7 @@ Provides "formats" repo with:
 - JPEG: image container format
 - MPEG2: transport stream format
 - MPEG4: stream container format
-- pcap: pcap and gsmtap headers format
+- pcap: pcap and gsmtap headers format, and streaming pcap / pcapng reader
 - PNG: image container format
 
 Provides "mobnet" repo with some core-network features:
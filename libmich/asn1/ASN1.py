@@ -32,6 +32,8 @@ except:
     log('libmich module unavailable: encoding / decoding will not work')
 else:
     Layer._byte_aligned = False
+from threading import local, Lock
+from libmich.utils.cache import LRUCache, copy_val
 from utils import *
 import parsers
 
@@ -188,6 +190,10 @@ class ASN1Obj(object):
     
     - msg: libmich Layer, or None; it stores the transfer message structure,
         ready to be sent over the wire.
+    
+    When an ASN1Ctx context is active, val, msg and codec (and cont, which 
+    is changed when decoding OPEN TYPE and CONTAINING objects) are stored
+    into the context instead of the ASN1Obj, see ASN1Ctx.
     '''
     # this adds verbosity on encoding / decoding objects
     #_DEBUG = 1
@@ -206,6 +212,13 @@ class ASN1Obj(object):
     
     # CODEC for encoding / decoding ASN.1 transfer messages
     CODEC = None
+    # LRUCache for decoded values, keyed by ASN1Obj, CODEC, variant and 
+    # buffer (e.g. LRUCache(num=1024, size=1<<20)), for all ASN1Obj or for 
+    # a given one; the libmich message structure set in ._msg is shared 
+    # with the cache and must not be changed; on a cache hit, only ._val and
+    # ._msg of the ASN1Obj decoded are set, its components keep the state of
+    # their last actual decoding
+    _DEC_CACHE = None
     
     # the following attributes are used to store 
     # textual assignment collected from the ASN.1 module:
@@ -407,6 +420,12 @@ class ASN1Obj(object):
         if isinstance(val, str):
             # passing a raw string
             self._val = val
+        elif isinstance(val, ASN1Lazy):
+            # lazily decoded value: passed through as long as not accessed
+            if val.resolved:
+                self._set_val_open((val.name, val.get()))
+            else:
+                self._val = val
         elif isinstance(val, tuple) and len(val) == 2 and val[0] in GLOBAL.TYPE:
             # passing a reference to an ASN1Obj internal structure:
             # ASN1Obj name as val[0]
@@ -582,22 +601,56 @@ class ASN1Obj(object):
     #--------------------------------------------------------------------------#
     # encoding / decoding
     #--------------------------------------------------------------------------#
-    def encode(self, val=None, **kwargs):
+    def encode(self, val=None, ctx=None, **kwargs):
+        if ctx is not None:
+            # encode within the given context
+            with ctx:
+                return self.encode(val, **kwargs)
+        ctx = _CTX.cur
+        if ctx is not None and ctx._begin(self):
+            # top-level encoding within the active context
+            try:
+                return self.encode(val, **kwargs)
+            finally:
+                ctx._end(self)
         if self._RAISE_SILENTLY:
             RAISED.set = False
         if self._SAFE:
-            if self.CODEC is None \
-            or not hasattr(self.CODEC, '_name') \
-            or self.CODEC._name not in ('PER', 'BER') \
-            or not issubclass(self.CODEC, ASN1Codec):
-                raise(ASN1_OBJ('%s: invalid encoder defined: %s' 
-                      % (self.get_fullname(), self.CODEC)))
+            self._check_codec('encoder')
         if val is not None:
             self.set_val(val)
         self._encode(**kwargs)
         if self._RET_STRUCT:
             return self._msg
     
+    def _check_codec(self, kind='encoder'):
+        CODEC = self._get_codec()
+        if CODEC is None \
+        or not hasattr(CODEC, '_name') \
+        or CODEC._name not in ('PER', 'BER') \
+        or not issubclass(CODEC, ASN1Codec):
+            raise(ASN1_OBJ('%s: invalid %s defined: %s' 
+                  % (self.get_fullname(), kind, CODEC)))
+    
+    def _get_codec(self):
+        # returns the codec class, potentially overridden by the context
+        ctx = _CTX.cur
+        if ctx is not None and ctx.CODEC is not None:
+            return ctx.CODEC
+        return self.CODEC
+    
+    def _new_codec(self):
+        ctx = _CTX.cur
+        if ctx is None:
+            return self.CODEC()
+        if ctx.CODEC is not None:
+            codec = ctx.CODEC()
+        else:
+            codec = self.CODEC()
+        if ctx.VARIANT is not None:
+            codec.VARIANT = ctx.VARIANT
+        return codec
+    
     def _encode(self, **kwargs):
         self._msg = Layer(self.get_name())
         #
@@ -607,12 +660,12 @@ class ASN1Obj(object):
             self._not_encoded = 1
             return
         #
-        self._codec = self.CODEC()
+        self._codec = self._new_codec()
         if self._RAISE_SILENTLY:
             if not RAISED.set:
                 try:
                     self._codec.encode(self, **kwargs)
-                except self.CODEC._enc_err:
+                except self._codec._enc_err:
                     RAISED.set = True
                     log('-- encoding error --')
         else:
@@ -620,30 +673,77 @@ class ASN1Obj(object):
         if self._DEBUG:
             log('encode: %s, %s' % (self.get_fullname(), hex(self)))
     
-    def decode(self, buf='', **kwargs):
+    def decode(self, buf='', ctx=None, select=None, **kwargs):
+        '''
+        decodes buf into the ASN1Obj value
+        
+        ctx: ASN1Ctx, to decode within this context
+        select: list of paths of components' names, e.g. 
+            [('initiatingMessage', 'procedureCode'), ...], to decode only 
+            the selected components; OPEN TYPE, extended and CONTAINING 
+            components which are not on a selected path are then not 
+            decoded, but returned as str buffers.
+            OPEN TYPE contents are selected with the name of their type, 
+            CHOICE alternatives with their name, and "*" selects any 
+            content or alternative; SEQUENCE OF items are selected with the
+            path of the SEQUENCE OF itself.
+            Only supported by the PER decoder.
+        '''
+        if ctx is not None:
+            # decode within the given context
+            with ctx:
+                return self.decode(buf, select=select, **kwargs)
+        ctx = _CTX.cur
+        if ctx is not None and ctx._begin(self):
+            # top-level decoding within the active context
+            try:
+                return self.decode(buf, select=select, **kwargs)
+            finally:
+                ctx._end(self)
+        if select is not None:
+            kwargs['select'] = make_select(select)
         if self._RAISE_SILENTLY:
             RAISED.set = False
         if self._SAFE:
-            if self.CODEC is None \
-            or not hasattr(self.CODEC, '_name') \
-            or self.CODEC._name not in ('PER', 'BER') \
-            or not issubclass(self.CODEC, ASN1Codec):
-                raise(ASN1_OBJ('%s: invalid decoder defined: %s' 
-                      % (self.get_fullname(), self.CODEC)))
-        buf = self._decode(buf, **kwargs)
+            self._check_codec('decoder')
+        if self._DEC_CACHE is not None and not kwargs:
+            self._decode_cached(buf)
+        else:
+            buf = self._decode(buf, **kwargs)
         if self._RET_STRUCT:
             return self._msg
     
+    def _decode_cached(self, buf):
+        # only the top-level value and message structure are restored on a
+        # hit: components are left as they are
+        CODEC = self._get_codec()
+        variant = getattr(CODEC, 'VARIANT', None)
+        if _CTX.cur is not None and _CTX.cur.VARIANT is not None:
+            variant = _CTX.cur.VARIANT
+        key = (self, CODEC, variant, getattr(CODEC, '_DEC_OPEN_LAZY', False), 
+               buf)
+        ent = self._DEC_CACHE.get(key)
+        if ent is None:
+            self._decode(buf)
+            if self._RAISE_SILENTLY and RAISED.set:
+                return
+            ent = (self._val, self._msg)
+            self._DEC_CACHE.set(key, ent, len(buf))
+        else:
+            self._msg = ent[1]
+        # the cached value is never returned itself, but copied
+        self._val = copy_val(ent[0])
+    
     def _decode(self, buf, **kwargs):
         if self._DEBUG >= 2:
             log('buf: %s' % buf.encode('hex'))
         self._msg = Layer(self.get_name())
-        self._codec = self.CODEC()
+        self._codec = self._new_codec()
         if self._RAISE_SILENTLY:
             if not RAISED.set:
                 try:
                     buf = self._codec.decode(self, buf, **kwargs)
-                except self.CODEC._dec_err:
+                except self._codec._dec_err:
                     RAISED.set = True
                     log('-- decoding error --')
         else:
@@ -919,6 +1019,31 @@ class ASN1Obj(object):
         elif self._type == TYPE_SEQ:
             self._cont_tags = []
             self._build_seq_cont_tags(self._cont_tags, None)
+            # 5)
+            self._build_seq_cont_tags_ind()
+    
+    def _build_seq_cont_tags_ind(self):
+        # build _cont_tags_ind: a static dict of 
+        # {tag : list of (component index, names chain)},
+        # for the BER decoder to resolve components without walking
+        # through _cont_tags
+        ind = dict([(n, i) for i, n in enumerate(self._cont)])
+        self._cont_tags_ind = {}
+        for tag, chain in self._cont_tags:
+            if tag not in self._cont_tags_ind:
+                self._cont_tags_ind[tag] = []
+            self._cont_tags_ind[tag].append( (ind[chain[0]], chain) )
+    
+    def _share_constructed_rootext(self, orig):
+        # tables built from the content only hold components' names
+        # and tags, and can be shared with an object having the same content
+        if self._type == TYPE_SEQ and not hasattr(orig, '_cont_tags_ind'):
+            # SEQUENCE pickled by an older version of the compiler
+            orig._build_seq_cont_tags_ind()
+        for attr in ('_ext_flat', '_ext_group', '_root_comp', '_root_opt', 
+                     '_cont_tags', '_cont_tags_ind'):
+            if hasattr(orig, attr):
+                setattr(self, attr, getattr(orig, attr))
     
     def _build_set_cont_tags(self, tags={}, name_chain=[]):
         # _cont_tags is a dict
@@ -1568,17 +1693,107 @@ class ASN1Obj(object):
     # cloning recursive routine
     #--------------------------------------------------------------------------#
     def clone(self):
-        # cloning loses all references to external objects (e.g. typeref,
-        # global value / set, ...) as it is a complete hard copy of all objects
-        clone = ASN1Obj()
-        clone.from_dict( self.to_dict() )
-        if clone._type in (TYPE_SEQ, TYPE_SET, TYPE_CHOICE):
-            clone._build_constructed_rootext()
-        elif clone._type == TYPE_CLASS:
-            self._root_comp = self._cont.keys()
-            self._root_opt = []
+        # cloning makes a complete copy of the tree of ASN1Obj (parameters, 
+        # typeref, content, values), of the constraints and of the flags, but 
+        # shares all immutable attributes (name, tag, ext, syntax, content
+        # tables, ...) and the objects referenced from constraints
+        # (e.g. CONTAINING type, CLASS set)
+        clone = ASN1Obj.__new__(ASN1Obj)
+        clone._name = self._name
+        clone._mode = self._mode
+        # the parent is set by the parent's clone, for its content only
+        clone._parent = None
+        if self._param:
+            clone._clone_param(self._param)
+        else:
+            clone._param = self._param
+        clone._tag = self._tag
+        clone._type = self._type
+        if isinstance(self._typeref, ASN1ObjSelf) \
+        or (self._typeref is not None and self._typeref is self._parent):
+            # self-referencing component
+            clone._typeref = ASN1ObjSelf(name=self._typeref._name)
+        elif self._typeref is not None:
+            clone._typeref = self._typeref.clone()
+        else:
+            clone._typeref = None
+        clone._ext = self._ext
+        clone._group = self._group
+        clone._syntax = self._syntax
+        if self._cont is not None:
+            clone._clone_cont(self)
+        else:
+            clone._cont = None
+        clone._const = self._clone_const()
+        # values from types (mode 0) are not kept
+        if self._mode in (1, 2):
+            clone._val = self._clone_val(self._val)
+        else:
+            clone._val = None
+        if self._flags is not None:
+            clone._flags = dict(self._flags)
+            if FLAG_DEF in clone._flags:
+                clone._flags[FLAG_DEF] = self._clone_val(self._flags[FLAG_DEF])
+        else:
+            clone._flags = None
         return clone
     
+    def _clone_param(self, param):
+        self._param = OD()
+        for param_name in param:
+            if param[param_name]['type'] is not None:
+                param_type_clone = param[param_name]['type'].clone()
+            else:
+                param_type_clone = None
+            if param[param_name]['ref'] is not None:
+                param_ref_clone = [(list(p), b) for (p, b) \
+                                   in param[param_name]['ref']]
+            else:
+                param_ref_clone = None
+            self._param[param_name] = {'type':param_type_clone,
+                                       'ref':param_ref_clone}
+    
+    def _clone_cont(self, orig):
+        if self._type in (TYPE_CHOICE, TYPE_SEQ, TYPE_SET, TYPE_CLASS):
+            self._cont = OD()
+            for name in orig._cont:
+                self._cont[name] = orig._cont[name].clone()
+                self._cont[name]._parent = self
+                if isinstance(self._cont[name]._typeref, ASN1ObjSelf) \
+                and self not in GLOBAL.SELF:
+                    GLOBAL.SELF.append( self )
+            # cloned components have the same names and tags
+            if self._type == TYPE_CLASS:
+                self._root_comp = self._cont.keys()
+                self._root_opt = []
+            elif hasattr(orig, '_root_comp'):
+                self._share_constructed_rootext(orig)
+            else:
+                self._build_constructed_rootext()
+        elif self._type in (TYPE_SEQ_OF, TYPE_SET_OF):
+            self._cont = orig._cont.clone()
+            self._cont._parent = self
+        else:
+            # named numbers / bits
+            self._cont = orig._cont
+    
+    def _clone_const(self):
+        # constraints are copied, as parameters can be set into them,
+        # but not the objects they reference
+        return [dict(c) for c in self._const]
+    
+    def _clone_val(self, val):
+        if isinstance(val, dict):
+            return dict([(k, self._clone_val(v)) for (k, v) in val.items()])
+        elif isinstance(val, list):
+            return [self._clone_val(v) for v in val]
+        elif isinstance(val, tuple):
+            return tuple([self._clone_val(v) for v in val])
+        elif isinstance(val, ASN1Obj):
+            return val.clone()
+        else:
+            return val
+    
     def clone_light(self):
         # cloning lightly keeps all references from the original ASN1Obj
         # until they are changed (rebounded) explicitly in the clone
@@ -1598,7 +1813,11 @@ class ASN1Obj(object):
         clone._group = self._group
         clone._syntax = self._syntax
         if clone._type in (TYPE_SEQ, TYPE_SET, TYPE_CHOICE):
-            clone._build_constructed_rootext()
+            # the content is shared, so are the tables built from it
+            if hasattr(self, '_root_comp'):
+                clone._share_constructed_rootext(self)
+            else:
+                clone._build_constructed_rootext()
         elif clone._type == TYPE_CLASS:
             self._root_comp = self._cont.keys()
             self._root_opt = []
@@ -1607,7 +1826,7 @@ class ASN1Obj(object):
     def clone_const(self):
         # clone lightly the ASN1Obj, except for its constraints
         clone = self.clone_light()
-        clone._from_dict_const( self._to_dict_const() )
+        clone._const = self._clone_const()
         return clone
 
 # this is a trick to handle ASN.1 object self-reference:
@@ -1630,3 +1849,239 @@ class ASN1Codec(object):
         pass
     def decode(self, Obj, buf, **kwargs):
         pass
+
+#------------------------------------------------------------------------------#
+# encoding / decoding context
+#------------------------------------------------------------------------------#
+class _CtxLocal(local):
+    # per-thread stack of active contexts
+    def __init__(self):
+        self.cur = None
+        self.stack = []
+
+_CTX = _CtxLocal()
+# number of active contexts, for all threads
+_CTX_NUM = [0]
+_CTX_LOCK = Lock()
+# marker for attributes deleted within a context
+_CTX_DEL = object()
+
+def _ctx_property(name):
+    # ASN1Obj attribute stored in the active context, if any, and in the
+    # ASN1Obj itself otherwise
+    def fget(self):
+        ctx = _CTX.cur
+        if ctx is not None:
+            val = ctx._attr[name].get(self, _CTX_DEL)
+            if val is not _CTX_DEL:
+                return val
+            elif self in ctx._attr[name]:
+                raise(AttributeError(name))
+        try:
+            return self.__dict__[name]
+        except KeyError:
+            raise(AttributeError(name))
+    def fset(self, val):
+        ctx = _CTX.cur
+        if ctx is not None:
+            ctx._attr[name][self] = val
+            if ctx._set is not None:
+                ctx._set.add(self)
+        else:
+            self.__dict__[name] = val
+    def fdel(self):
+        ctx = _CTX.cur
+        if ctx is not None:
+            ctx._attr[name][self] = _CTX_DEL
+            if ctx._set is not None:
+                ctx._set.add(self)
+        else:
+            del self.__dict__[name]
+    return property(fget, fset, fdel)
+
+class ASN1Ctx(object):
+    '''
+    Encoding / decoding context
+    
+    When a context is active within a thread (inside a "with ctx:" block, 
+    or when passed as ctx argument to ASN1Obj.encode() / decode()), the 
+    ASN1Obj attributes listed in ATTR, which are changed when encoding 
+    and decoding, are read from and written to the context instead of the
+    ASN1Obj. Those attributes, when not set in the context, are read from
+    the ASN1Obj itself (e.g. values of ASN.1 value assignments).
+    
+    This way, ASN1Obj (e.g. from GLOBAL) are left unchanged and can be used 
+    to encode / decode concurrently by several threads, each one with its
+    own context.
+    
+    A context can also override the ASN1Obj.CODEC and its VARIANT.
+    
+    The attributes set during an encoding / decoding started within the 
+    context (and those of all ASN1Obj cloned for it) are released at the 
+    start of the next encoding / decoding of the same ASN1Obj, so that a 
+    context can be reused indefinitely. Attributes set otherwise (e.g. with
+    set_val() within a "with ctx:" block) are kept until clear() is called.
+    
+    >>> ctx = ASN1Ctx()
+    >>> PDU.decode(buf, ctx=ctx)
+    >>> with ctx:
+    ...     val = PDU()
+    ...     msg = PDU._msg
+    '''
+    ATTR = ('_val', '_msg', '_codec', '_cont', '_not_encoded')
+    
+    def __init__(self, CODEC=None, VARIANT=None):
+        self.CODEC = CODEC
+        self.VARIANT = VARIANT
+        self.clear()
+    
+    def clear(self):
+        '''
+        releases all attributes stored in the context
+        '''
+        self._attr = dict([(name, {}) for name in self.ATTR])
+        # ASN1Obj whose attributes were set, for each top-level ASN1Obj 
+        # encoded / decoded, and for the one being encoded / decoded
+        self._own = {}
+        self._set = None
+    
+    def _begin(self, obj):
+        # starts the top-level encoding / decoding of obj, if none is running
+        # releasing the attributes set by the previous one of obj
+        if self._set is not None:
+            return False
+        for o in self._own.pop(obj, ()):
+            for attr in self._attr.values():
+                if o in attr:
+                    del attr[o]
+        self._set = set()
+        return True
+    
+    def _end(self, obj):
+        self._own[obj] = self._set
+        self._set = None
+    
+    def get(self, obj, name='_val'):
+        '''
+        returns the attribute name of obj, as seen within the context
+        '''
+        with self:
+            return getattr(obj, name)
+    
+    def __enter__(self):
+        if not _CTX.stack:
+            with _CTX_LOCK:
+                if _CTX_NUM[0] == 0:
+                    _ctx_install()
+                _CTX_NUM[0] += 1
+        _CTX.stack.append(self)
+        _CTX.cur = self
+        return self
+    
+    def __exit__(self, *args):
+        _CTX.stack.pop()
+        if _CTX.stack:
+            _CTX.cur = _CTX.stack[-1]
+        else:
+            _CTX.cur = None
+            with _CTX_LOCK:
+                _CTX_NUM[0] -= 1
+                if _CTX_NUM[0] == 0:
+                    _ctx_uninstall()
+
+# context-dependent attributes are only turned into properties while 
+# contexts are active, so that ASN1Obj are not slowed down without context
+def _ctx_install():
+    for name in ASN1Ctx.ATTR:
+        setattr(ASN1Obj, name, _ctx_property(name))
+
+def _ctx_uninstall():
+    for name in ASN1Ctx.ATTR:
+        delattr(ASN1Obj, name)
+
+#------------------------------------------------------------------------------#
+# lazily decoded OPEN TYPE value
+#------------------------------------------------------------------------------#
+class ASN1Lazy(object):
+    '''
+    OPEN TYPE value, decoded on first access
+    
+    When the _DEC_OPEN_LAZY attribute of the codec is set, OPEN TYPE 
+    contents are not decoded: the decoder stores their buffer and the 
+    ASN1Obj of their type into an ASN1Lazy, which stands for the usual 
+    (type name, value) tuple. The type name is available directly, and the 
+    content is decoded (with the same codec and variant) on the first 
+    access to the value, e.g. lazy[1] or get().
+    
+    When encoded again while its value has never been accessed, the 
+    original buffer is passed through as is.
+    
+    >>> PER._DEC_OPEN_LAZY = True
+    >>> pdu.decode(buf)
+    >>> ie = pdu()[1]['value'][1]['protocolIEs'][0]['value']
+    >>> ie
+    ('ENB-UE-S1AP-ID', <lazy: 2 bytes>)
+    >>> ie[1]
+    1
+    '''
+    __slots__ = ('name', 'buf', 'resolved', '_obj', '_codec', '_variant', 
+                 '_val')
+    
+    def __init__(self, obj, buf, codec):
+        self.name = obj._name
+        self.buf = buf
+        self.resolved = False
+        if '_cont' not in obj.__dict__:
+            # obj was created within a context (e.g. when resolving another
+            # ASN1Lazy), its content is required out of this context
+            obj.__dict__['_cont'] = obj._cont
+        self._obj = obj
+        self._codec = codec.__class__
+        self._variant = getattr(codec, 'VARIANT', None)
+        self._val = None
+    
+    def get(self):
+        '''
+        returns the value of the content, decoding it if required
+        '''
+        if not self.resolved:
+            ctx = ASN1Ctx(CODEC=self._codec, VARIANT=self._variant)
+            self._obj.decode(self.buf, ctx=ctx)
+            self._val = ctx.get(self._obj)
+            self._obj = None
+            self.resolved = True
+        return self._val
+    
+    def __len__(self):
+        return 2
+    
+    def __getitem__(self, i):
+        if i in (0, -2):
+            return self.name
+        return (self.name, self.get())[i]
+    
+    def __iter__(self):
+        yield self.name
+        yield self.get()
+    
+    def __eq__(self, other):
+        return (self.name, self.get()) == other
+    
+    def __ne__(self, other):
+        return not self.__eq__(other)
+    
+    __hash__ = None
+    
+    def __copy__(self):
+        # shares the buffer, and copies the value when already decoded
+        new = ASN1Lazy.__new__(ASN1Lazy)
+        new.name, new.buf, new.resolved = self.name, self.buf, self.resolved
+        new._obj, new._codec, new._variant = self._obj, self._codec, \
+                                             self._variant
+        new._val = copy_val(self._val)
+        return new
+    
+    def __repr__(self):
+        if self.resolved:
+            return repr((self.name, self._val))
+        return '(%s, <lazy: %i bytes>)' % (repr(self.name), len(self.buf))
@@ -27,8 +27,11 @@
 #*/
 
 # export filter
-__all__ = ['BER', 'T', 'L', 'BER_TLV']
+__all__ = ['BER', 'T', 'L', 'BER_TLV', 'tlv_hdr', 'tlv_end', 'scan_tlv', 
+           'iter_tlv', 'mmap_file']
 
+import mmap
+#
 from libmich.core.element import Element, Str, Int, Bit, Layer, show
 from libmich.core.shtr import shtr
 from libmich.utils.IntEncoder import *
@@ -307,6 +310,158 @@ class BER_TLV(Layer):
         # returns the length parsed
         return L
 
+#------------------------------------------------------------------------------#
+# BER streaming scanner
+#------------------------------------------------------------------------------#
+# those functions only read tags and lengths, without building any Layer,
+# so that they can go through very large buffers (e.g. mmap'd files)
+# without copying them
+
+def tlv_hdr(buf, off=0):
+    '''
+    parses the BER tag and length at offset off in buf (str or mmap)
+    
+    returns (tag class, tag, constructed flag, value offset, value length),
+    value length being -1 for the indefinite form
+    '''
+    start = off
+    try:
+        b = ord(buf[off])
+        cla, pc, tag = b>>6, (b>>5)&1, b&0x1f
+        off += 1
+        if tag == 0x1f:
+            # long form tag
+            tag = 0
+            b = ord(buf[off])
+            off += 1
+            while b & 0x80:
+                tag = (tag<<7) + (b&0x7f)
+                b = ord(buf[off])
+                off += 1
+            tag = (tag<<7) + b
+        b = ord(buf[off])
+        off += 1
+        if b < 0x80:
+            return cla, tag, pc, off, b
+        elif b == 0x80:
+            if not pc:
+                raise(ASN1_BER_DECODER('indefinite length for primitive TLV '\
+                      'at offset %i' % start))
+            return cla, tag, pc, off, -1
+        elif b == 0xFF:
+            raise(ASN1_BER_DECODER('reserved length at offset %i' % start))
+        # long form length
+        l = 0
+        for i in range(b&0x7f):
+            l = (l<<8) + ord(buf[off])
+            off += 1
+        return cla, tag, pc, off, l
+    except IndexError:
+        raise(ASN1_BER_DECODER('truncated TLV at offset %i' % start))
+
+def tlv_end(buf, off=0):
+    '''
+    returns the offset in buf (str or mmap) right after the TLV starting 
+    at offset off, its end-of-contents marker included in case of 
+    indefinite length
+    '''
+    cla, tag, pc, off, l = tlv_hdr(buf, off)
+    if l >= 0:
+        return off + l
+    # indefinite form: only nested indefinite TLVs need to be walked through
+    indef = 1
+    while indef:
+        cla, tag, pc, off, l = tlv_hdr(buf, off)
+        if l > 0:
+            off += l
+        elif l == -1:
+            indef += 1
+        elif cla == 0 and tag == 0 and pc == 0:
+            indef -= 1
+    return off
+
+def scan_tlv(buf, off=0, end=None):
+    '''
+    iterates over all TLVs within buf[off:end] (str or mmap), going through 
+    constructed ones without recursion
+    
+    yields (tag class, tag, constructed flag, value offset, value length)
+    for each TLV, value length being -1 for the indefinite form
+    end-of-contents markers are not yielded
+    '''
+    if end is None:
+        end = len(buf)
+    # for each enclosing constructed TLV: (end offset or -1, end bound)
+    stack = []
+    while True:
+        while stack and stack[-1][0] == off:
+            stack.pop()
+        if stack:
+            bound = stack[-1][1]
+            if off >= bound:
+                raise(ASN1_BER_DECODER('truncated TLV at offset %i' % off))
+        elif off >= end:
+            return
+        else:
+            bound = end
+        cla, tag, pc, voff, l = tlv_hdr(buf, off)
+        if l == 0 and cla == 0 and tag == 0 and pc == 0:
+            # end-of-contents
+            if not stack or stack[-1][0] != -1:
+                raise(ASN1_BER_DECODER('unexpected end-of-contents at '\
+                      'offset %i' % off))
+            stack.pop()
+            off = voff
+            continue
+        if voff + l > bound:
+            raise(ASN1_BER_DECODER('TLV at offset %i overflows its '\
+                  'container' % off))
+        yield cla, tag, pc, voff, l
+        if not pc:
+            off = voff + l
+        elif l >= 0:
+            stack.append((voff + l, voff + l))
+            off = voff
+        else:
+            stack.append((-1, bound))
+            off = voff
+
+def iter_tlv(buf, off=0, end=None):
+    '''
+    iterates over the TLVs which follow each other within buf[off:end] 
+    (str or mmap), e.g. the components of a constructed value, without 
+    going through their content
+    
+    yields (tag class, tag, constructed flag, TLV offset, TLV end offset),
+    and stops on an end-of-contents marker
+    '''
+    if end is None:
+        end = len(buf)
+    while off < end:
+        cla, tag, pc, voff, l = tlv_hdr(buf, off)
+        if l == 0 and cla == 0 and tag == 0 and pc == 0:
+            return
+        elif l >= 0:
+            stop = voff + l
+        else:
+            stop = tlv_end(buf, off)
+        if stop > end:
+            raise(ASN1_BER_DECODER('TLV at offset %i overflows its '\
+                  'container' % off))
+        yield cla, tag, pc, off, stop
+        off = stop
+
+def mmap_file(path):
+    '''
+    returns a read-only mmap of the file at path, to be used with the BER 
+    streaming scanner
+    '''
+    fd = open(path, 'rb')
+    try:
+        return mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+    finally:
+        fd.close()
+
 #------------------------------------------------------------------------------#
 # BER encoder / decoder
 #------------------------------------------------------------------------------#
@@ -334,6 +489,9 @@ class BER(ASN1.ASN1Codec):
     #
     # to build dictionnary for encoded / decoded ENUMERATED, CHOICE, ...
     _ENUM_BUILD_DICT = True
+    # decoder customizations
+    # to decode OPEN TYPE contents only when accessed, see ASN1.ASN1Lazy
+    _DEC_OPEN_LAZY = False
     #
     # libmich layers' representation (only for basic types)
     _REPR_BOOL = 'hex'
@@ -627,6 +785,13 @@ class BER(ASN1.ASN1Codec):
         # when nothing is specified for the encapsulated type
         default_tag = (2, 4)
         #
+        if isinstance(obj._val, ASN1.ASN1Lazy):
+            if not obj._val.resolved:
+                # lazy value never accessed: original TLV passed through
+                obj._msg = BER_TLV(obj.get_name())
+                obj._msg.parse(obj._val.buf)
+                return
+            obj._set_val_open(obj._val)
         if isinstance(obj._cont, ASN1.ASN1Obj) and isinstance(obj._val, tuple) \
         and obj._val[0] == obj._cont._name:
             cont = obj._cont
@@ -776,7 +941,7 @@ class BER(ASN1.ASN1Codec):
         if bit_len:
             V = Int('V', Type='int%s'%bit_len, Repr=self._REPR_ENUM)
             V.map(str(tlv[2]))
-            if self._ENUM_BUILD_TYPE:
+            if self._ENUM_BUILD_DICT:
                 V.Dict = dict([(i[1], i[0]) for i in obj._cont.items()])
             tlv.set(V)
             #
@@ -943,52 +1108,38 @@ class BER(ASN1.ASN1Codec):
             raise(ASN1_BER_DECODER('%s: invalid SEQUENCE encoded content'\
                   % obj.get_fullname()))
         #
-        # cursors for going over the components and _cont_tags list
-        cur_compts = 0
-        cur_tag = 0
+        if not hasattr(obj, '_cont_tags_ind'):
+            # SEQUENCE pickled by an older version of the compiler
+            obj._build_seq_cont_tags_ind()
+        # untagged OPEN / ANY components match any tag
+        opens = obj._cont_tags_ind.get((-1, -1), ())
+        # cursor over the components, as they are ordered
+        cur = 0
         obj._val = dict()
-        # going over all components of the compiled SEQUENCE
-        for name in obj._cont:
-            if cur_compts >= len(compts.elementList):
-                break
-            tlv_inner = compts[cur_compts]
-            #print('cur: %s, component: %s' % (cur_compts, repr(tlv_inner)))
+        # going over all decoded components, and getting the first compiled
+        # component after the cursor which corresponds to the tag
+        for tlv_inner in compts:
             tag = (tlv_inner[0].Class(), tlv_inner[0]())
-            comp = obj._cont[name]
-            comp_tag = comp.get_tag_val()
-            #print('expected name / tag: %s / %s' % (name, repr(comp_tag)))
-            #
-            if comp_tag is None:
-                # untagged component: CHOICE / OPEN / ANY type
-                # TODO: handle OPEN / ANY types
-                #
-                # get all possible tags within the CHOICE
-                if comp._type == TYPE_CHOICE:
-                    tags = [t[0] for t in obj._cont_tags[cur_tag:] \
-                            if t[1][0] == name]
-                    if tag in tags:
-                        obj._val[name] = self._decode_comp_val(obj,
-                                                               comp,
-                                                               tlv_inner)
-                        tlv_inner.CallName = '.'.join(obj._cont_tags[cur_tag:]\
-                                                     [tags.index(tag)][1])
-                        cur_compts += 1
-                    cur_tag += len(tags)
-                else:
-                    # OPEN TYPE
-                    obj._val[name] = self._decode_comp_val(obj,
-                                                           comp,
-                                                           tlv_inner)
-                    cur_compts += 1
-                    cur_tag += 1
-            else:
-                if comp_tag == tag:
-                    # tagged component, including CHOICE / OPEN / ANY type
-                    obj._val[name] = self._decode_comp_val(obj,
-                                                           comp,
-                                                           tlv_inner)
-                    cur_compts += 1
-                cur_tag += 1
+            match = None
+            for ind, chain in obj._cont_tags_ind.get(tag, ()):
+                if ind >= cur:
+                    match = (ind, chain)
+                    break
+            for ind, chain in opens:
+                if ind >= cur:
+                    if match is None or ind < match[0]:
+                        match = (ind, chain)
+                    break
+            if match is None:
+                break
+            ind, chain = match
+            obj._val[chain[0]] = self._decode_comp_val(obj,
+                                                       obj._cont[chain[0]],
+                                                       tlv_inner)
+            if len(chain) > 1:
+                # component within an untagged CHOICE
+                tlv_inner.CallName = '.'.join(chain)
+            cur = ind + 1
         #
         for name in [n for n in obj._root_comp if n not in obj._root_opt]:
             if name not in obj._val:
@@ -1023,21 +1174,21 @@ class BER(ASN1.ASN1Codec):
             raise(ASN1_BER_DECODER('%s: invalid SET encoded content'\
                   % obj.get_fullname()))
         #
-        # remainder for components
-        tags = list(obj._cont_tags)
+        # tags of already decoded components
+        tags = set()
         obj._val = dict()
         # going over all components of the decoded SET
         for tlv in compts:
             tag = (tlv[0].Class(), tlv[0]())
             if tag in obj._cont_tags:
                 # known component
-                if self._SAFE and tag not in tags:
+                if self._SAFE and tag in tags:
                     raise(ASN1_BER_DECODER('%s: multiple SET component %s' \
                           % (obj.get_fullname(), obj._cont_tags[tag][0])))
                 name = obj._cont_tags[tag][0]
                 comp = obj._cont[name]
                 obj._val[name] = self._decode_comp_val(obj, comp, tlv)
-                tags.remove(tag)
+                tags.add(tag)
         #
         for name in [n for n in obj._root_comp if n not in obj._root_opt]:
             if name not in obj._val:
@@ -1080,7 +1231,10 @@ class BER(ASN1.ASN1Codec):
             # otherwise, tag is directly corresponding to the chosen object
             tlv = obj._msg
         #
-        if isinstance(obj._cont, ASN1.ASN1Obj):
+        if isinstance(obj._cont, ASN1.ASN1Obj) and self._DEC_OPEN_LAZY:
+            # lazy decoding: just keep the buffer
+            obj._val = ASN1.ASN1Lazy(obj._cont, str(tlv), self)
+        elif isinstance(obj._cont, ASN1.ASN1Obj):
             obj._val = (obj._cont._name,
                         self._decode_comp_val(obj, obj._cont, tlv))
         else:
@@ -56,8 +56,6 @@ class ASN1_PER_DECODER(ASN1_CODEC): pass
 #   for SEQUENCE or CHOICE)
 #
 # WARNING: several limitations exists in this implementation
-# - there is no handling of object with size > 64k
-#   so there is no handling of fragmentation / reassembling for large values
 # - there is no support of unconstrained / semi-constrained INTEGER which 
 #   encodes over 64 bits
 # - there is no handling of ENUMERATION with more than 255 root values 
@@ -70,13 +68,19 @@ class ASN1_PER_DECODER(ASN1_CODEC): pass
 # E: extensibility marker
 # B: bitmap for optional elements
 # C: content (the value itself of an assigned-type)
+#
+# Lengths or counts >= 16K are fragmented (X.691, 10.9.3.8): the content is 
+# split in fragments of 16K to 64K items, each one with a length determinant,
+# and ends with a length determinant < 16K (possibly 0) and the last items.
+# Fragments are decoded as they are read, except for OPEN TYPE and CONTAINING
+# contents, which are reassembled before being decoded.
 ################################################################################
 
 #------------------------------------------------------------------------------#
 # PER-specific internal objects for encoding / decoding different types
 #------------------------------------------------------------------------------#
 # Length determinant
-_LUndef_dict = {0:'16K', 1:'32K', 2:'48K', 3:'64K'}
+_LUndef_dict = {1:'16K', 2:'32K', 3:'48K', 4:'64K'}
 class _PER_L(Layer):
     # actually, this length determinant shall always be byte-aligned
     _byte_aligned = True
@@ -109,7 +113,7 @@ class _PER_L(Layer):
             self.insert(1, Bit('Undef', Pt=1, BitLen=1, Repr='hum'))
             self.Count.BitLen = 6
             self.Count.Dict = _LUndef_dict
-            self.Count > (count // 16384) - 1 
+            self.Count > count // 16384
         else:
             raise(ASN1_PER_ENCODER('max length is for 16/32/48/64K '\
                                         'fragments'))
@@ -120,6 +124,10 @@ class _PER_L(Layer):
         else:
             return self.Count() * 16384
     
+    def is_frag(self):
+        # True if the length determinant is for a fragment (16 to 64K)
+        return self.Form() == 1 and self.Undef() == 1
+    
     def __repr__(self):
         if self._Repr:
             for e in self:
@@ -274,11 +282,16 @@ class PER(ASN1.ASN1Codec):
     # only used in the octet-aligned variant
     _off = 0
     #
+    # selection tree when decoding selectively, see ASN1Obj.decode()
+    _sel = None
+    #
     # CODEC customizations:
     # to build dictionnary for encoded ENUMERATED, CHOICE, ...
     _ENUM_BUILD_DICT = True
     # to pad BIT STRING with CONTAINING object to octet-align it
     _U_BITSTR_CONTAIN_PAD = True
+    # to decode OPEN TYPE contents only when accessed, see ASN1.ASN1Lazy
+    _DEC_OPEN_LAZY = False
     #
     # libmich layers' representation (only for basic types)
     _REPR_P = 'bin' # padding
@@ -654,8 +667,9 @@ class PER(ASN1.ASN1Codec):
             self._off += size
             return
         if ub >= 65536:
-            raise(ASN1_PER_ENCODER('%s: length determinant for upper bound'\
-                  '(%s) over encoder limit (64k)' % (obj.get_fullname(), ub)))
+            # upper bound >= 64K: general length determinant
+            self._encode_bit_str_noub(obj, val, size)
+            return
         #
         # ub > lb: first add INTEGER as length determinant
         # TODO: verify no padding is required before the length prefix,
@@ -678,11 +692,20 @@ class PER(ASN1.ASN1Codec):
         if self.is_aligned():
             self._add_P(obj)
         # then add general length determinant
-        try:
-            l = _PER_L(size, Repr=self._REPR_L)
-        except ASN1_PER_ENCODER:
-            raise(ASN1_PER_ENCODER('%s: bit length over encoder limit (%s)'\
-                  % (obj.get_fullname(), size)))
+        if size >= 16384:
+            # fragmented content
+            if isinstance(val, Bit):
+                val = val()
+            else:
+                val = shtr(str(val)).left_val(size)
+            def add_cont(start, stop):
+                frag = stop-start
+                obj._msg.append(Bit('C', Pt=(val>>(size-stop))&((1<<frag)-1),
+                                    BitLen=frag, Repr=self._REPR_BIT_STR))
+                self._off += frag
+            self._add_frag(obj, size, add_cont)
+            return
+        l = _PER_L(size, Repr=self._REPR_L)
         obj._msg.append(l)
         # finally append content
         obj._msg.append(val)
@@ -745,10 +768,10 @@ class PER(ASN1.ASN1Codec):
             obj._msg.append(val)
             self._off += size*8
             return
-        # TODO: handle fragmentation
         if ub >= 65536:
-            raise(ASN1_PER_ENCODER('%s: length determinant for upper bound'\
-                  '(%s) over encoder limit (64k)' % (obj.get_fullname(), ub)))
+            # upper bound >= 64K: general length determinant
+            self._encode_oct_str_noub(obj, val, size)
+            return
         #
         # ub > lb: first add INTEGER as length determinant
         # TODO: verify no padding is required before the length prefix,
@@ -774,16 +797,24 @@ class PER(ASN1.ASN1Codec):
         if self.is_aligned():
             self._add_P(obj)
         # then add general length determinant
-        try:
-            l = _PER_L(size, Repr=self._REPR_L)
-        except ASN1_PER_ENCODER:
-            raise(ASN1_PER_ENCODER('%s: byte length over encoder limit (%s)'\
-                  % (obj.get_fullname(), size)))
+        if size >= 16384:
+            # fragmented content
+            self._add_frag_oct(obj, str(val), self._get_repr_oct_str(obj))
+            return
+        l = _PER_L(size, Repr=self._REPR_L)
         obj._msg.append(l)
         # finally append content
         obj._msg.append(val)
         self._off += l.bit_len() + size*8
     
+    def _get_repr_oct_str(self, obj):
+        if obj._type == TYPE_PRINT_STR:
+            return self._REPR_PRINT_STR
+        elif obj._type == TYPE_VIS_STR:
+            return self._REPR_VIS_STR
+        else:
+            return self._REPR_OCT_STR
+    
     #--------------------------------------------------------------------------#
     # CHOICE
     #--------------------------------------------------------------------------#
@@ -885,6 +916,10 @@ class PER(ASN1.ASN1Codec):
         # 3) add byte-length prefix
         # libmich provides the correct byte-size (including padding bits)
         size = len(w)
+        if size >= 16384:
+            # fragmented content, with potential padding before its 1st part
+            self._add_frag_oct(obj, str(w), self._REPR_OCT_STR, pad=True)
+            return
         try:
             obj._msg.append(_PER_L(size, Repr=self._REPR_L))
         except ASN1_PER_ENCODER:
@@ -1069,8 +1104,9 @@ class PER(ASN1.ASN1Codec):
             self._encode_seq_of_obj(obj)
             return
         if ub >= 65536:
-            raise(ASN1_PER_ENCODER('%s: length determinant for upper bound'\
-                  '(%s) over encoder limit (64k)' % (obj.get_fullname(), ub)))
+            # upper bound >= 64K: general length determinant
+            self._encode_seq_of_noub(obj, count)
+            return
         #
         # ub > lb: first add INTEGER as length determinant
         l = ASN1.ASN1Obj(name='L', type=TYPE_INTEGER)
@@ -1087,16 +1123,20 @@ class PER(ASN1.ASN1Codec):
         if self.is_aligned():
             self._add_P(obj)
         # 2) add general count
-        try:
-            obj._msg.append(_PER_L(count, Repr=self._REPR_L))
-        except ASN1_PER_ENCODER:
-            raise(ASN1_PER_ENCODER('%s: count over encoder limit (%s)'\
-                  % (obj.get_fullname(), count)))
+        if count >= 16384:
+            # fragmented content
+            self._add_frag(obj, count, 
+                           lambda start, stop: \
+                               self._encode_seq_of_obj(obj, start, stop))
+            return
+        l = _PER_L(count, Repr=self._REPR_L)
+        obj._msg.append(l)
+        self._off += l.bit_len()
         # 3) add encoded objects
         self._encode_seq_of_obj(obj)
     
-    def _encode_seq_of_obj(self, obj):
-        for value in obj._val:
+    def _encode_seq_of_obj(self, obj, start=0, stop=None):
+        for value in obj._val[start:stop]:
             obj._cont.set_val(value)
             obj._cont._encode(offset=self._off)
             obj._msg.append(obj._cont._msg)
@@ -1104,10 +1144,49 @@ class PER(ASN1.ASN1Codec):
         # clean up content object
         obj._cont._val = None
     
+    #--------------------------------------------------------------------------#
+    # fragmentation
+    #--------------------------------------------------------------------------#
+    def _add_frag(self, obj, size, add_cont):
+        # add fragments of 64K, 48K, 32K or 16K items, each one after its 
+        # length determinant, until the last length determinant < 16K
+        # add_cont(start, stop) encodes the items from start to stop
+        start = 0
+        while True:
+            frag = min(size-start, 65536)
+            if frag >= 16384:
+                frag -= frag % 16384
+            l = _PER_L(frag, Repr=self._REPR_L)
+            obj._msg.append(l)
+            self._off += l.bit_len()
+            if frag:
+                add_cont(start, start+frag)
+                start += frag
+            if frag < 16384:
+                return
+            # next length determinant is octet-aligned
+            if self.is_aligned():
+                self._add_P(obj)
+    
+    def _add_frag_oct(self, obj, buf, repr, pad=False):
+        def add_cont(start, stop):
+            if pad and self.is_aligned():
+                self._add_P(obj)
+            obj._msg.append(Str('C', Pt=buf[start:stop], Len=stop-start, 
+                                Repr=repr))
+            self._off += (stop-start)*8
+        self._add_frag(obj, len(buf), add_cont)
+    
     #--------------------------------------------------------------------------#
     # OPEN TYPE
     #--------------------------------------------------------------------------#
     def encode_open_type(self, obj):
+        if isinstance(obj._val, ASN1.ASN1Lazy):
+            if not obj._val.resolved:
+                # lazy value never accessed: original buffer passed through
+                self._wrap_open_type(obj, obj._val.buf)
+                return
+            obj._set_val_open(obj._val)
         if isinstance(obj._cont, ASN1.ASN1Obj) and isinstance(obj._val, tuple) \
         and obj._val[0] == obj._cont._name:
             obj._cont._val = obj._val[1]
@@ -1126,6 +1205,9 @@ class PER(ASN1.ASN1Codec):
         self._off = 0
         if 'offset' in kwargs:
             self._off = kwargs['offset']
+        # propagate selection for selective decoding
+        if 'select' in kwargs:
+            self._sel = kwargs['select']
         #
         # call the appropriate type decoder
         if obj._type == TYPE_NULL:
@@ -1185,6 +1267,23 @@ class PER(ASN1.ASN1Codec):
         self._off += bitmap_len
         return buf
     
+    #--------------------------------------------------------------------------#
+    # selective decoding
+    #--------------------------------------------------------------------------#
+    def _get_sel(self, name):
+        # returns the selection tree for the component / content name
+        if self._sel is None:
+            return None
+        elif name in self._sel:
+            return self._sel[name]
+        elif '*' in self._sel:
+            return self._sel['*']
+        return SEL_SKIP
+    
+    def _is_skipped(self, sel):
+        # components with an empty selection tree can be skipped
+        return sel is not None and not sel
+    
     #--------------------------------------------------------------------------#
     # NULL / BOOLEAN
     #--------------------------------------------------------------------------#
@@ -1452,10 +1551,10 @@ class PER(ASN1.ASN1Codec):
             obj._val = (c(), lb)
             return buf
         #
-        # ub > lb: first add INTEGER as length determinant
+        # upper bound >= 64K: general length determinant
         if ub >= 65536:
-            raise(ASN1_PER_DECODER('%s: length determinant for upper bound'\
-                  '(%s) over decoder limit (64k)' % (obj.get_fullname(), ub)))
+            return self._decode_bit_str_noub(obj, buf)
+        # ub > lb: first add INTEGER as length determinant
         l = ASN1.ASN1Obj(name='L', type=TYPE_INTEGER)
         l._const.append({'type':CONST_VAL_RANGE, 'lb':lb, 'ub':ub, 'ext':False})
         buf = l._decode(buf, offset=self._off)
@@ -1484,12 +1583,18 @@ class PER(ASN1.ASN1Codec):
         obj._msg.append(l)
         self._off += l.bit_len()
         size = l()
+        if l.is_frag():
+            return self._decode_bit_str_frag(obj, buf, l)
         # finally decode content
         contain = obj.get_const_contain()
+        if contain:
+            sel = self._get_sel(contain['ref']._name)
+            if self._is_skipped(sel):
+                contain = None
         if contain:
             # CONTAINING reference is used to decode the buffer
             obj._cont = contain['ref'].clone_light()
-            buf = obj._cont._decode(buf)
+            buf = obj._cont._decode(buf, select=sel)
             # padding may be used by the encoder
             pad_len = size - obj._cont._msg.bit_len()
             if pad_len:
@@ -1507,6 +1612,36 @@ class PER(ASN1.ASN1Codec):
         self._off += size
         return buf
     
+    def _decode_bit_str_frag(self, obj, buf, l):
+        frags = []
+        def get_cont(buf, count):
+            c = Bit('C', BitLen=count, Repr=self._REPR_BIT_STR)
+            buf = c.map_ret(buf)
+            obj._msg.append(c)
+            self._off += count
+            frags.append(c)
+            return buf
+        buf, size = self._get_frag(obj, buf, l, get_cont)
+        #
+        contain = obj.get_const_contain()
+        if contain:
+            sel = self._get_sel(contain['ref']._name)
+            if self._is_skipped(sel):
+                contain = None
+        if contain:
+            # CONTAINING reference is used to decode the reassembled buffer
+            obj._cont = contain['ref'].clone_light()
+            obj._cont._decode(''.join(map(str, frags)), select=sel)
+            obj._val = (obj._cont._name, obj._cont._val)
+            obj._cont._msg = None
+            obj._cont._val = None
+        else:
+            val = 0
+            for c in frags:
+                val = (val << c.bit_len()) + c()
+            obj._val = (val, size)
+        return buf
+    
     #--------------------------------------------------------------------------#
     # OCTET STRING
     #--------------------------------------------------------------------------#
@@ -1530,7 +1665,7 @@ class PER(ASN1.ASN1Codec):
             return self._decode_oct_str_noub(obj, buf)
         #
         # 5) upper bound defined: fully constrained size
-        if lb == ub and ub <= 65536:
+        if lb == ub and ub < 65536:
             # no need for length determinant
             if lb > 2 and self.is_aligned():
                 # for string > 2 bytes, needs to be octet aligned
@@ -1548,11 +1683,10 @@ class PER(ASN1.ASN1Codec):
             obj._val = c()
             return buf
         #
-        # ub > lb: first add INTEGER as length determinant
+        # upper bound >= 64K: general length determinant
         if ub >= 65536:
-            raise(ASN1_PER_DECODER('%s: length determinant for upper bound'\
-                  '(%s) over decoder limit (64k)' % (obj.get_fullname(), ub)))
-        
+            return self._decode_oct_str_noub(obj, buf)
+        # ub > lb: first add INTEGER as length determinant
         l = ASN1.ASN1Obj(name='L', type=TYPE_INTEGER)
         l._const.append({'type':CONST_VAL_RANGE, 'lb':lb, 'ub':ub, 'ext':False})
         buf = l._decode(buf, offset=self._off)
@@ -1591,12 +1725,18 @@ class PER(ASN1.ASN1Codec):
         obj._msg.append(l)
         self._off += l.bit_len()
         size = l()
+        if l.is_frag():
+            return self._decode_oct_str_frag(obj, buf, l)
         # finally decode content
         contain = obj.get_const_contain()
+        if contain:
+            sel = self._get_sel(contain['ref']._name)
+            if self._is_skipped(sel):
+                contain = None
         if contain:
             # CONTAINING reference is used to decode the buffer
             obj._cont = contain['ref'].clone_light()
-            buf = obj._cont._decode(buf)
+            buf = obj._cont._decode(buf, select=sel)
             # TODO: confirm padding is required
             buf = obj._cont._codec._get_P(obj._cont, buf)
             if self._SAFE:
@@ -1619,6 +1759,25 @@ class PER(ASN1.ASN1Codec):
         self._off += size*8
         return buf
     
+    def _decode_oct_str_frag(self, obj, buf, l):
+        buf, val = self._get_frag_oct(obj, buf, l, self._get_repr_oct_str(obj))
+        #
+        contain = obj.get_const_contain()
+        if contain:
+            sel = self._get_sel(contain['ref']._name)
+            if self._is_skipped(sel):
+                contain = None
+        if contain:
+            # CONTAINING reference is used to decode the reassembled buffer
+            obj._cont = contain['ref'].clone_light()
+            obj._cont._decode(val, select=sel)
+            obj._val = (obj._cont._name, obj._cont._val)
+            obj._cont._msg = None
+            obj._cont._val = None
+        else:
+            obj._val = val
+        return buf
+    
     #--------------------------------------------------------------------------#
     # CHOICE
     #--------------------------------------------------------------------------#
@@ -1670,7 +1829,7 @@ class PER(ASN1.ASN1Codec):
         #    buf = self._get_P(obj, buf)
         #
         # 4) decode the object chosen according to the index
-        buf = cho._decode(buf, offset=self._off)
+        buf = cho._decode(buf, offset=self._off, select=self._get_sel(cho_name))
         obj._msg.append(cho._msg)
         self._off += cho._msg.bit_len()
         #
@@ -1696,6 +1855,10 @@ class PER(ASN1.ASN1Codec):
         else:
             cho_name = obj._ext[ind()]
             cho = obj._cont[cho_name].clone_light()
+        sel = self._get_sel(cho_name)
+        if self._is_skipped(sel):
+            # not decoded, like an unknown extension
+            cho = None
         #
         # 4) potential padding
         if self.is_aligned():
@@ -1703,17 +1866,18 @@ class PER(ASN1.ASN1Codec):
         #
         # 5) extended value chosen needs to be decoded like an OPEN TYPE
         # unwrap from the LV structure 
-        buf = self._unwrap_open_type(obj, buf, cho)
         # hack for supporting unknown extension
         if cho is None:
-            obj._val = (cho_name, str(obj._msg[-1]))
+            buf, c = self._unwrap_open_buf(obj, buf)
+            obj._val = (cho_name, c)
         else:
+            buf = self._unwrap_open_type(obj, buf, cho, sel)
             obj._val = (cho_name, cho._val)
             # clean up content object
             cho._val = None
         return buf
     
-    def _unwrap_open_type(self, obj, buf, wrapped):
+    def _unwrap_open_type(self, obj, buf, wrapped, sel=None):
         # 1) decode length determinant
         # get general length determinant
         l = _PER_L(Repr=self._REPR_L)
@@ -1722,6 +1886,15 @@ class PER(ASN1.ASN1Codec):
         self._off += l.bit_len()
         size = l()
         #
+        # fragmented content, with potential padding before its 1st part:
+        # the wrapped object is decoded from the reassembled buffer
+        if l.is_frag():
+            buf, w_buf = self._get_frag_oct(obj, buf, l, self._REPR_OCT_STR,
+                                            pad=True)
+            if wrapped is not None:
+                wrapped._decode(w_buf, offset=0, select=sel)
+            return buf
+        #
         # 2) get potential padding
         if self.is_aligned():
             buf = self._get_P(obj, buf)
@@ -1735,7 +1908,7 @@ class PER(ASN1.ASN1Codec):
             return buf
         #
         # 4) if wrapped is defined, decode it completely
-        buf = wrapped._decode(buf, offset=0)
+        buf = wrapped._decode(buf, offset=0, select=sel)
         # 5) get padding for it as it is an outermost type
         # zero bit field are padded with 8 bits
         if wrapped._msg.bit_len() == 0:
@@ -1755,6 +1928,14 @@ class PER(ASN1.ASN1Codec):
         self._off += w_bl
         return buf
     
+    def _unwrap_open_buf(self, obj, buf):
+        # for unknown or skipped wrapped object:
+        # returns the remaining buffer and the wrapped buffer
+        ind = len(obj._msg.elementList)
+        buf = self._unwrap_open_type(obj, buf, None)
+        return buf, ''.join([str(e) for e in obj._msg.elementList[ind:] \
+                             if e.CallName == 'C'])
+    
     #--------------------------------------------------------------------------#
     # SEQUENCE
     #--------------------------------------------------------------------------#
@@ -1820,7 +2001,8 @@ class PER(ASN1.ASN1Codec):
                         #    log('CONST_SET_REF, ref: %s' % comp._cont._name)
                     #log('_decode_seq, type OPEN: %s, %s' % (comp._name, comp._cont))
                 # 5) decode standard ASN1 object
-                buf = comp._decode(buf, offset=self._off)
+                buf = comp._decode(buf, offset=self._off, 
+                                   select=self._get_sel(name))
                 #
                 obj._msg.append(comp._msg)
                 self._off += comp._msg.bit_len()
@@ -1894,11 +2076,18 @@ class PER(ASN1.ASN1Codec):
                     if isinstance(comp, str):
                         # single field
                         name = comp
+                        sel = self._get_sel(name)
+                        if self._is_skipped(sel):
+                            # not decoded, just get the buffer
+                            buf, obj._val[name] = self._unwrap_open_buf(obj, 
+                                                                        buf)
+                            ind_val += 1
+                            continue
                         comp_obj = obj._cont[name].clone_light()
                         if comp_obj._type in (TYPE_OPEN, TYPE_ANY):
                             # TODO: decode further OPEN TYPE with CONST_SET_REF
                             pass
-                        buf = self._unwrap_open_type(obj, buf, comp_obj)
+                        buf = self._unwrap_open_type(obj, buf, comp_obj, sel)
                         obj._val[name] = comp_obj._val
                         # clean up content object
                         comp_obj._val = None
@@ -1912,7 +2101,8 @@ class PER(ASN1.ASN1Codec):
                                 # TODO: decode further OPEN TYPE with CONST_SET_REF
                                 pass
                         comp_obj._build_constructed_rootext()
-                        buf = self._unwrap_open_type(obj, buf, comp_obj)
+                        buf = self._unwrap_open_type(obj, buf, comp_obj,
+                                                     self._sel)
                         # assign values and clean up content objects
                         if comp_obj._val:
                             for name in comp_obj._val:
@@ -1920,9 +2110,9 @@ class PER(ASN1.ASN1Codec):
                         comp_obj._val = None
                 else:
                     # 5) unknown extended field
-                    buf = self._unwrap_open_type(obj, buf, None)
+                    buf, c = self._unwrap_open_buf(obj, buf)
                     # hack for supporting unknown extension
-                    obj._val = ('_ext_%i' % ind_val, str(obj._msg[-1]))
+                    obj._val = ('_ext_%i' % ind_val, c)
             ind_val += 1
         #
         return buf
@@ -1947,14 +2137,13 @@ class PER(ASN1.ASN1Codec):
             return self._decode_seq_of_noub(obj, buf)
         #
         # 4) upper-bound defined: fully constrained count
-        if lb == ub:
+        if lb == ub and ub < 65536:
             # no length determinant (implicit count)
             return self._decode_seq_of_obj(obj, buf, lb)
-        # ub > lb, not extended
+        # upper bound >= 64K: general length determinant
         if ub >= 65536:
-            raise(ASN1_PER_DECODER('%s: length determinant for upper bound'\
-                  '(%s) over decoder limit (64k)' % (obj.get_fullname(), ub)))
-        #
+            return self._decode_seq_of_noub(obj, buf)
+        # ub > lb, not extended
         l = ASN1.ASN1Obj(name='L', type=TYPE_INTEGER)
         l._const.append({'type':CONST_VAL_RANGE, 'lb':lb, 'ub':ub, 'ext':False})
         buf = l._decode(buf, offset=self._off)
@@ -1973,37 +2162,96 @@ class PER(ASN1.ASN1Codec):
         buf = l.map_ret(buf)
         obj._msg.append(l)
         self._off += l.bit_len()
-        size = l()
         # 3) get decoded object
+        if l.is_frag():
+            # fragmented content: objects are decoded fragment by fragment
+            obj._val = []
+            cont = obj._cont.clone_light()
+            buf = self._get_frag(obj, buf, l, 
+                                 lambda buf, count: \
+                                     self._decode_seq_of_items(obj, cont, buf,
+                                                               count))[0]
+            cont._val = None
+            return buf
         return self._decode_seq_of_obj(obj, buf, l())
     
     def _decode_seq_of_obj(self, obj, buf, count):
         obj._val = []
         cont = obj._cont.clone_light()
+        buf = self._decode_seq_of_items(obj, cont, buf, count)
+        # clean up content object
+        cont._val = None
+        #
+        return buf
+    
+    def _decode_seq_of_items(self, obj, cont, buf, count):
         for i in xrange(count):
-            buf = cont._decode(buf, offset=self._off)
+            buf = cont._decode(buf, offset=self._off, select=self._sel)
             self._off += cont._msg.bit_len()
             obj._msg.append(cont._msg)
             obj._val.append(cont._val)
-        # clean up content object
-        cont._val = None
-        #
         return buf
     
+    #--------------------------------------------------------------------------#
+    # fragmentation
+    #--------------------------------------------------------------------------#
+    def _get_frag(self, obj, buf, l, get_cont):
+        # get fragments of 64K, 48K, 32K or 16K items, each one after its 
+        # length determinant, until the last length determinant < 16K
+        # get_cont(buf, count) decodes count items and returns the remaining
+        # buffer
+        # returns the remaining buffer and the total count of items
+        size = 0
+        while True:
+            if l():
+                buf = get_cont(buf, l())
+                size += l()
+            if not l.is_frag():
+                return buf, size
+            # next length determinant is octet-aligned
+            if self.is_aligned():
+                buf = self._get_P(obj, buf)
+            l = _PER_L(Repr=self._REPR_L)
+            buf = l.map_ret(buf)
+            obj._msg.append(l)
+            self._off += l.bit_len()
+    
+    def _get_frag_oct(self, obj, buf, l, repr, pad=False):
+        # returns the remaining buffer and the reassembled octets
+        frags = []
+        def get_cont(buf, count):
+            if pad and self.is_aligned():
+                buf = self._get_P(obj, buf)
+            c = Str('C', Len=count, Repr=repr)
+            buf = c.map_ret(buf)
+            obj._msg.append(c)
+            self._off += count*8
+            frags.append(c())
+            return buf
+        buf, size = self._get_frag(obj, buf, l, get_cont)
+        return buf, ''.join(frags)
+    
     #--------------------------------------------------------------------------#
     # OPEN TYPE
     #--------------------------------------------------------------------------#
     def decode_open_type(self, obj, buf):
         if isinstance(obj._cont, ASN1.ASN1Obj):
-            buf = self._unwrap_open_type(obj, buf, obj._cont)
-            if obj._cont._name in GLOBAL.TYPE:
-                obj._val = (obj._cont._name, obj._cont._val)
-            else:
-                obj._val = obj._cont._val
-            obj._cont._val = None
-            return buf
-        else:
-            buf = self._unwrap_open_type(obj, buf, None)
-            obj._val = str(obj._msg[-1])
-            return buf
+            sel = self._get_sel(obj._cont._name)
+            if sel is None and self._DEC_OPEN_LAZY \
+            and obj._cont._name in GLOBAL.TYPE:
+                # lazy decoding: just get the buffer
+                buf, c = self._unwrap_open_buf(obj, buf)
+                obj._val = ASN1.ASN1Lazy(obj._cont, c, self)
+                return buf
+            if not self._is_skipped(sel):
+                buf = self._unwrap_open_type(obj, buf, obj._cont, sel)
+                if obj._cont._name in GLOBAL.TYPE:
+                    obj._val = (obj._cont._name, obj._cont._val)
+                else:
+                    obj._val = obj._cont._val
+                obj._cont._val = None
+                return buf
+        # unknown or skipped content: just get the buffer
+        buf, obj._val = self._unwrap_open_buf(obj, buf)
+        return buf
 #
@@ -0,0 +1,273 @@
+# -*- coding: UTF-8 -*-
+#/**
+# * Software Name : libmich 
+# * Version : 0.2.3
+# *
+# * Copyright © 2026. agent.
+# *
+# * This program is free software: you can redistribute it and/or modify
+# * it under the terms of the GNU General Public License version 2 as published
+# * by the Free Software Foundation. 
+# *
+# * This program is distributed in the hope that it will be useful,
+# * but WITHOUT ANY WARRANTY; without even the implied warranty of
+# * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# * GNU General Public License for more details. 
+# *
+# * You will find a copy of the terms and conditions of the GNU General Public
+# * License version 2 in the "license.txt" file or
+# * see http://www.gnu.org/licenses/ or write to the Free Software Foundation,
+# * Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+# *
+# *--------------------------------------------------------
+# * File Name : asn1/TAP3.py
+# * Created : 2026-10-19
+# * Authors : agent 
+# *--------------------------------------------------------
+#*/
+
+# export filter
+__all__ = ['TAP3Reader', 'GLOBAL_TAP3', 'get_tap3', 'write_tap3']
+
+from multiprocessing import Pool
+#
+from utils import _make_GLOBAL
+from processor import ASN1, BER, load_module
+from BER import ASN1_BER_DECODER, L, tlv_hdr, iter_tlv, mmap_file
+
+################################################################################
+# TAP3 files streaming reader
+# TAP3 files can hold millions of CallEventDetail within a single 
+# TransferBatch: here, the file is mmap'd and only TLV headers are scanned
+# to locate the records, which are then decoded one at a time with the 
+# BER codec and the compiled TAP3 module
+################################################################################
+
+# TAP3 ASN.1 db, loaded on first use
+GLOBAL_TAP3 = _make_GLOBAL('GLOBAL_TAP3')
+
+def get_tap3():
+    '''
+    returns the GLOBAL_TAP3 db, after loading the TAP3 module into it
+    '''
+    if len(GLOBAL_TAP3.TYPE) == 0:
+        load_module('TAP3', GLOBAL_TAP3)
+    return GLOBAL_TAP3
+
+# DataInterChange ::= CHOICE {transferBatch [APPLICATION 1], 
+#                             notification [APPLICATION 2], ...}
+TAP3_TRANSFER_BATCH = 1
+TAP3_NOTIFICATION = 2
+# TransferBatch components' APPLICATION tags: (component name, type name)
+TAP3_CALL_EVENT_DETAILS = 3
+TAP3_BATCH_COMP = {
+    4 : ('batchControlInfo', 'BatchControlInfo'),
+    5 : ('accountingInfo', 'AccountingInfo'),
+    6 : ('networkInfo', 'NetworkInfo'),
+    8 : ('messageDescriptionInfo', 'MessageDescriptionInfoList'),
+    15 : ('auditControlInfo', 'AuditControlInfo'),
+    }
+
+class TAP3Reader(object):
+    '''
+    streaming reader for TAP3 files
+    
+    The file is mmap'd, and only the TLV headers of the TransferBatch and
+    of its components are scanned when opening it. Then, CallEventDetail 
+    records are decoded one at a time when iterating over the reader, 
+    so that memory usage does not depend on the number of records.
+    
+    >>> with TAP3Reader('CDFRAXXGBRYY01234') as tap:
+    ...     info = tap.get_batch_info()
+    ...     for cdr in tap:
+    ...         print(cdr[0])
+    '''
+    
+    def __init__(self, path):
+        self.path = path
+        self.buf = mmap_file(path)
+        self._GLOB = get_tap3()
+        self._ctx = ASN1.ASN1Ctx(CODEC=BER)
+        try:
+            self._scan()
+        except:
+            self.close()
+            raise
+    
+    def _scan(self):
+        buf = self.buf
+        cla, tag, pc, voff, l = tlv_hdr(buf, 0)
+        if cla != 1 or not pc \
+        or tag not in (TAP3_TRANSFER_BATCH, TAP3_NOTIFICATION):
+            raise(ASN1_BER_DECODER('%s: not a TAP3 DataInterChange' \
+                  % self.path))
+        self.notification = tag == TAP3_NOTIFICATION
+        # list of (component name, type name, start, stop) of the 
+        # TransferBatch components
+        self._comp = []
+        # start and stop offsets of the CallEventDetailList
+        self._cdl = None
+        if self.notification:
+            self._comp.append((None, 'Notification', 0, len(buf)))
+            return
+        end = voff + l if l >= 0 else len(buf)
+        for cla, tag, pc, start, stop in iter_tlv(buf, voff, end):
+            if cla != 1:
+                continue
+            if tag == TAP3_CALL_EVENT_DETAILS:
+                self._cdl = (start, stop)
+            elif tag in TAP3_BATCH_COMP:
+                name, typename = TAP3_BATCH_COMP[tag]
+                self._comp.append((name, typename, start, stop))
+    
+    def close(self):
+        self.buf.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *args):
+        self.close()
+    
+    def _decode(self, typename, start, stop):
+        obj = self._GLOB.TYPE[typename]
+        ctx = self._ctx
+        ctx.clear()
+        obj.decode(self.buf[start:stop], ctx=ctx)
+        return ctx.get(obj)
+    
+    def get_batch_info(self):
+        '''
+        returns a dict with the values of all TransferBatch components, 
+        except callEventDetails (or the value of the Notification, if the
+        file is a notification)
+        '''
+        if self.notification:
+            return self._decode(*self._comp[0][1:])
+        return dict([(name, self._decode(typename, start, stop)) \
+                     for name, typename, start, stop in self._comp])
+    
+    def offsets(self):
+        '''
+        yields (start, stop) offsets of each CallEventDetail record 
+        within the file
+        '''
+        if self._cdl is None:
+            return
+        start, stop = self._cdl
+        voff = tlv_hdr(self.buf, start)[3]
+        for cla, tag, pc, start, stop in iter_tlv(self.buf, voff, stop):
+            yield start, stop
+    
+    def decode(self, start, stop):
+        '''
+        decodes the CallEventDetail record at offsets start:stop and 
+        returns its value
+        '''
+        return self._decode('CallEventDetail', start, stop)
+    
+    def __iter__(self):
+        for start, stop in self.offsets():
+            yield self.decode(start, stop)
+    
+    def ranges(self, num=256):
+        '''
+        yields (start, stop) offsets of consecutive parts of the 
+        CallEventDetailList, each one holding num records (the last one 
+        possibly less)
+        '''
+        first, i = None, 0
+        for start, stop in self.offsets():
+            if first is None:
+                first = start
+            i += 1
+            if i == num:
+                yield first, stop
+                first, i = None, 0
+        if first is not None:
+            yield first, stop
+    
+    def iter_parallel(self, workers=None, num=256):
+        '''
+        decodes CallEventDetail records within a pool of worker processes 
+        (by default, as many as CPUs), each one having its own TAP3Reader 
+        on the file, and yields their values in order
+        
+        the CallEventDetailList is split into ranges of num records, each 
+        range being decoded by a single worker
+        '''
+        pool = Pool(workers, _worker_init, (self.path, ))
+        try:
+            for vals in pool.imap(_worker_decode, self.ranges(num)):
+                for val in vals:
+                    yield val
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+
+# TAP3Reader of a worker process, for TAP3Reader.iter_parallel()
+_WORKER_READER = [None]
+
+def _worker_init(path):
+    _WORKER_READER[0] = TAP3Reader(path)
+
+def _worker_decode(rng):
+    tap = _WORKER_READER[0]
+    return [tap.decode(start, stop) \
+            for cla, tag, pc, start, stop in iter_tlv(tap.buf, *rng)]
+
+def _tlv(tag, length):
+    # returns the header of a constructed [APPLICATION tag] TLV, tag < 31
+    l = L()
+    l.set(length)
+    return chr(0x60 + tag) + str(l)
+
+def write_tap3(path, cdrs, num=None, info={}):
+    '''
+    writes a TAP3 file at path, holding a TransferBatch with the components
+    given in info (dict of values, e.g. batchControlInfo, auditControlInfo) 
+    and a CallEventDetailList
+    
+    the CallEventDetailList holds the list of CallEventDetail values cdrs, 
+    or num records taken in turn from it: in this case, each value is 
+    encoded only once, so that very large files can be produced quickly
+    '''
+    GLOB = get_tap3()
+    ctx = ASN1.ASN1Ctx(CODEC=BER)
+    def encode(typename, val):
+        obj = GLOB.TYPE[typename]
+        ctx.clear()
+        obj.encode(val, ctx=ctx)
+        with ctx:
+            return str(obj)
+    recs = [encode('CallEventDetail', cdr) for cdr in cdrs]
+    if num is None:
+        num = len(recs)
+    # TransferBatch components, in the order of the TAP3 definition
+    head, tail = [], []
+    for tag in sorted(TAP3_BATCH_COMP):
+        name, typename = TAP3_BATCH_COMP[tag]
+        if name == 'auditControlInfo' and name in info:
+            tail.append(encode(typename, info[name]))
+        elif name in info:
+            head.append(encode(typename, info[name]))
+    rec_len = sum(map(len, recs)) * (num // len(recs)) \
+              + sum(map(len, recs[:num % len(recs)]))
+    cdl = _tlv(TAP3_CALL_EVENT_DETAILS, rec_len)
+    fd = open(path, 'wb')
+    try:
+        fd.write(_tlv(TAP3_TRANSFER_BATCH, sum(map(len, head + tail)) \
+                      + len(cdl) + rec_len))
+        fd.write(''.join(head))
+        fd.write(cdl)
+        # writing records by blocks of about 1024 records
+        rep = max(1, 1024 // len(recs))
+        blk, blk_num = ''.join(recs) * rep, rep * len(recs)
+        for i in range(num // blk_num):
+            fd.write(blk)
+        fd.write(''.join([recs[i % len(recs)] for i in range(num % blk_num)]))
+        fd.write(''.join(tail))
+    finally:
+        fd.close()
+
@@ -26,5 +26,6 @@
 # *--------------------------------------------------------
 #*/
 
-__all__ = ['ASN1', 'PER', 'BER', 'utils', 'parsers', 'processor', 'modules']
+__all__ = ['ASN1', 'PER', 'BER', 'TAP3', 'template', 'ndjson', 'utils',
+           'parsers', 'processor', 'modules']
 #
\ No newline at end of file
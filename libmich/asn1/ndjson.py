@@ -0,0 +1,341 @@
+# -*- coding: UTF-8 -*-
+#/**
+# * Software Name : libmich 
+# * Version : 0.2.3
+# *
+# * Copyright © 2026. agent.
+# *
+# * This program is free software: you can redistribute it and/or modify
+# * it under the terms of the GNU General Public License version 2 as published
+# * by the Free Software Foundation. 
+# *
+# * This program is distributed in the hope that it will be useful,
+# * but WITHOUT ANY WARRANTY; without even the implied warranty of
+# * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# * GNU General Public License for more details. 
+# *
+# * You will find a copy of the terms and conditions of the GNU General Public
+# * License version 2 in the "license.txt" file or
+# * see http://www.gnu.org/licenses/ or write to the Free Software Foundation,
+# * Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+# *
+# *--------------------------------------------------------
+# * File Name : asn1/ndjson.py
+# * Created : 2026-10-19
+# * Authors : agent 
+# *--------------------------------------------------------
+#*/
+
+# export filter
+__all__ = ['ASN1JSONWriter', 'dump_ndjson']
+
+from binascii import hexlify
+from json.encoder import encode_basestring_ascii
+#
+from utils import *
+from processor import ASN1, GLOBAL
+
+################################################################################
+# streaming JSON / NDJSON export of ASN.1 values
+# values are serialized by walking them together with their ASN.1 type,
+# without building any intermediate Python structure:
+# - NULL, BOOLEAN, INTEGER: null, true / false, number
+# - ENUMERATED, IA5String, PrintableString, NumericString, VisibleString: string
+# - BIT STRING: [value, length]
+# - OCTET STRING, raw OPEN TYPE content, unknown extension: hex string
+# - OBJECT IDENTIFIER: [arc1, arc2, ...]
+# - CHOICE: [name, value]
+# - OPEN TYPE, CONTAINING constraint: [type name, value]
+# - SEQUENCE, SET, CLASS: {name: value, ...}, in the order of the components
+# - SEQUENCE OF, SET OF: [value1, value2, ...]
+################################################################################
+
+def _json_str(val):
+    try:
+        return encode_basestring_ascii(val)
+    except UnicodeDecodeError:
+        return encode_basestring_ascii(val.decode('latin-1'))
+
+def _is_named(val):
+    # OPEN TYPE and CONTAINING values decoded with a known type: 
+    # (type name, value)
+    return isinstance(val, tuple) and len(val) == 2 and isinstance(val[0], str)
+
+def _w_any(val, out):
+    # generic writer, used when no ASN.1 type is available for a value
+    # (e.g. unknown extension)
+    if val is None:
+        out('null')
+    elif val is True:
+        out('true')
+    elif val is False:
+        out('false')
+    elif isinstance(val, (int, long)):
+        out(str(val))
+    elif isinstance(val, str):
+        out('"%s"' % hexlify(val))
+    elif isinstance(val, ASN1.ASN1Lazy):
+        _w_any((val.name, val.get()), out)
+    elif isinstance(val, (tuple, list)):
+        out('[')
+        first = True
+        for v in val:
+            if first:
+                first = False
+            else:
+                out(',')
+            _w_any(v, out)
+        out(']')
+    elif isinstance(val, dict):
+        out('{')
+        first = True
+        for k in val:
+            if first:
+                first = False
+            else:
+                out(',')
+            out(_json_str(str(k)))
+            out(':')
+            _w_any(val[k], out)
+        out('}')
+    else:
+        out(_json_str(str(val)))
+
+class ASN1JSONWriter(object):
+    """
+    Serializes values of a given ASN.1 object to JSON, one record per value
+    
+    A writer function is built once for each ASN.1 type reachable from the 
+    object, and then called for each value; OPEN TYPE contents are serialized
+    with the type having the same name in the GLOB namespace (GLOBAL by 
+    default, e.g. GLOBAL_TAP3 for values of TAP3 objects), whose writer is 
+    built at first use; contents decoded without a type name are written as
+    raw values.
+    
+    dumps(val=None): returns the JSON string for val (or the current value
+        of the object)
+    dump(val, fd): writes val as a single NDJSON line into the file-like fd
+    dump_all(vals, fd): writes all values from the iterable vals as NDJSON 
+        lines, one at a time, and returns the number of records written
+    dump_bufs(bufs, fd): decodes each buffer from the iterable bufs with the
+        object, and writes the decoded values as NDJSON lines
+    
+    >>> wr = ASN1JSONWriter(GLOBAL.TYPE['S1AP-PDU'])
+    >>> wr.dump_bufs(pkts, open('s1ap.ndjson', 'w'))
+    """
+    
+    def __init__(self, obj, GLOB=GLOBAL):
+        self._obj = obj
+        self._GLOB = GLOB
+        # writers per ASN1Obj id, and per type name for OPEN TYPE contents
+        self._wr = {}
+        self._wr_open = {}
+        # keep a reference to all ASN1Obj, for their id not to be reused
+        self._objs = []
+        self._root = self._writer(obj)
+    
+    def dumps(self, val=None):
+        if val is None:
+            val = self._obj()
+        out = []
+        self._root(val, out.append)
+        return ''.join(out)
+    
+    def dump(self, val, fd):
+        out = []
+        self._root(val, out.append)
+        out.append('\n')
+        fd.write(''.join(out))
+    
+    def dump_all(self, vals, fd):
+        num = 0
+        for val in vals:
+            self.dump(val, fd)
+            num += 1
+        return num
+    
+    def dump_bufs(self, bufs, fd):
+        obj, num = self._obj, 0
+        for buf in bufs:
+            obj.decode(buf)
+            self.dump(obj(), fd)
+            num += 1
+        return num
+    
+    #--------------------------------------------------------------------------#
+    # writers' construction
+    #--------------------------------------------------------------------------#
+    def _writer(self, obj):
+        key = id(obj)
+        if key in self._wr:
+            return self._wr[key]
+        # recursive types: the writer being built is called through a cell
+        cell = []
+        self._wr[key] = lambda val, out: cell[0](val, out)
+        self._objs.append(obj)
+        wr = self._build(obj)
+        cell.append(wr)
+        self._wr[key] = wr
+        return wr
+    
+    def _writer_open(self, name):
+        if name in self._wr_open:
+            return self._wr_open[name]
+        if name in self._GLOB.TYPE:
+            wr = self._writer(self._GLOB.TYPE[name])
+        else:
+            wr = _w_any
+        self._wr_open[name] = wr
+        return wr
+    
+    def _build(self, obj):
+        typ = obj._type
+        if typ == TYPE_NULL:
+            return self._build_null()
+        elif typ == TYPE_BOOL:
+            return self._build_bool()
+        elif typ == TYPE_INTEGER:
+            return self._build_int()
+        elif typ in (TYPE_ENUM, TYPE_IA5_STR, TYPE_PRINT_STR, TYPE_NUM_STR,
+                     TYPE_VIS_STR):
+            return self._build_str()
+        elif typ == TYPE_OID:
+            return self._build_oid()
+        elif typ in (TYPE_BIT_STR, TYPE_OCTET_STR):
+            return self._build_bit_oct_str(obj)
+        elif typ == TYPE_CHOICE:
+            return self._build_choice(obj)
+        elif typ in (TYPE_SEQ, TYPE_SET, TYPE_CLASS):
+            return self._build_seq(obj)
+        elif typ in (TYPE_SEQ_OF, TYPE_SET_OF):
+            return self._build_seq_of(obj)
+        elif typ in (TYPE_OPEN, TYPE_ANY, TYPE_EXT):
+            return self._build_open()
+        else:
+            return _w_any
+    
+    def _build_null(self):
+        def wr(val, out):
+            out('null')
+        return wr
+    
+    def _build_bool(self):
+        def wr(val, out):
+            out('true' if val else 'false')
+        return wr
+    
+    def _build_int(self):
+        def wr(val, out):
+            out(str(val))
+        return wr
+    
+    def _build_str(self):
+        def wr(val, out):
+            out(_json_str(val))
+        return wr
+    
+    def _build_oid(self):
+        def wr(val, out):
+            out('[%s]' % ','.join(map(str, val)))
+        return wr
+    
+    def _build_bit_oct_str(self, obj):
+        bit_str = obj._type == TYPE_BIT_STR
+        writer_open = self._writer_open
+        def wr(val, out):
+            if isinstance(val, str):
+                out('"%s"' % hexlify(val))
+            elif _is_named(val):
+                # CONTAINING constraint: (type name, value)
+                out('[%s,' % _json_str(val[0]))
+                writer_open(val[0])(val[1], out)
+                out(']')
+            elif bit_str and isinstance(val, tuple) and len(val) == 2 \
+            and isinstance(val[0], (int, long)):
+                out('[%i,%i]' % val)
+            else:
+                # bare decoded value of a CONTAINING constraint
+                _w_any(val, out)
+        return wr
+    
+    def _build_choice(self, obj):
+        cont = obj._cont
+        wrs = dict([(name, (self._writer(cont[name]), '[%s,' % _json_str(name)))
+                    for name in cont])
+        def wr(val, out):
+            try:
+                w, pref = wrs[val[0]]
+            except KeyError:
+                # unknown extension
+                _w_any(val, out)
+            else:
+                out(pref)
+                w(val[1], out)
+                out(']')
+        return wr
+    
+    def _build_seq(self, obj):
+        cont = obj._cont
+        wrs = [(name, self._writer(cont[name]), _json_str(name)+':') \
+               for name in cont]
+        def wr(val, out):
+            if not val:
+                # empty SEQUENCE are decoded with a None value
+                out('{}')
+                return
+            out('{')
+            num, sep = 0, ''
+            for name, w, pref in wrs:
+                if name in val:
+                    out(sep)
+                    out(pref)
+                    w(val[name], out)
+                    num += 1
+                    sep = ','
+            if num < len(val):
+                # unknown components
+                for name in val:
+                    if name not in cont:
+                        out(sep)
+                        out(_json_str(str(name))+':')
+                        _w_any(val[name], out)
+                        sep = ','
+            out('}')
+        return wr
+    
+    def _build_seq_of(self, obj):
+        w = self._writer(obj._cont)
+        def wr(val, out):
+            out('[')
+            sep = ''
+            for v in val:
+                out(sep)
+                w(v, out)
+                sep = ','
+            out(']')
+        return wr
+    
+    def _build_open(self):
+        writer_open = self._writer_open
+        def wr(val, out):
+            if isinstance(val, str):
+                out('"%s"' % hexlify(val))
+                return
+            elif isinstance(val, ASN1.ASN1Lazy):
+                val = (val.name, val.get())
+            elif not _is_named(val):
+                # content type not in the namespace: bare decoded value
+                _w_any(val, out)
+                return
+            out('[%s,' % _json_str(val[0]))
+            writer_open(val[0])(val[1], out)
+            out(']')
+        return wr
+
+def dump_ndjson(obj, vals, fd, GLOB=GLOBAL):
+    """
+    writes all values from the iterable vals, serialized as JSON according
+    to the ASN1Obj obj (from the namespace GLOB), into the file-like fd (one
+    line per value), and returns the number of records written
+    """
+    return ASN1JSONWriter(obj, GLOB).dump_all(vals, fd)
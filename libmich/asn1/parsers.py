@@ -50,9 +50,7 @@ def parse_param(Obj, text=''):
         return text
     #
     # check for "," separator
-    coma_offsets = [-1] + search_top_lvl_sep(text_param, ',') + [len(text_param)]
-    params = map(stripper, [text_param[coma_offsets[i]+1:coma_offsets[i+1]] \
-                              for i in range(len(coma_offsets)-1)])
+    params = split_top_lvl(text_param, ',')
     #
     P = OD()
     for param in params:
@@ -430,9 +428,7 @@ def parse_content_constructed(Obj, text=''):
     return text
 
 def _process_components(Obj, text='', process_tags=True):
-    coma_offsets = [-1] + search_top_lvl_sep(text, ',') + [len(text)]
-    components = map(stripper, [text[coma_offsets[i]+1:coma_offsets[i+1]] \
-                                for i in range(len(coma_offsets)-1)])
+    components = split_top_lvl(text, ',')
     #
     Cont, Ext = OD(), None
     in_ext = False # extension handling
@@ -631,9 +627,7 @@ def parse_content_class(Obj, text=''):
     return text
 
 def _process_fields(Obj, text=''):
-    coma_offsets = [-1] + search_top_lvl_sep(text, ',') + [len(text)]
-    fields = map(stripper, [text[coma_offsets[i]+1:coma_offsets[i+1]] \
-                                for i in range(len(coma_offsets)-1)])
+    fields = split_top_lvl(text, ',')
     #
     Cont = OD()
     for field in fields:
@@ -767,9 +761,7 @@ def parse_content_subtype(Obj, text=''):
     if text_cont is None:
         return text
     #
-    coma_offsets = [-1] + search_top_lvl_sep(text_cont, ',') + [len(text_cont)]
-    args = map(stripper, [text_cont[coma_offsets[i]+1:coma_offsets[i+1]] \
-                                    for i in range(len(coma_offsets)-1)])
+    args = split_top_lvl(text_cont, ',')
     #
     param_cnt = 0
     for arg in args:
@@ -1161,9 +1153,7 @@ def parse_value_seq(Obj, text=''):
     if text_val is None:
         return text
     # sequence of values
-    coma_offsets = [-1] + search_top_lvl_sep(text_val, ',') + [len(text_val)]
-    values = map(stripper, [text_val[coma_offsets[i]+1:coma_offsets[i+1]]
-                            for i in range(len(coma_offsets)-1)])
+    values = split_top_lvl(text_val, ',')
     # gather list of mandatory components
     mand_comp = [name for name in Obj._root_comp if Obj._cont[name]._flags is None]
     #
@@ -1456,9 +1446,7 @@ def parse_set(Obj, text=''):
               % (Obj.get_fullname(), text)))
     #
     # check coma for extension marker
-    coma_offsets = [-1] + search_top_lvl_sep(text_set, ',') + [len(text_set)]
-    sets = map(stripper, [text_set[coma_offsets[i]+1:coma_offsets[i+1]] \
-                          for i in range(len(coma_offsets)-1)])
+    sets = split_top_lvl(text_set, ',')
     #
     Root, Ext = [], None
     if len(sets) == 1:
@@ -1494,9 +1482,7 @@ def parse_set(Obj, text=''):
     
 def parse_set_elements(Obj, text=''):
     # check for | marker
-    or_offsets = [-1] + search_top_lvl_sep(text, '|') + [len(text)]
-    elts = map(stripper, [text[or_offsets[i]+1:or_offsets[i+1]] \
-                          for i in range(len(or_offsets)-1)])
+    elts = split_top_lvl(text, '|')
     #
     val = []
     for elt in elts:
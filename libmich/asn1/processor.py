@@ -27,10 +27,20 @@
 #*/ 
 
 import os
+import mmap
+import hashlib
+from time import time
+from struct import pack, unpack
+from multiprocessing import Pool
+from threading import RLock
 try:
     import cPickle as pickle
 except ImportError:
     import pickle
+try:
+    from cStringIO import StringIO
+except ImportError:
+    from StringIO import StringIO
 #
 from utils import *
 from parsers import *
@@ -44,6 +54,12 @@ from BER import BER
 
 PICKLE_PROTOCOL = 2
 
+# indexed module storage format:
+# magic (8 bytes), index offset (uint64 BE), pickled objects, pickled index
+# index: list of (object name, object mode, object offset, object length)
+# in the compilation order
+MODULE_MAGIC = 'LMASN1\x00\x01'
+
 MODULES = { \
     'RRC3G': 'RRC3G_25331-c10',
     'RRCLTE': 'RRCLTE_36331-c10',
@@ -66,25 +82,39 @@ def compile(texts):
     and setting all compiled ASN.1 values, sets and types in GLOBAL.
     '''
     # 1) parse subtype definition / content
-    if isinstance(texts, str):
-        M = process_modules(texts)
-    elif isinstance(texts, (tuple, list)):
-        M = []
-        for t in texts:
-            M.extend( process_modules(t) )
+    try:
+        if isinstance(texts, str):
+            M = process_modules(texts)
+        elif isinstance(texts, (tuple, list)):
+            M = []
+            for t in texts:
+                M.extend( process_modules(t) )
+    finally:
+        # token streams are only looked-up within a single compilation
+        clear_lex_cache()
     #
     return M
 
-def store_module(mod_list=[], name='test'):
+def store_module(mod_list=[], name='test', indexed=True):
     '''
     Create a Python pickled file in ./modules/ of all ASN.1 values, sets and
     types defined in the modules' list mod_list, which is returned by compile().
     
+    If indexed is True, each object is pickled separately and referenced within
+    an index, so that load_module() can unpickle them on first lookup only.
+    Otherwise, the whole list of objects is pickled at once.
+    
     It can then be loaded quickly within Python.
+    
+    Return None when the module file has been written, or the full list of
+    objects when they could not be pickled (and no module file is written).
     '''
     path = '%s%s.pck' % (get_modules_dir(), name)
+    # write into a temporary file first, which replaces the module file 
+    # only when completely written
+    path_tmp = '%s.%i.tmp' % (path, os.getpid())
     try:
-        fd = open(path, 'wb')
+        fd = open(path_tmp, 'wb')
     except:
         raise(ASN1_PROC('Invalid file path for writing module: %s'\
               % path))
@@ -99,37 +129,189 @@ def store_module(mod_list=[], name='test'):
             elif name in mod['SET']:
                 obj_list.append( (name, mod['SET'][name]) )
     # pickle all of them within a file
-    p = pickle.Pickler(fd, PICKLE_PROTOCOL)
     try:
-        p.dump(obj_list)
+        if indexed:
+            _store_obj_indexed(fd, obj_list)
+        else:
+            p = pickle.Pickler(fd, PICKLE_PROTOCOL)
+            p.dump(obj_list)
     except AssertionError:
+        fd.close()
+        os.remove(path_tmp)
         log('compiled results storage error: pickle AssertionError')
         log('returning full ASN.1 objects\' list')
         return obj_list
     else:
+        fd.close()
+        _replace_file(path_tmp, path)
         log('modules successfully stored in %s' % path)
 
-def load_module(name='', GLOB=GLOBAL):
+def _replace_file(src, dst):
+    try:
+        os.rename(src, dst)
+    except OSError:
+        # Windows does not replace existing file
+        os.remove(dst)
+        os.rename(src, dst)
+
+# types of objects that can be shared between several compiled objects
+_SHARED_TYPES = (ASN1.ASN1Obj, OD, list, dict)
+
+def _store_obj_indexed(fd, obj_list):
+    # each object is pickled on its own, together with the list of its 
+    # internal objects which are also referenced by objects pickled after it;
+    # references to objects owned by a previous object are replaced with
+    # (owner position, position in the owner's shared list), as pickle 
+    # persistent id, hence only DAG of references are produced, which can be
+    # loaded lazily
+    #
+    # 1) get the owner of each object (1st compiled object referencing it),
+    # and the list of shared objects for each owner
+    owner, shared, keep = {}, [[] for i in range(len(obj_list))], []
+    for i, (name, obj) in enumerate(obj_list):
+        #
+        def scan_id(o, cur=i):
+            if not isinstance(o, _SHARED_TYPES):
+                return None
+            ref = owner.get(id(o))
+            if ref is None:
+                owner[id(o)] = [cur, None]
+                keep.append(o)
+                return None
+            elif ref[0] < cur:
+                if ref[1] is None:
+                    ref[1] = len(shared[ref[0]])
+                    shared[ref[0]].append(o)
+                return tuple(ref)
+            return None
+        #
+        p = pickle.Pickler(StringIO(), PICKLE_PROTOCOL)
+        p.persistent_id = scan_id
+        p.dump(obj)
+    #
+    # 2) pickle each object with its shared list
+    index = []
+    fd.write(MODULE_MAGIC)
+    fd.write(pack('>Q', 0))
+    off = fd.tell()
+    for i, (name, obj) in enumerate(obj_list):
+        #
+        def persistent_id(o, cur=i):
+            if not isinstance(o, _SHARED_TYPES):
+                return None
+            ref = owner.get(id(o))
+            if ref is not None and ref[0] < cur:
+                return tuple(ref)
+            return None
+        #
+        buf = StringIO()
+        p = pickle.Pickler(buf, PICKLE_PROTOCOL)
+        p.persistent_id = persistent_id
+        p.dump( (obj, shared[i]) )
+        buf = buf.getvalue()
+        fd.write(buf)
+        index.append( (name, obj._mode, off, len(buf)) )
+        off += len(buf)
+    pickle.dump(index, fd, PICKLE_PROTOCOL)
+    fd.seek(len(MODULE_MAGIC))
+    fd.write(pack('>Q', off))
+
+class ModuleLoader(object):
     '''
-    Return the list of modules compiled by compile() and pickled by 
-    store_module() under a given name.
+    Lazy loader for modules stored by store_module() in the indexed format.
+    
+    Each object is unpickled on first call to load() with its position in the
+    index, objects referenced by it being loaded recursively.
+    
+    Loading is serialized with a lock, so that an object looked-up for the 
+    first time from several threads is unpickled only once.
+    '''
+    def __init__(self, path):
+        fd = open(path, 'rb')
+        try:
+            self._buf = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            fd.close()
+        if self._buf[:len(MODULE_MAGIC)] != MODULE_MAGIC:
+            raise(ASN1_PROC('Invalid indexed module: %s' % path))
+        off = len(MODULE_MAGIC)
+        off_index = unpack('>Q', self._buf[off:off+8])[0]
+        self.index = pickle.loads(self._buf[off_index:])
+        self._obj = {}
+        # reentrant, as shared objects are loaded recursively
+        self._lock = RLock()
+    
+    def __len__(self):
+        return len(self.index)
+    
+    def load(self, ind):
+        return self._load(ind)[0]
+    
+    def _load(self, ind):
+        if ind in self._obj:
+            return self._obj[ind]
+        with self._lock:
+            # another thread may have loaded it in the meantime
+            if ind in self._obj:
+                return self._obj[ind]
+            name, mode, off, length = self.index[ind]
+            p = pickle.Unpickler(StringIO(self._buf[off:off+length]))
+            p.persistent_load = self._load_shared
+            self._obj[ind] = p.load()
+            if len(self._obj) == len(self.index):
+                # everything is loaded, the file is not required anymore
+                self._buf.close()
+            return self._obj[ind]
+    
+    def _load_shared(self, ref):
+        return self._load(ref[0])[1][ref[1]]
+    
+    def load_all(self):
+        return [(self.index[i][0], self.load(i)) for i in range(len(self.index))]
+
+def load_module(name='', GLOB=GLOBAL, lazy=True):
+    '''
+    Load into GLOB the list of ASN.1 objects compiled by compile() and pickled 
+    by store_module() under a given name.
+    
+    For modules stored in the indexed format, if lazy is True, all objects' 
+    names are registered in GLOB, but each object is only unpickled on its 
+    first lookup in GLOB.TYPE, GLOB.VALUE or GLOB.SET.
     '''
     path = '%s%s.pck' % (get_modules_dir(), os.path.basename(name))
     if not os.path.exists(path):
         raise(ASN1_PROC('invalid module name: %s' % name))
     fd = open(path, 'rb')
-    p = pickle.Unpickler(fd)
-    try:
-        obj_list = p.load()
-    except:
-        raise(ASN1_PROC('Invalid module content'))
+    indexed = fd.read(len(MODULE_MAGIC)) == MODULE_MAGIC
+    if indexed:
+        fd.close()
+        try:
+            loader = ModuleLoader(path)
+        except:
+            raise(ASN1_PROC('Invalid module content'))
+        if lazy:
+            obj_list = [(obj_name, mode, LazyRef(loader, i)) for i, \
+                        (obj_name, mode, off, length) in enumerate(loader.index)]
+        else:
+            obj_list = [(obj_name, obj['mode'], obj) \
+                        for obj_name, obj in loader.load_all()]
+    else:
+        fd.seek(0)
+        p = pickle.Unpickler(fd)
+        try:
+            obj_list = [(obj_name, obj['mode'], obj) \
+                        for obj_name, obj in p.load()]
+        except:
+            raise(ASN1_PROC('Invalid module content'))
+        finally:
+            fd.close()
     #GLOB.clear()
-    for obj_name, obj in obj_list:
-        if obj['mode'] == 0:
+    for obj_name, mode, obj in obj_list:
+        if mode == 0:
             GLOB.TYPE[obj_name] = obj
-        elif obj['mode'] == 1:
+        elif mode == 1:
             GLOB.VALUE[obj_name] = obj
-        elif obj['mode'] == 2:
+        elif mode == 2:
             GLOB.SET[obj_name] = obj
     log('%s: %s objects loaded into %s' % (name, len(obj_list), GLOB.__name__))
 
@@ -138,24 +320,114 @@ def generate_modules(mods=MODULES):
     Generate all ASN.1 Python pickled modules according to the MODULES dict
     '''
     for name in mods:
-        # get the list of ASN.1 files to compile
-        asndir = '%s%s%s' % (get_asn_dir(), mods[name], os.path.sep)
-        fd = open('%sload.txt' % asndir, 'r')
-        asnlist = fd.readlines()
+        generate_module(name, mods[name])
+    GLOBAL.clear()
+
+def generate_module(name, dirname):
+    '''
+    Generate the ASN.1 Python pickled module name, from the ASN.1 files listed
+    in the load.txt file of the asn/dirname/ directory
+    
+    Return True when the module file has been written
+    '''
+    asndir = '%s%s%s' % (get_asn_dir(), dirname, os.path.sep)
+    GLOBAL.clear()
+    M = []
+    for asn in get_module_files(dirname):
+        fd = open('%s%s' % (asndir, asn), 'r')
+        text = fd.read()
         fd.close()
-        asnlist = [l.replace('\n', '') for l in asnlist \
-                   if len(l) and l[0] != '#']
-        #
-        GLOBAL.clear()
-        M = []
-        for asn in asnlist:
-            fd = open('%s%s' % (asndir, asn), 'r')
-            text = fd.read()
-            fd.close()
-            log('processing %s' % asn)
-            M.extend( compile(text) )
-        store_module(M, name)
+        log('processing %s' % asn)
+        M.extend( compile(text) )
+    return store_module(M, name) is None
+
+def get_module_files(dirname):
+    '''
+    Return the list of ASN.1 files to compile from the load.txt file of the 
+    asn/dirname/ directory
+    '''
+    fd = open('%s%s%sload.txt' % (get_asn_dir(), dirname, os.path.sep), 'r')
+    asnlist = fd.readlines()
+    fd.close()
+    return [l.replace('\n', '') for l in asnlist if len(l) and l[0] != '#']
+
+def get_module_hash(dirname):
+    '''
+    Return the MD5 hexdigest of the load.txt file and all ASN.1 files listed
+    in it for the asn/dirname/ directory
+    '''
+    asndir = '%s%s%s' % (get_asn_dir(), dirname, os.path.sep)
+    h = hashlib.md5(MODULE_MAGIC)
+    for fn in ['load.txt'] + get_module_files(dirname):
+        fd = open('%s%s' % (asndir, fn), 'rb')
+        h.update('%s\0%s\0' % (fn, fd.read()))
+        fd.close()
+    return h.hexdigest()
+
+def _build_module(args):
+    # run within a process of the build_modules() pool,
+    # with its own GLOBAL namespace
+    name, dirname, digest = args
+    T0 = time()
+    stored = generate_module(name, dirname)
     GLOBAL.clear()
+    if not stored:
+        # no digest, for the module to be built again next time
+        return name, None
+    path = '%s%s.md5' % (get_modules_dir(), name)
+    path_tmp = '%s.%i.tmp' % (path, os.getpid())
+    fd = open(path_tmp, 'w')
+    fd.write(digest)
+    fd.close()
+    _replace_file(path_tmp, path)
+    return name, time() - T0
+
+def build_modules(mods=MODULES, workers=None, force=False):
+    '''
+    Generate all ASN.1 Python pickled modules according to the MODULES dict,
+    only for those whose ASN.1 files have changed since their last build
+    (unless force is True).
+    
+    Each module is compiled in a separate process of a pool of workers 
+    processes (by default, as many as CPUs), and stored with the MD5 digest of
+    its ASN.1 files in modules/name.md5.
+    
+    Return the list of modules built (those which could not be stored are
+    not listed, and will be built again on the next call).
+    '''
+    todo = []
+    for name in mods:
+        digest = get_module_hash(mods[name])
+        path = '%s%s' % (get_modules_dir(), name)
+        if not force and os.path.exists('%s.pck' % path) \
+        and os.path.exists('%s.md5' % path) \
+        and open('%s.md5' % path, 'r').read() == digest:
+            log('%s: unchanged, skipped' % name)
+        else:
+            todo.append( (name, mods[name], digest) )
+    if not todo:
+        return []
+    # compile the largest modules first
+    todo.sort(key=lambda t: -sum([os.path.getsize('%s%s%s%s' \
+              % (get_asn_dir(), t[1], os.path.sep, fn)) \
+              for fn in get_module_files(t[1])]))
+    #
+    T0 = time()
+    # each worker process is used only once, for a clean GLOBAL and MODULE_OPT
+    pool = Pool(workers, maxtasksperchild=1)
+    built = []
+    try:
+        for name, duration in pool.imap_unordered(_build_module, todo):
+            if duration is None:
+                log('%s: storage failed' % name)
+            else:
+                log('%s: built in %.2f sec.' % (name, duration))
+                built.append(name)
+    finally:
+        pool.close()
+        pool.join()
+    log('%i modules built in %.2f sec.' % (len(built), time() - T0))
+    return [t[0] for t in todo if t[0] in built]
 
 def inline(text=''):
     '''
@@ -167,8 +439,11 @@ def inline(text=''):
     Obj, rest = get_single_assignment(lines)
     if Obj is not None:
         GLOBAL.clear_tmp()
-        init_assignment(Obj)
-        process_assignment(Obj)
+        try:
+            init_assignment(Obj)
+            process_assignment(Obj)
+        finally:
+            clear_lex_cache()
     return Obj
 
 def get_modules_dir():
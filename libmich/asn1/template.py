@@ -0,0 +1,370 @@
+# -*- coding: UTF-8 -*-
+#/**
+# * Software Name : libmich 
+# * Version : 0.2.3
+# *
+# * Copyright © 2026. agent.
+# *
+# * This program is free software: you can redistribute it and/or modify
+# * it under the terms of the GNU General Public License version 2 as published
+# * by the Free Software Foundation. 
+# *
+# * This program is distributed in the hope that it will be useful,
+# * but WITHOUT ANY WARRANTY; without even the implied warranty of
+# * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# * GNU General Public License for more details. 
+# *
+# * You will find a copy of the terms and conditions of the GNU General Public
+# * License version 2 in the "license.txt" file or
+# * see http://www.gnu.org/licenses/ or write to the Free Software Foundation,
+# * Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+# *
+# *--------------------------------------------------------
+# * File Name : asn1/template.py
+# * Created : 2026-10-19
+# * Authors : agent 
+# *--------------------------------------------------------
+#*/
+
+# export filter
+__all__ = ['ASN1Template']
+
+from binascii import hexlify, unhexlify
+#
+from libmich.core.element import Layer
+#
+from utils import *
+from processor import ASN1, PER
+from PER import _PER_L, _PER_NSVAL
+
+################################################################################
+# ASN.1 encoding templates
+# bulk generation of messages which differ only in a few fields:
+# the value is encoded once, the bit offset and width of each variable field
+# is recorded, and each new encoding only requires to encode the fields' values
+# and to patch them into the template's bits
+#
+# when a field changes in width (PER only), the innermost OPEN TYPE (or
+# OCTET STRING CONTAINING) content holding it is encoded again, and the length
+# determinants of all enclosing ones are updated; in any other case, the whole
+# value is encoded again
+################################################################################
+
+def _layer_bits(msg):
+    # returns the encoded bits of a Layer, as (integer, bit length)
+    bl = msg.bit_len()
+    if not bl:
+        return 0, 0
+    buf = str(msg)
+    return int(hexlify(buf), 16) >> (8*len(buf) - bl), bl
+
+def _set_path(val, path, v):
+    # returns a copy of val, where the value at path is replaced with v;
+    # only the containers along path are copied
+    if not path:
+        return v
+    k = path[0]
+    if isinstance(val, dict):
+        val = dict(val)
+        val[k] = _set_path(val[k], path[1:], v)
+        return val
+    elif isinstance(val, list):
+        val = list(val)
+        val[k] = _set_path(val[k], path[1:], v)
+        return val
+    else:
+        # CHOICE, OPEN TYPE or CONTAINING value: (name, value)
+        return (val[0], _set_path(val[1], path[1:], v))
+
+def _get_path(val, path):
+    for k in path:
+        if isinstance(val, (dict, list)):
+            val = val[k]
+        else:
+            val = val[1]
+    return val
+
+
+class ASN1Template(object):
+    '''
+    Encoding template for bulk generation of messages:
+
+    ASN1Template(obj, val, fields, ctx=None)
+
+    obj: ASN1Obj to encode
+    val: template value for obj
+    fields: dict {field name: path}, path being the list of keys to the
+        field's value within val (component names for SEQUENCE / SET,
+        alternative names for CHOICE, item indexes for SEQUENCE OF / SET OF,
+        type names for OPEN TYPE and CONTAINING values)
+    ctx: ASN1Ctx, to encode within this context
+
+    .encode(vals) returns the encoding of the template value, with fields
+    set to vals ({field name: value}); .encode_batch(vals_list) returns the
+    list of encodings for each dict of fields' values.
+
+    Fields must not be nested, must be present in the template value and
+    must not be set to their DEFAULT value.
+    '''
+
+    def __init__(self, obj, val, fields, ctx=None):
+        self._obj = obj
+        self._ctx = ctx
+        if ctx is not None:
+            with ctx:
+                self._build(val, fields)
+        else:
+            self._build(val, fields)
+        # counters of patched, partially and fully re-encoded messages
+        self.patched, self.partial, self.full = 0, 0, 0
+
+    def __repr__(self):
+        return '<ASN1Template %s: %s>' % (self._obj.get_name(),
+                                          ', '.join(self._fields.keys()))
+
+    #--------------------------------------------------------------------------#
+    # template building
+    #--------------------------------------------------------------------------#
+    def _build(self, val, fields):
+        self._obj.encode(val)
+        self._val = self._obj()
+        self._bits, self._bitlen = _layer_bits(self._obj._msg)
+        self._per = isinstance(self._obj._codec, PER)
+        # boundaries: {content path: [kind, content obj, L offset,
+        #                             L bit length, content offset,
+        #                             content bit length]}
+        self._bnd = {}
+        # fields: {name: (path, field obj, offset, bit length,
+        #                 list of boundary paths, innermost first)}
+        self._fields = {}
+        for name, path in fields.items():
+            self._fields[name] = self._locate(name, tuple(path))
+        # check that fields do not overlap
+        rng = sorted([(f[2], f[2]+f[3], n) for n, f in self._fields.items()])
+        for i in range(1, len(rng)):
+            if rng[i][0] < rng[i-1][1]:
+                raise(ASN1_OBJ('template: fields %s and %s are overlapping'\
+                      % (rng[i-1][2], rng[i][2])))
+
+    def _locate(self, name, path):
+        # walk the ASN1Obj, its value and its encoded Layer in parallel
+        obj, val, msg, off = self._obj, self._val, self._obj._msg, 0
+        chain = []
+        for i, k in enumerate(path):
+            bnd = None
+            if obj._type in (TYPE_SEQ, TYPE_SET, TYPE_CLASS):
+                if not isinstance(val, dict) or k not in val:
+                    raise(ASN1_OBJ('template: field %s, missing component %s'\
+                          % (name, k)))
+                if obj._ext and k in obj._ext_flat:
+                    if k not in obj._ext:
+                        raise(ASN1_OBJ('template: field %s, grouped '\
+                              'extension %s unsupported' % (name, k)))
+                    bnd = 'open'
+                cont, val = obj._cont[k], val[k]
+                m_name = k
+            elif obj._type == TYPE_CHOICE:
+                if val[0] != k:
+                    raise(ASN1_OBJ('template: field %s, CHOICE %s not '\
+                          'selected' % (name, k)))
+                if obj._ext and k in obj._ext:
+                    bnd = 'open'
+                cont, val = obj._cont[k], val[1]
+                m_name = k
+            elif obj._type in (TYPE_SEQ_OF, TYPE_SET_OF):
+                if not isinstance(k, (int, long)) or k >= len(val):
+                    raise(ASN1_OBJ('template: field %s, invalid item %s'\
+                          % (name, k)))
+                cont, val = obj._cont, val[k]
+                m_name = k
+            elif obj._type in (TYPE_OPEN, TYPE_ANY):
+                if not isinstance(val, tuple) or val[0] != k \
+                or k not in GLOBAL.TYPE:
+                    raise(ASN1_OBJ('template: field %s, OPEN TYPE %s not '\
+                          'set' % (name, k)))
+                cont, val = GLOBAL.TYPE[k], val[1]
+                bnd = 'open'
+                m_name = k
+            elif obj._type in (TYPE_OCTET_STR, TYPE_BIT_STR) \
+            and isinstance(obj._cont, ASN1.ASN1Obj) and isinstance(val, tuple) \
+            and val[0] == k == obj._cont._name:
+                cont, val = obj._cont, val[1]
+                if obj._type == TYPE_OCTET_STR:
+                    bnd = 'contain'
+                m_name = k
+            else:
+                raise(ASN1_OBJ('template: field %s, invalid path %s'\
+                      % (name, list(path[:i+1]))))
+            #
+            # get the Layer of the component, and its offset
+            ind = self._get_msg_ind(obj, msg, m_name)
+            if ind is None:
+                raise(ASN1_OBJ('template: field %s, no encoding for %s'\
+                      % (name, list(path[:i+1]))))
+            msg_off = [off]
+            for e in msg.elementList[:ind]:
+                msg_off.append(msg_off[-1] + e.bit_len())
+            #
+            # check for a byte-length determinant for the component
+            if bnd and self._per:
+                j = ind-1
+                if j >= 0 and msg[j].CallName == 'P':
+                    j -= 1
+                cw = msg[ind].bit_len()
+                if j >= 0 and isinstance(msg[j], _PER_L) \
+                and not msg[j].is_frag() and msg[j]() == cw//8:
+                    if path[:i+1] not in self._bnd:
+                        self._bnd[path[:i+1]] = [bnd, cont.clone_light(),
+                                                 msg_off[j], msg[j].bit_len(),
+                                                 msg_off[ind], cw]
+                    chain.insert(0, path[:i+1])
+            #
+            obj, msg, off = cont, msg[ind], msg_off[ind]
+        #
+        return (path, obj.clone_light(), off, msg.bit_len(), chain)
+
+    def _get_msg_ind(self, obj, msg, m_name):
+        # returns the index of the Layer for the given component
+        # (or SEQUENCE OF item index) within msg
+        if isinstance(m_name, str):
+            for i, e in enumerate(msg.elementList):
+                if isinstance(e, Layer) and e.CallName == m_name:
+                    return i
+            return None
+        # unnamed items are encoded in Layers with the default CallName
+        it_name = obj._cont.get_name() or 'Layer'
+        cnt = 0
+        for i, e in enumerate(msg.elementList):
+            if isinstance(e, Layer) and e.CallName == it_name \
+            and not isinstance(e, (_PER_L, _PER_NSVAL)):
+                if cnt == m_name:
+                    return i
+                cnt += 1
+        return None
+
+    #--------------------------------------------------------------------------#
+    # encoding
+    #--------------------------------------------------------------------------#
+    def encode(self, vals={}):
+        '''
+        returns the encoding of the template value with fields set to vals
+        '''
+        if self._ctx is not None:
+            with self._ctx:
+                return self._encode(vals)
+        return self._encode(vals)
+
+    def encode_batch(self, vals_list):
+        '''
+        returns the list of encodings for each dict of fields' values
+        '''
+        if self._ctx is not None:
+            with self._ctx:
+                return map(self._encode, vals_list)
+        return map(self._encode, vals_list)
+
+    def _encode(self, vals):
+        # edits: list of (start, end, bits, bit length) to replace
+        # template bits from start to end
+        edits, units = [], set()
+        full = False
+        for name, v in vals.items():
+            path, fobj, off, bl, chain = self._fields[name]
+            fobj.set_val(v)
+            fobj._encode(offset=off)
+            fobj._val = None
+            if hasattr(fobj, '_not_encoded'):
+                # DEFAULT value set, the parent's bitmap needs to be updated
+                del fobj._not_encoded
+                full = True
+                break
+            bits, fbl = _layer_bits(fobj._msg)
+            if fbl == bl:
+                edits.append((off, off+bl, bits, fbl))
+            elif chain:
+                units.add(chain[0])
+            else:
+                full = True
+                break
+        #
+        if full:
+            return self._encode_full(vals)
+        if units:
+            buf = self._encode_units(vals, edits, units)
+            if buf is None:
+                return self._encode_full(vals)
+            self.partial += 1
+            return buf
+        self.patched += 1
+        return self._apply(edits)
+
+    def _get_val(self, vals):
+        val = self._val
+        for name, v in vals.items():
+            val = _set_path(val, self._fields[name][0], v)
+        return val
+
+    def _encode_full(self, vals):
+        self.full += 1
+        self._obj.encode(self._get_val(vals))
+        return str(self._obj._msg)
+
+    def _encode_units(self, vals, edits, units):
+        # keep only outermost units
+        units = [u for u in units \
+                 if not any([u[:len(o)] == o for o in units if o != u])]
+        bnds = set(units)
+        for u in units:
+            b = self._bnd[u]
+            # drop fields' edits within re-encoded units
+            edits = [e for e in edits if not b[4] <= e[0] < b[4]+b[5]]
+            # all enclosing boundaries require a new length determinant
+            for p in self._bnd:
+                if len(p) < len(u) and u[:len(p)] == p:
+                    bnds.add(p)
+        #
+        # 1) encode units' content
+        val = self._get_val(vals)
+        for u in units:
+            kind, cont, l_off, l_bl, c_off, c_bl = self._bnd[u]
+            cont.set_val(_get_path(val, u))
+            cont._encode(offset=0)
+            cont._val = None
+            if kind == 'open' and cont._msg.bit_len() == 0:
+                cont._codec._add_P(cont, 8)
+            else:
+                cont._codec._add_P(cont)
+            bits, bl = _layer_bits(cont._msg)
+            edits.append((c_off, c_off+c_bl, bits, bl))
+        #
+        # 2) update length determinants, from the innermost boundaries
+        for p in sorted(bnds, key=len, reverse=True):
+            kind, cont, l_off, l_bl, c_off, c_bl = self._bnd[p]
+            c_end = c_off + c_bl
+            bl = c_bl + sum([e[3]-e[1]+e[0] for e in edits \
+                             if c_off <= e[0] and e[1] <= c_end])
+            if bl >= 131072:
+                # fragmented content
+                return None
+            bits, bl = _layer_bits(_PER_L(bl//8))
+            edits.append((l_off, l_off+l_bl, bits, bl))
+        #
+        return self._apply(edits)
+
+    def _apply(self, edits):
+        # rebuild the encoding from template bits and edits
+        B, N = self._bits, self._bitlen
+        res, pos = 0, 0
+        for start, end, bits, bl in sorted(edits):
+            if start > pos:
+                res = (res << (start-pos)) \
+                      | ((B >> (N-start)) & ((1 << (start-pos)) - 1))
+            res = (res << bl) | bits
+            pos = end
+        if N > pos:
+            res = (res << (N-pos)) | (B & ((1 << (N-pos)) - 1))
+        bl = N + sum([e[3]-e[1]+e[0] for e in edits])
+        if not bl:
+            return ''
+        pad = (8 - bl%8) % 8
+        return unhexlify('%0*x' % ((bl+pad)//4, res << pad))
@@ -26,14 +26,21 @@
 # *--------------------------------------------------------
 #*/ 
 
+import json
 from time import time
+from StringIO import StringIO
 
 from libmich.utils.repr import *
 
 import ASN1
 from PER import PER
+from BER import BER
 from utils import *
+from utils import _make_GLOBAL
 from processor import inline, compile, export, load_module, GLOBAL
+from template import ASN1Template
+from ndjson import ASN1JSONWriter
+from libmich.utils.cache import LRUCache
 
 def test_def(print_info=True):
     
@@ -673,6 +680,187 @@ def test_per_sequence(print_info=True):
     b.decode(str(a))
     assert(a() == b())
 
+def test_per_frag(print_info=True):
+    
+    ASN1.ASN1Obj._SAFE = True
+    ASN1.ASN1Obj._RET_STRUCT = True
+    ASN1.ASN1Obj.CODEC = PER
+    
+    MODULE_OPT.TAG = TAG_AUTO
+    
+    for v in ('A', 'U'):
+        PER.VARIANT = v
+        if print_info: print('testing fragmented OCTET STRING encoding / '\
+                             'decoding (PER variant %s)' % v)
+        a = inline('''
+            A ::= OCTET STRING
+            ''')
+        b = a.clone()
+        a.encode(16384*'A')
+        assert(str(a).encode('hex') == 'c1' + 16384*'41' + '00')
+        b.decode(str(a))
+        assert(a() == b())
+        a.encode(100000*'B')
+        assert(str(a).encode('hex') == 'c4' + 65536*'42' + 'c2' + 32768*'42' + \
+                              '86a0' + 1696*'42')
+        b.decode(str(a))
+        assert(a() == b())
+        a = inline('''
+            A ::= OCTET STRING (SIZE(1..100000))
+            ''')
+        b = a.clone()
+        a.encode(70000*'C')
+        assert(str(a).encode('hex') == 'c4' + 65536*'43' + '9170' + 4464*'43')
+        b.decode(str(a))
+        assert(a() == b())
+        #
+        if print_info: print('testing fragmented BIT STRING encoding / '\
+                             'decoding (PER variant %s)' % v)
+        a = inline('''
+            A ::= BIT STRING
+            ''')
+        b = a.clone()
+        a.encode(((1<<20000)-3, 20000))
+        b.decode(str(a))
+        assert(a() == b())
+        assert(str(a).encode('hex')[:6] == 'c1ffff' and a._msg.bit_len() == 20024)
+        #
+        if print_info: print('testing fragmented SEQUENCE OF encoding / '\
+                             'decoding (PER variant %s)' % v)
+        a = inline('''
+            A ::= SEQUENCE (SIZE(1..70000)) OF INTEGER (0..7)
+            ''')
+        b = a.clone()
+        a.encode([i%8 for i in range(16384)])
+        assert(str(a).encode('hex') == 'c1' + 2048*'053977' + '00')
+        b.decode(str(a))
+        assert(a() == b())
+        #
+        if print_info: print('testing fragmented OPEN TYPE encoding / '\
+                             'decoding (PER variant %s)' % v)
+        a = inline('''
+            A ::= SEQUENCE {
+                a1  INTEGER (0..127),
+                ...,
+                a2  OCTET STRING OPTIONAL
+                }
+            ''')
+        b = a.clone()
+        a.encode({'a1':1, 'a2':40000*'D'})
+        b.decode(str(a))
+        assert(a() == b())
+    PER.VARIANT = 'A'
+
+def test_ctx(print_info=True):
+    
+    ASN1.ASN1Obj._SAFE = True
+    ASN1.ASN1Obj._RET_STRUCT = True
+    ASN1.ASN1Obj.CODEC = PER
+    PER.VARIANT = 'A'
+    
+    MODULE_OPT.TAG = TAG_AUTO
+    
+    if print_info: print('testing encoding / decoding within contexts')
+    a = inline('''
+        A ::= SEQUENCE {
+            a1  INTEGER (0..255),
+            a2  OCTET STRING (SIZE(1..8))
+            }
+        ''')
+    a.encode({'a1':5, 'a2':'xyz'})
+    buf5 = str(a)
+    a.encode({'a1':2, 'a2':'def'})
+    buf2 = str(a)
+    a.encode({'a1':1, 'a2':'abc'})
+    buf1 = str(a)
+    ctx1, ctx2 = ASN1.ASN1Ctx(), ASN1.ASN1Ctx(VARIANT='U')
+    a.decode(buf2, ctx=ctx1)
+    # the object is left unchanged outside of the context
+    assert( a() == {'a1':1, 'a2':'abc'} and str(a) == buf1 )
+    assert( ctx1.get(a) == {'a1':2, 'a2':'def'} )
+    # nested contexts
+    with ctx1:
+        a.encode({'a1':3, 'a2':'ghi'})
+        with ctx2:
+            a.encode({'a1':4, 'a2':'jklmnopq'})
+            assert( a() == {'a1':4, 'a2':'jklmnopq'} )
+        assert( a() == {'a1':3, 'a2':'ghi'} and str(a) != buf1 )
+    assert( ctx2.get(a) == {'a1':4, 'a2':'jklmnopq'} )
+    assert( a() == {'a1':1, 'a2':'abc'} and str(a) == buf1 )
+    # state restored after an exception raised within a context
+    try:
+        with ctx1:
+            a.decode(buf5)
+            raise(ValueError())
+    except ValueError:
+        pass
+    assert( ASN1._CTX.cur is None and not ASN1._CTX.stack )
+    assert( '_val' not in ASN1.ASN1Obj.__dict__ )
+    assert( a() == {'a1':1, 'a2':'abc'} )
+    assert( ctx1.get(a) == {'a1':5, 'a2':'xyz'} )
+    # a reused context does not keep the state of previous decodings
+    b = inline('''
+        B ::= SEQUENCE (SIZE(1..16)) OF SEQUENCE {
+            b1  INTEGER (0..255),
+            b2  OCTET STRING (SIZE(1..8))
+            }
+        ''')
+    ctx, num = ASN1.ASN1Ctx(), None
+    for i in range(1, 17) + [1]:
+        val = [{'b1':j, 'b2':'b%i' % j} for j in range(i)]
+        b.encode(val, ctx=ctx)
+        with ctx:
+            buf = str(b)
+        b.decode(buf, ctx=ctx)
+        assert( ctx.get(b) == val )
+        if i == 1 and num is None:
+            num = sum(map(len, ctx._attr.values()))
+    assert( sum(map(len, ctx._attr.values())) == num )
+    ctx.clear()
+    assert( sum(map(len, ctx._attr.values())) == 0 )
+
+def test_dec_cache(print_info=True):
+    
+    ASN1.ASN1Obj._SAFE = True
+    ASN1.ASN1Obj._RET_STRUCT = True
+    ASN1.ASN1Obj.CODEC = PER
+    PER.VARIANT = 'A'
+    
+    MODULE_OPT.TAG = TAG_AUTO
+    
+    if print_info: print('testing decoding with the decode cache')
+    a = inline('''
+        A ::= SEQUENCE {
+            a1  INTEGER (0..255),
+            a2  SEQUENCE (SIZE(1..8)) OF INTEGER (0..7)
+            }
+        ''')
+    cache = ASN1.ASN1Obj._DEC_CACHE
+    ASN1.ASN1Obj._DEC_CACHE = LRUCache(num=2, size=1024)
+    try:
+        a.encode({'a1':1, 'a2':[1, 2, 3]})
+        buf1 = str(a)
+        a.encode({'a1':2, 'a2':[4]})
+        buf2 = str(a)
+        a.decode(buf1)
+        val = a()
+        assert( val == {'a1':1, 'a2':[1, 2, 3]} )
+        # a hit returns an independent copy of the cached value
+        val['a2'].append(4)
+        a.decode(buf1)
+        assert( a() == {'a1':1, 'a2':[1, 2, 3]} and a() is not val )
+        assert( str(a) == buf1 )
+        a.decode(buf2)
+        assert( a() == {'a1':2, 'a2':[4]} and str(a) == buf2 )
+        a.decode(buf1)
+        c = ASN1.ASN1Obj._DEC_CACHE
+        assert( (c.hits, c.misses, len(c)) == (2, 2, 2) )
+        # decoding with arguments bypasses the cache
+        a.decode(buf2, select=[('a1',)])
+        assert( a() == {'a1':2, 'a2':[4]} and (c.hits, c.misses) == (2, 2) )
+    finally:
+        ASN1.ASN1Obj._DEC_CACHE = cache
+
 def _test_s1ap_prep():
     GLOBAL.clear()
     try:
@@ -719,10 +907,120 @@ def _test_s1ap(pkts):
     #
     return time() - T0
 
+def _test_s1ap_template(pkts):
+    # InitialContextSetupRequest template, with UE ids, TEID and NAS-PDU
+    pdu = GLOBAL.TYPE['S1AP-PDU']
+    pdu.decode(pkts[5])
+    ies = ['initiatingMessage', 'value', 'InitialContextSetupRequest', 
+           'protocolIEs']
+    erab = ies + [3, 'value', 'E-RABToBeSetupListCtxtSUReq', 0, 'value', 
+                  'E-RABToBeSetupItemCtxtSUReq']
+    tmpl = ASN1Template(pdu, pdu(), {
+            'mme': ies + [0, 'value', 'MME-UE-S1AP-ID'],
+            'enb': ies + [1, 'value', 'ENB-UE-S1AP-ID'],
+            'teid': erab + ['gTP-TEID'],
+            'nas': erab + ['nAS-PDU']})
+    assert( tmpl.encode() == pkts[5] )
+    vals = [{'mme': 101, 'teid': '\x00\x00\x00\x01'},
+            {'mme': 100000, 'enb': 300},
+            {'enb': 2, 'nas': 200*'\0'},
+            {'mme': 2**32-1, 'nas': 'abc'}]
+    for v, buf in zip(vals, tmpl.encode_batch(vals)):
+        pdu.encode(tmpl._get_val(v))
+        assert( buf == str(pdu) )
+    assert( (tmpl.patched, tmpl.partial, tmpl.full) == (2, 3, 0) )
+
+def _test_s1ap_ndjson(pkts):
+    pdu = GLOBAL.TYPE['S1AP-PDU']
+    fd = StringIO()
+    assert( ASN1JSONWriter(pdu).dump_bufs(pkts, fd) == len(pkts) )
+    recs = map(json.loads, fd.getvalue().splitlines())
+    assert( len(recs) == len(pkts) )
+    # S1SetupRequest
+    ies = recs[0][1]['value'][1]['protocolIEs']
+    assert( ies[0]['value'] == ['Global-ENB-ID', 
+            {'pLMNidentity': '63f310', 'eNB-ID': ['macroENB-ID', [107216, 20]]}] )
+    assert( ies[1]['value'] == ['ENBname', 'enb1a2d0'] )
+    assert( ies[3]['value'] == ['PagingDRX', 'v128'] )
+    # OPEN TYPE content decoded without its type name: bare value
+    pdu.decode(pkts[0])
+    val = pdu()
+    val[1]['value'][1]['protocolIEs'][1]['value'] = {'drx': 128}
+    val[1]['value'][1]['protocolIEs'][3]['value'] = 'v128'
+    rec = json.loads(ASN1JSONWriter(pdu).dumps(val))
+    assert( rec[1]['value'][1]['protocolIEs'][1]['value'] == {'drx': 128} )
+    assert( rec[1]['value'][1]['protocolIEs'][3]['value'] == '76313238' )
+    pdu.decode(pkts[0])
+    val = pdu()
+    # OPEN TYPE contents looked-up in another namespace (here, an empty one):
+    # written as untyped values, with strings in hexadecimal
+    rec = json.loads(ASN1JSONWriter(pdu, _make_GLOBAL('GLOBAL_EMPTY')).dumps(val))
+    assert( rec[1]['value'][0] == 'S1SetupRequest' )
+    assert( rec[1]['value'][1]['protocolIEs'][3]['value'] == 
+            ['PagingDRX'.encode('hex'), 'v128'.encode('hex')] )
+
 def test_s1ap():
     pkts = _test_s1ap_prep()
     if pkts is not None:
         void = _test_s1ap(pkts)
+        _test_s1ap_template(pkts)
+        _test_s1ap_ndjson(pkts)
+
+def test_select():
+    pkts = _test_s1ap_prep()
+    if pkts is None:
+        return
+    pdu = GLOBAL.TYPE['S1AP-PDU']
+    pdu.decode(pkts[0])
+    ref = pdu()
+    ies = ref[1]['value'][1]['protocolIEs']
+    # only the ENBname IE content is decoded, other ones are kept as buffers
+    pdu.decode(pkts[0], select=[('initiatingMessage', 'value', 
+               'S1SetupRequest', 'protocolIEs', 'value', 'ENBname')])
+    val = pdu()
+    sel = val[1]['value'][1]['protocolIEs']
+    assert( [ie['id'] for ie in sel] == [ie['id'] for ie in ies] )
+    assert( sel[1]['value'] == ('ENBname', 'enb1a2d0') == ies[1]['value'] )
+    assert( all([isinstance(sel[i]['value'], str) for i in (0, 2, 3)]) )
+    assert( sel[3]['value'] == '\x40' )
+    # the whole S1SetupRequest is skipped
+    pdu.decode(pkts[0], select=[('initiatingMessage', 'procedureCode')])
+    val = pdu()
+    assert( val[1]['procedureCode'] == 17 )
+    assert( isinstance(val[1]['value'], str) and len(val[1]['value']) == 45 )
+    # selection trees
+    assert( make_select([('a', 'b'), ('a', 'c', 'd'), ('e',)]) == \
+            {'a': {'b': None, 'c': {'d': None}}, 'e': None} )
+    assert( make_select([('a',), ('a', 'b')]) == {'a': None} )
+    assert( make_select([('a', 'b'), ()]) is None )
+
+def test_lazy():
+    pkts = _test_s1ap_prep()
+    if pkts is None:
+        return
+    pdu = GLOBAL.TYPE['S1AP-PDU']
+    vals = []
+    for msg in pkts:
+        pdu.decode(msg)
+        vals.append(pdu())
+    PER._DEC_OPEN_LAZY = True
+    try:
+        for msg, ref in zip(pkts, vals):
+            pdu.decode(msg)
+            val = pdu()
+            lazy = val[1]['value']
+            assert( isinstance(lazy, ASN1.ASN1Lazy) and not lazy.resolved )
+            assert( lazy[0] == ref[1]['value'][0] and not lazy.resolved )
+            # pass-through re-encoding of the unresolved content
+            pdu.encode(val)
+            assert( str(pdu) == msg and not lazy.resolved )
+            # decoding on access
+            assert( lazy == ref[1]['value'] and lazy.resolved )
+            assert( pdu() == ref )
+            pdu.encode(val)
+            assert( str(pdu) == msg )
+    finally:
+        PER._DEC_OPEN_LAZY = False
 
 def _test_x2ap_prep():
     GLOBAL.clear()
@@ -766,6 +1064,128 @@ def test_x2ap():
     if pkts is not None:
         void = _test_x2ap(pkts)
 
+def _test_map_prep():
+    GLOBAL.clear()
+    try:
+        load_module('MAP')
+    except:
+        log('Module "MAP" unavailable')
+        return None
+    ASN1.ASN1Obj._RAISE_SILENTLY = False
+    ASN1.ASN1Obj.CODEC = BER
+    unh = lambda x: x.decode('hex')
+    #
+    # MAP arguments from examples/tcap_map/map_messages.py
+    #
+    pkts = [(n, unh(b)) for (n, b) in [\
+    ('UpdateLocationArg', '3022040811111111111111f18107111111111111f10407111111111111f1a60480020780'),
+    ('CancelLocationArg', 'a30d040811111111111111f10a0100'),
+    ('ProvideRoamingNumberArg', '302f800811111111111111f18107111111111111f18207111111111111f1a5080a010104030401a08807111111111111f1'),
+    ('NoteSubscriberDataModifiedArg', '3013040811111111111111f10407111111111111f1'),
+    ('NoteMM-EventArg', '3019020100800103810811111111111111f18207111111111111f1')
+    ]]
+    return pkts
+
+def _test_pdus(pkts):
+    # pkts: list of (ASN.1 type name, buffer)
+    T0 = time()
+    #
+    for name, msg in pkts:
+        pdu = GLOBAL.TYPE[name]
+        pdu.decode(msg)
+        val = pdu()
+        pdu.encode()
+        assert( str(pdu) == msg )
+        pdu.decode(str(pdu))
+        assert( pdu() == val )
+    #
+    return time() - T0
+
+def test_map():
+    pkts = _test_map_prep()
+    if pkts is not None:
+        void = _test_pdus(pkts)
+
+def _test_tcap_prep():
+    GLOBAL.clear()
+    try:
+        load_module('TCAP')
+    except:
+        log('Module "TCAP" unavailable')
+        return None
+    ASN1.ASN1Obj._RAISE_SILENTLY = False
+    ASN1.ASN1Obj.CODEC = BER
+    unh = lambda x: x.decode('hex')
+    #
+    # TCAP begin / end / continue, with MAP-like components
+    #
+    pkts = [('TCMessage', unh(b)) for b in [\
+    '621c4804000000016c14a112020101020102840a040811111111111111f1',
+    '641d4904000000016c15a213020101300e02010284090407111111111111f1',
+    '650c480400000002490400000001'
+    ]]
+    return pkts
+
+def test_tcap():
+    pkts = _test_tcap_prep()
+    if pkts is not None:
+        void = _test_pdus(pkts)
+
+def _test_ranap_prep():
+    GLOBAL.clear()
+    try:
+        load_module('RANAP')
+    except:
+        log('Module "RANAP" unavailable')
+        return None
+    ASN1.ASN1Obj._RAISE_SILENTLY = False
+    ASN1.ASN1Obj.CODEC = PER
+    PER.VARIANT = 'A'
+    unh = lambda x: x.decode('hex')
+    #
+    # Iu-ReleaseCommand, Iu-ReleaseComplete, DirectTransfer, Paging
+    #
+    pkts = [('RANAP-PDU', unh(b)) for b in [\
+    '00010009000001000440020b40',
+    '20010003000000',
+    '0014401e0000020010401211052411035758a620082980010000000001003b400100',
+    '000e40150000020003400180001740095002080100000000f1'
+    ]]
+    return pkts
+
+def test_ranap():
+    pkts = _test_ranap_prep()
+    if pkts is not None:
+        void = _test_pdus(pkts)
+
+def _test_rrclte_prep():
+    GLOBAL.clear()
+    try:
+        load_module('RRCLTE')
+    except:
+        log('Module "RRCLTE" unavailable')
+        return None
+    ASN1.ASN1Obj._RAISE_SILENTLY = False
+    ASN1.ASN1Obj.CODEC = PER
+    PER.VARIANT = 'U'
+    unh = lambda x: x.decode('hex')
+    #
+    # Paging, RRCConnectionRequest, RRCConnectionRelease, 
+    # ULInformationTransfer
+    #
+    pkts = [(n, unh(b)) for (n, b) in [\
+    ('PCCH-Message', '40001123456780'),
+    ('UL-CCCH-Message', '5000000007b6'),
+    ('DL-DCCH-Message', '2a02'),
+    ('UL-DCCH-Message', '480162e745ec20a0e0e820417ec0')
+    ]]
+    return pkts
+
+def test_rrclte():
+    pkts = _test_rrclte_prep()
+    if pkts is not None:
+        void = _test_pdus(pkts)
+
 def _test_rrc3g_prep():
     GLOBAL.clear()
     try:
@@ -911,9 +1331,18 @@ def test_all(print_info=False):
     test_per_integer(print_info)
     test_per_choice(print_info)
     test_per_sequence(print_info)
+    test_per_frag(print_info)
+    test_ctx(print_info)
+    test_dec_cache(print_info)
     test_s1ap()
+    test_select()
+    test_lazy()
     test_x2ap()
+    test_ranap()
+    test_map()
+    test_tcap()
     test_rrc3g()
+    test_rrclte()
     GLOBAL.clear()
     
 if __name__ == '__main__':
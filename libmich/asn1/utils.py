@@ -28,6 +28,7 @@
 
 import re
 from struct import pack
+from threading import local
 from libmich.core.shtr import decompose
 
 #------------------------------------------------------------------------------#
@@ -85,6 +86,9 @@ class OD(object):
     def __iter__(self):
         return self._index.__iter__()
     
+    def __contains__(self, key):
+        return key in self._dict
+    
     def clear(self):
         self._dict.clear()
         self._index = []
@@ -98,6 +102,40 @@ class OD(object):
     def values(self):
         return [self._dict[k] for k in self._index]
 
+class LazyRef(object):
+    '''
+    reference to an object which has not been loaded yet,
+    it gets resolved by its loader on first lookup within an ODLazy
+    '''
+    __slots__ = ('loader', 'ind')
+    
+    def __init__(self, loader, ind):
+        self.loader = loader
+        self.ind = ind
+    
+    def resolve(self):
+        return self.loader.load(self.ind)
+
+class ODLazy(OD):
+    '''
+    custom OrderedDict object, which resolves LazyRef values on lookup
+    '''
+    def __getitem__(self, key):
+        val = self._dict.__getitem__(key)
+        if isinstance(val, LazyRef):
+            val = val.resolve()
+            self._dict[key] = val
+        return val
+    
+    def items(self):
+        return [(k, self[k]) for k in self._index]
+    
+    def values(self):
+        return [self[k] for k in self._index]
+    
+    def unresolved(self):
+        return [k for k in self._index if isinstance(self._dict[k], LazyRef)]
+
 def export(scope):
     '''
     export the GLOBAL tables into the given scope
@@ -128,10 +166,12 @@ class ASN1_OBJ(Exception): pass
 # for all ASN.1 codec error
 class ASN1_CODEC(Exception): pass
 
-# this is to support _RAISE_SILENTLY
-class RAISED:
+# this is to support _RAISE_SILENTLY, the flag is set for each thread
+class _RAISED(local):
     set = False
 
+RAISED = _RAISED()
+
 #------------------------------------------------------------------------------#
 # library-wide Python global objects
 #------------------------------------------------------------------------------#
@@ -149,10 +189,11 @@ def _make_GLOBAL(glob_name=None):
     class GLOBAL(object):
         #
         # stores all user-defined ASN.1 subtypes
-        TYPE = OD()
+        # (objects from indexed modules are only unpickled on first lookup)
+        TYPE = ODLazy()
         # stores all user-defined ASN.1 values and sets
-        VALUE = OD()
-        SET = OD()
+        VALUE = ODLazy()
+        SET = ODLazy()
         #
         # for all ASN.1 initialized objects that are user-defined but
         # still needs to be processed
@@ -414,10 +455,13 @@ SYNT_SYNTAX_BL = [ \
 'NULL', 'OBJECT', 'OCTET', 'PLUS-INFINITY', 'REAL', 'RELATIVE-OID', 'SEQUENCE', 
 'SET', 'TRUE', 'UNION']
 
+# alternatives are tried in the order of the list
+SYNT_RE_BASIC_TYPE = re.compile('|'.join(map(re.escape, SYNT_BASIC_TYPES)))
+
 def match_basic_type(text=''):
-    for t in SYNT_BASIC_TYPES:
-        if t == text[:len(t)]:
-            return t
+    m = SYNT_RE_BASIC_TYPE.match(text)
+    if m:
+        return m.group()
     return None
 
 #------------------------------------------------------------------------------#
@@ -426,42 +470,21 @@ def match_basic_type(text=''):
 
 stripper = lambda x:x.strip()
 
+# ASN.1 comments: "--" up to the next "--" or to the end-of-line,
+# or a full line of "-------------------"
+SYNT_RE_COMMENT = re.compile('-{3,}(?=\n)|--(?:[^\n\-]|-(?!-))*(?:--|(?=\n))')
+# structural lexemes: character strings (which are skipped), brackets and
+# separators
+SYNT_RE_LEXEME = re.compile('"(?:[^"]|"")*"|[{}()\[\],|]')
+_LEX_OPEN = '{(['
+_LEX_CLOSE = '})]'
+_LEX_SEP = ',|'
+
 def scan_for_comment(text=''):
     '''
     returns a list of 2-tuple for each ASN.1 comment {start offset, end offset}
     '''
-    ret = []
-    comment = False
-    cur = 0
-    while cur < len(text):
-        if text[cur:cur+2] == '--':
-            if not comment:
-                # comment starting
-                comment = True
-                start = cur
-                # exception for full line of ------------------ sh*t
-                eol = text[cur:].find('\n')
-                if eol > 2 and text[cur:cur+eol] == eol*'-':
-                    ret.append( (start, start+eol) )
-                    comment = False
-                    cur += eol
-                else:
-                    cur += 2
-            else:
-                # comment ending
-                comment = False
-                stop = cur+2
-                ret.append( (start, stop) )
-                cur += 2
-        elif text[cur:cur+1] == '\n' and comment:
-            # end-of-line, comment ending
-            comment = False
-            stop = cur
-            ret.append( (start, stop) )
-            cur += 1
-        else:
-            cur += 1
-    return ret
+    return [m.span() for m in SYNT_RE_COMMENT.finditer(text)]
 
 def clean_text(text=''):
     '''
@@ -470,11 +493,7 @@ def clean_text(text=''):
     removes duplicated spaces
     '''
     # remove comments
-    comments = scan_for_comment(text)
-    comments.reverse()
-    if len(comments):
-        for (c_start, c_stop) in comments:
-            text = text[:c_start] + text[c_stop:]
+    text = SYNT_RE_COMMENT.sub('', text)
     # replace tab
     text = text.replace('\t', ' ')
     # remove duplicated spaces
@@ -482,21 +501,156 @@ def clean_text(text=''):
     #
     return text
 
+class Lexemes(object):
+    '''
+    structural token stream of an ASN.1 text, built in a single pass:
+    each bracket and separator token is listed with its offset in the text,
+    its nesting depth and, for brackets, the index of its matching bracket
+    (or -1 when unbalanced)
+    
+    A Lexemes instance can be a view over a part of the token stream of a
+    larger text (e.g. the content between a pair of brackets): this way,
+    bracket matching is done once, and parts of the text extracted with 
+    extract_*() do not need to be scanned again
+    '''
+    __slots__ = ('tok', 'off', 'depth', 'match', 'start', 'stop', 'base', 
+                 'lvl')
+    
+    def __init__(self, tok, off, depth, match, start, stop, base=0, lvl=0):
+        self.tok = tok
+        self.off = off
+        self.depth = depth
+        self.match = match
+        # token indexes and text offset / nesting depth of the view
+        self.start = start
+        self.stop = stop
+        self.base = base
+        self.lvl = lvl
+    
+    def view(self, start, stop, base, lvl):
+        return Lexemes(self.tok, self.off, self.depth, self.match,
+                       start, stop, base, lvl)
+    
+    def top_lvl(self, sep=','):
+        '''
+        returns the list of offsets of top-level sep tokens
+        '''
+        tok, depth, lvl, base = self.tok, self.depth, self.lvl, self.base
+        return [self.off[i]-base for i in xrange(self.start, self.stop) \
+                if tok[i] == sep and depth[i] == lvl]
+    
+    def between(self, ins='{'):
+        '''
+        returns the list of 2-tuple (start offset, end offset) for each 
+        top-level part of the text in-between ins and its matching bracket
+        '''
+        ret = []
+        tok, off, match, base = self.tok, self.off, self.match, self.base
+        double = len(ins) == 2
+        ins = ins[0]
+        i = self.start
+        while i < self.stop:
+            j = match[i]
+            if tok[i] == ins and self.start <= j < self.stop:
+                if not double:
+                    ret.append( (off[i]-base, off[j]+1-base) )
+                    i = j
+                elif i+1 < j and tok[i+1] == ins and match[i+1] == j-1 \
+                and off[i+1] == off[i]+1 and off[j] == off[j-1]+1:
+                    ret.append( (off[i]-base, off[j]+1-base) )
+                    i = j
+            i += 1
+        return ret
+
+_LEX_CACHE = {}
+_LEX_CACHE_MAX = 4096
+
+def tokenize(text=''):
+    '''
+    returns the Lexemes token stream of text
+    
+    token streams are cached (together with the views seeded by extract_*()
+    and split_top_lvl()), as the same parts of text are looked-up several 
+    times by the parsers; the cache is released with clear_lex_cache() 
+    at the end of each compilation
+    '''
+    try:
+        return _LEX_CACHE[text]
+    except KeyError:
+        pass
+    tok, off, depth, match, stack = [], [], [], [], []
+    for m in SYNT_RE_LEXEME.finditer(text):
+        t = m.group()
+        if t[0] == '"':
+            continue
+        i = len(tok)
+        tok.append(t)
+        off.append(m.start())
+        if t in _LEX_OPEN:
+            depth.append(len(stack))
+            match.append(-1)
+            stack.append(i)
+        elif t in _LEX_CLOSE:
+            if stack:
+                j = stack.pop()
+                match[j] = i
+                match.append(j)
+            else:
+                match.append(-1)
+            depth.append(len(stack))
+        else:
+            depth.append(len(stack))
+            match.append(-1)
+    lex = Lexemes(tok, off, depth, match, 0, len(tok))
+    _lex_cache(text, lex)
+    return lex
+
+def clear_lex_cache():
+    '''
+    releases all token streams cached by tokenize()
+    '''
+    _LEX_CACHE.clear()
+
+def _lex_cache(text, lex):
+    if len(_LEX_CACHE) >= _LEX_CACHE_MAX:
+        _LEX_CACHE.clear()
+    _LEX_CACHE[text] = lex
+
+def _lex_seed(text, lex, start, stop, lo, hi, lvl):
+    # caches the view over tokens [start:stop] for the text[lo:hi] part,
+    # once stripped, with lex the token stream of text
+    part = text[lo:hi]
+    stripped = part.strip()
+    if stripped not in _LEX_CACHE:
+        lo += len(part) - len(part.lstrip())
+        _lex_cache(stripped, lex.view(start, stop, lex.base+lo, lvl))
+    return stripped
 
 def search_top_lvl_sep(text='', sep=','):
     '''
     returns a list of offsets for each top-level separator found in the text
+    (sep must be "," or "|")
     '''
-    ret = []
-    #
-    count = {'(':0, ')':0, '{':0, '}':0, '[':0, ']':0}
-    is_top_lvl = lambda c: c['(']==c[')'] and c['{']==c['}'] and c['[']==c[']']
-    #
-    for cur in range(len(text)):
-        if text[cur] in count:
-            count[text[cur]] += 1
-        if text[cur] == sep and is_top_lvl(count):
-            ret.append(cur)
+    if sep not in _LEX_SEP:
+        raise(ASN1_PROC('invalid top-level separator: %s' % sep))
+    return tokenize(text).top_lvl(sep)
+
+def split_top_lvl(text='', sep=','):
+    '''
+    returns the list of stripped parts of the text in-between each top-level
+    separator (sep must be "," or "|")
+    '''
+    if sep not in _LEX_SEP:
+        raise(ASN1_PROC('invalid top-level separator: %s' % sep))
+    lex = tokenize(text)
+    tok, depth, lvl = lex.tok, lex.depth, lex.lvl
+    ret, lo, start = [], 0, lex.start
+    for i in xrange(lex.start, lex.stop):
+        if tok[i] == sep and depth[i] == lvl:
+            hi = lex.off[i] - lex.base
+            ret.append( _lex_seed(text, lex, start, i, lo, hi, lvl) )
+            lo, start = hi+1, i+1
+    ret.append( _lex_seed(text, lex, start, lex.stop, lo, len(text), lvl) )
     return ret
 
 def search_between(text='', ins='{', outs='}'):
@@ -504,29 +658,31 @@ def search_between(text='', ins='{', outs='}'):
     returns a list of 2-tuple for each top level part of the text in-bewteen 
     ins and outs expression
     '''
-    if len(ins) != len(outs):
-        raise(Exception('requires identical length ins and outs'))
-    #
-    ret = []
-    #
-    count = {ins:0, outs:0}
-    is_top_lvl = lambda c: c[ins] == c[outs]
-    entered = False
-    #
-    for cur in range(len(text)):
-        if not entered and text[cur:cur+len(ins)] == ins:
-            # passing initial ins char
-            entered = True
-            start = cur
-        if text[cur:cur+len(ins)] in count:
-            # counting ins / outs chars
-            count[text[cur:cur+len(ins)]] += 1
-        if entered and is_top_lvl(count):
-            # passing last outs char
-            stop = cur + len(ins)
-            ret.append( (start, stop) )
-            entered = False
-    return ret
+    if (ins, outs) not in (('{', '}'), ('(', ')'), ('[', ']'), ('[[', ']]')):
+        raise(ASN1_PROC('invalid brackets: %s %s' % (ins, outs)))
+    return tokenize(text).between(ins)
+
+def _extract(text, ins):
+    # returns the remaining text, and the extracted content or None, 
+    # when text starts with ins
+    text = text.strip()
+    n = len(ins)
+    if text[:n] != ins:
+        return text, None
+    lex = tokenize(text)
+    tok, off, match, i = lex.tok, lex.off, lex.match, lex.start
+    j = match[i]
+    if not i < j < lex.stop:
+        return text, None
+    if n == 2 and not (tok[i+1] == ins[1] and match[i+1] == j-1 \
+                       and off[j] == off[j-1]+1):
+        return text, None
+    stop = off[j] + 1 - lex.base
+    # seed the token stream cache with the content and the remaining text
+    lvl = lex.depth[i]
+    content = _lex_seed(text, lex, i+n, j+1-n, n, stop-n, lvl+n)
+    rest = _lex_seed(text, lex, j+1, lex.stop, stop, len(text), lvl)
+    return rest, content
 
 def extract_curlybrack(text=''):
     '''
@@ -534,14 +690,7 @@ def extract_curlybrack(text=''):
     of the string
     returns the remaining text, and the extracted content or None
     '''
-    text = text.strip()
-    offsets = search_between(text, '{', '}')
-    if not offsets:
-        return text, None
-    offsets = offsets[0]
-    if offsets[0] != 0:
-        return text, None
-    return text[offsets[1]:].strip(), text[1:offsets[1]-1].strip()
+    return _extract(text, '{')
 
 def extract_parenth(text=''):
     '''
@@ -549,14 +698,7 @@ def extract_parenth(text=''):
     of the string
     returns the remaining text, and the extracted content or None
     '''
-    text = text.strip()
-    offsets = search_between(text, '(', ')')
-    if not offsets:
-        return text, None
-    offsets = offsets[0]
-    if offsets[0] != 0:
-        return text, None
-    return text[offsets[1]:].strip(), text[1:offsets[1]-1].strip()
+    return _extract(text, '(')
 
 def extract_brack(text=''):
     '''
@@ -564,14 +706,7 @@ def extract_brack(text=''):
     of the string
     returns the remaining text, and the extracted content or None
     '''
-    text = text.strip()
-    offsets = search_between(text, '[', ']')
-    if not offsets:
-        return text, None
-    offsets = offsets[0]
-    if offsets[0] != 0:
-        return text, None
-    return text[offsets[1]:].strip(), text[1:offsets[1]-1].strip()
+    return _extract(text, '[')
 
 def extract_doublebrack(text=''):
     '''
@@ -579,14 +714,7 @@ def extract_doublebrack(text=''):
     of the string
     returns the remaining text, and the extracted content or None
     '''
-    text = text.strip()
-    offsets = search_between(text, '[[', ']]')
-    if not offsets:
-        return text, None
-    offsets = offsets[0]
-    if offsets[0] != 0:
-        return text, None
-    return text[offsets[1]:].strip(), text[2:offsets[1]-2].strip()
+    return _extract(text, '[[')
 
 def convert_bstr(bstr=''):
     '''
@@ -602,6 +730,33 @@ def convert_hstr(hstr=''):
     '''
     return (int(hstr[1:-2], 16), len(hstr[1:-2])*4)
 
+# selection for components which are not on any selected path
+SEL_SKIP = {}
+
+def make_select(paths=[]):
+    '''
+    converts a list of paths of components' names, e.g. 
+    [('initiatingMessage', 'procedureCode'), ...], into a selection tree
+    for ASN1Obj.decode(select=...)
+    
+    the selection tree is a dict {name: selection tree, or None to select
+    the whole component}, None selects the whole object
+    '''
+    sel = {}
+    for path in paths:
+        if not path:
+            return None
+        cur = sel
+        for name in path[:-1]:
+            if name not in cur:
+                cur[name] = {}
+            elif cur[name] is None:
+                break
+            cur = cur[name]
+        else:
+            cur[path[-1]] = None
+    return sel
+
 def flatten(l=[]):
     '''
     returns a list of str from a list of nested str or list,
@@ -32,7 +32,7 @@ from libmich.core.element import Str, Int, Bit, \
      Layer, RawLayer, Block
 from libmich.core.IANA_dict import IANA_dict
 #from libmich.core.IANA_dict import IPv4 as IPv4_dic
-from libmich.utils.inet import checksum
+from libmich.utils.inet import checksum, checksum_update
 from socket import inet_aton
 from struct import pack, unpack
 
@@ -393,6 +393,41 @@ class IPv4(Layer):
         # big thanks to scapy /p.biondy:
         return checksum(s)
     
+    def rewrite(self, ttl=None, src=None, dst=None):
+        '''
+        sets the TTL, and / or the source and destination addresses (in the
+        dotted notation) of the header
+        
+        The header checksum, and the UDP or TCP checksum of the payload when 
+        addresses change, are updated incrementally (RFC 1624) when they are
+        set (e.g. after parsing), without walking over the payload.
+        '''
+        old, new = [], []
+        if ttl is not None:
+            prot = str(self.prot)
+            old.append(str(self.ttl) + prot)
+            self.ttl < ttl
+            new.append(str(self.ttl) + prot)
+        addr = str(self.src) + str(self.dst)
+        if src is not None:
+            self.src < inet_aton(src)
+        if dst is not None:
+            self.dst < inet_aton(dst)
+        addr_new = str(self.src) + str(self.dst)
+        if self.cs.Val is not None:
+            self.cs < checksum_update(self.cs.Val, ''.join(old) + addr, 
+                                      ''.join(new) + addr_new)
+        if addr_new == addr:
+            return
+        # the addresses are part of the UDP / TCP pseudo-header
+        l4 = self.get_payload()[0]
+        if isinstance(l4, (UDP, TCP)) and l4.cs.Val is not None \
+        and not (isinstance(l4, UDP) and l4.cs.Val == 0):
+            cs = checksum_update(l4.cs.Val, addr, addr_new)
+            if isinstance(l4, UDP) and cs == 0:
+                cs = 0xffff
+            l4.cs < cs
+    
 
 class IPv4_option(Layer):
     constructorList = [
@@ -592,3 +627,40 @@ binderIP = {
     #SCTP : 132,
     }
 
+# offset of the checksum in the TCP and UDP headers
+_L4_CS_OFF = {6: 16, 17: 6}
+
+def ipv4_rewrite(buf, ttl=None, src=None, dst=None):
+    '''
+    returns the IPv4 datagram buf with its TTL, and / or its source and 
+    destination addresses (4-byte strings) changed
+    
+    The header checksum, and the UDP or TCP checksum when addresses change,
+    are updated incrementally (RFC 1624), without walking over the payload.
+    '''
+    ihl = (ord(buf[0]) & 0xf) * 4
+    hdr = [buf[:8], buf[8:10], buf[10:12], buf[12:16], buf[16:20]]
+    if ttl is not None:
+        hdr[1] = chr(ttl) + buf[9]
+    if src is not None:
+        hdr[3] = src
+    if dst is not None:
+        hdr[4] = dst
+    addr, addr_new = buf[12:20], hdr[3] + hdr[4]
+    cs = checksum_update(unpack('>H', buf[10:12])[0], buf[8:10] + addr, 
+                         hdr[1] + addr_new)
+    hdr[2] = pack('>H', cs)
+    pay = buf[ihl:]
+    # the addresses are part of the UDP / TCP pseudo-header, in the first 
+    # fragment
+    prot, off = ord(buf[9]), _L4_CS_OFF.get(ord(buf[9]))
+    if addr_new != addr and off is not None and len(pay) >= off+2 \
+    and not unpack('>H', buf[6:8])[0] & 0x1fff:
+        cs = unpack('>H', pay[off:off+2])[0]
+        if prot == 6 or cs != 0:
+            cs = checksum_update(cs, addr, addr_new)
+            if prot == 17 and cs == 0:
+                cs = 0xffff
+            pay = ''.join((pay[:off], pack('>H', cs), pay[off+2:]))
+    return ''.join(hdr + [buf[20:ihl], pay])
+
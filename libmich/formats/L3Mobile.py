@@ -28,6 +28,7 @@
 
 from libmich.core.element import RawLayer, Block, show, debug, \
     log, ERR, WNG, DBG
+from libmich.utils.cache import LRUCache
 #
 from L3Mobile_24007 import PD_dict
 #
@@ -280,6 +281,9 @@ class RawL3(Layer3):
         Int('Type', Pt=0, Type='uint8'),
         Str('Msg', Pt='', Len=None, Repr='hex')]
 #
+# LRUCache for parsed messages, e.g. L3_CACHE = LRUCache(num=256, size=1<<16)
+# (e.g. for GSM System Information, which are repeated continuously)
+L3_CACHE = None
 #
 def parse_L3(buf, L2_length_incl=0):
     '''
@@ -290,8 +294,23 @@ def parse_L3(buf, L2_length_incl=0):
     the protocol discriminator and message type.
     E.g. for messages passed over GSM BCCH or CCCH: L2_length_incl=1
     
+    When L3_CACHE is set, Layer3 instances are cached for identical buffers:
+    a copy of the cached instance is returned, which can be changed freely.
+    
     parse_L3(string_buffer, L2_length_incl=0) -> Layer3 instance
     '''
+    if L3_CACHE is None:
+        return _parse_L3(buf, L2_length_incl)
+    key = (buf, L2_length_incl)
+    l3 = L3_CACHE.get(key)
+    if l3 is None:
+        l3 = _parse_L3(buf, L2_length_incl)
+        # the cached instance is never returned itself, but copied
+        L3_CACHE.set(key, l3.clone(), len(buf))
+        return l3
+    return l3.clone()
+
+def _parse_L3(buf, L2_length_incl=0):
     # select message from PD and Type
     if len(buf) < 2:
         log(ERR, '(parse_L3) message too short for L3 mobile')
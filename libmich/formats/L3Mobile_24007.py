@@ -36,6 +36,7 @@ __all__ = ['Type1_V', 'Type1_TV', 'Type2', 'Type3_V', 'Type3_TV', \
 
 from binascii import hexlify
 from re import search
+from types import MethodType
 #
 from libmich.core.element import Element, Str, Int, Bit, Layer, RawLayer, \
      log, DBG, WNG, ERR
@@ -348,6 +349,38 @@ RR_in_CCCH = [
 'SI_3', 'SI_4', 'SI_13']
 
            
+# recursive copy of Element / Layer instances: attributes are copied, except
+# the dictionaries of values, which are shared;
+# memo, by id(), keeps Pt / Len links between elements of the copy
+_clone_shared = ('Dict', 'LHdict')
+
+def _clone(obj, memo):
+    ret = memo.get(id(obj))
+    if ret is not None:
+        return ret
+    if isinstance(obj, (Element, Layer)):
+        ret = memo[id(obj)] = object.__new__(obj.__class__)
+        # bypass Element / Layer __setattr__ and __getattr__
+        object.__getattribute__(ret, '__dict__').update(
+            [(k, v if k in _clone_shared else _clone(v, memo)) \
+             for k, v in object.__getattribute__(obj, '__dict__').items()])
+    elif isinstance(obj, list):
+        ret = memo[id(obj)] = []
+        ret.extend([_clone(v, memo) for v in obj])
+    elif type(obj) is dict:
+        ret = memo[id(obj)] = {}
+        ret.update([(k, _clone(v, memo)) for k, v in obj.items()])
+    elif isinstance(obj, tuple):
+        ret = memo[id(obj)] = tuple([_clone(v, memo) for v in obj])
+    elif isinstance(obj, MethodType) and obj.im_self is not None:
+        ret = memo[id(obj)] = MethodType(obj.im_func, 
+                                         _clone(obj.im_self, memo),
+                                         obj.im_class)
+    else:
+        # str, int, functions, None...
+        return obj
+    return ret
+
 ######
 # Now is for any mobile L3 messages (including GSM RR)
 # define a specific way to map string for mobile signalling
@@ -399,6 +432,16 @@ class Layer3(Layer):
                     ie > kwargs[ie.CallName]
                 ie.Trans = False
     
+    def clone(self):
+        '''
+        returns an independent copy of the message, including its mapped 
+        values, interpreted IE and optional IE transparency
+        
+        Layer.clone() only rebuilds the constructorList, and deepcopy() also
+        copies the dictionaries of values (Dict) shared by all instances
+        '''
+        return _clone(self, {})
+    
     # Patch L2 length for dummy GSM RR length computation !!!
     def _len_gsmrr(self, string=''):
         # In general, we can trust the L2 length value from LengthRR header:
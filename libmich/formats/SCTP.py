@@ -31,7 +31,8 @@
 from libmich.core.element import Str, Int, Bit, \
      Layer, Block, RawLayer, show
 from libmich.core.IANA_dict import IANA_dict
-from libmich.utils.CRC32C import crc32c
+from libmich.utils.CRC32C import crc32c, crc32c_many, \
+     add as crc32c_add, done as crc32c_done
 from struct import unpack
 import hmac, hashlib
 
@@ -180,6 +181,22 @@ hmac_dict = IANA_dict({
     4: "unassigned",
     })
     
+# CRC32-C checksum of SCTP packets, computed directly over the packet buffer
+# (with a null checksum field), without copying the header
+def sctp_crc(buf):
+    crc = crc32c_add(0xffffffff, buffer(buf, 0, 8))
+    crc = crc32c_add(crc, 4*'\0')
+    return crc32c_done(crc32c_add(crc, buffer(buf, 12)))
+
+def sctp_crc_verify(buf):
+    return len(buf) >= 12 and unpack('>I', buf[8:12])[0] == sctp_crc(buf)
+
+def sctp_crc_verify_many(bufs):
+    # checksums are computed all at once with numpy, when available
+    crcs = crc32c_many(bufs, zero=(8, 12))
+    return [len(buf) >= 12 and unpack('>I', buf[8:12])[0] == crc \
+            for buf, crc in zip(bufs, crcs)]
+
 
 class SCTP(Block):
     
@@ -280,8 +297,8 @@ class SCTP(Block):
                         param_s = param_s[ int(self[-1].len) : ]
                         
                 # rest of the string to map for following chunks
-                # TODO: need to take padding into account
-                s = s[ cklen : ]
+                # (chunks are padded to 4 bytes)
+                s = s[ cklen + (-cklen % 4) : ]
             
             # if chunk type is not recognized:
             else:
@@ -313,11 +330,13 @@ class SCTP_hdr(Layer):
         self.dst.Pt = dst
         self.verif.Pt = verif
         self.crc.Pt = self.get_payload
-        self.crc.PtFunc = lambda pay: crc32c( str(self.src)\
-                                            + str(self.dst)\
-                                            + str(self.verif)\
-                                            + 4*'\0'\
-                                            + str(pay()) )
+        self.crc.PtFunc = lambda pay: crc32c_done(crc32c_add(
+                                        crc32c_add(0xffffffff, 
+                                                   str(self.src)\
+                                                   + str(self.dst)\
+                                                   + str(self.verif)\
+                                                   + 4*'\0'),
+                                        str(pay()) ))
 
 # defines standard SCTP chunk header, with padding routine
 class SCTP_chunk(Layer):
@@ -437,10 +456,12 @@ class DATA(SCTP_chunk):
         self.sqn.Pt = sqn
         self.ppid.Pt = ppid
         self.data.Pt = data
+        self.data.Len = self.len
+        self.data.LenFunc = lambda len: int(len)-16
         self.pad.Pt = self.data
         self.pad.PtFunc = lambda val: self._pad(s=val)
         self.pad.Len = self.data
-        self.pad.LenFunc = lambda val: len(val)%4
+        self.pad.LenFunc = lambda val: (4-len(val)%4)%4
 
 class INIT(Layer):
     constructorList = [
@@ -885,3 +906,366 @@ chunkCall = {
     }
 
 
+###
+# zero-copy SCTP chunk iterator
+#
+# chunks are walked with precompiled structures directly over the packet
+# buffer, without building any Layer nor slicing the buffer; DATA chunk
+# payloads are returned as buffer() views
+###
+from struct import Struct
+
+_SCTP_COMMON = Struct('>HHI')
+_SCTP_CHUNK = Struct('>BBH')
+_SCTP_DATA = Struct('>IHHI')
+
+class SCTPChunks(object):
+    '''
+    zero-copy iterator over the chunks of the SCTP packet buf
+
+    iterating yields (chunk type, flags, offset, length) for each chunk,
+    offset being the one of the chunk header in buf, and length the chunk
+    length without padding; a truncated or invalid chunk ends the iteration
+
+    data(off) returns the fields of the DATA chunk at offset off,
+    iter_data() yields them for all DATA chunks of the packet, and layers()
+    builds the full SCTP Layers, for the whole packet or for a single chunk
+    '''
+
+    def __init__(self, buf):
+        self.buf = buf
+        if len(buf) >= 12:
+            self.src, self.dst, self.verif = _SCTP_COMMON.unpack_from(buf)
+        else:
+            self.src, self.dst, self.verif = None, None, None
+
+    def __iter__(self):
+        buf, unpack_chk = self.buf, _SCTP_CHUNK.unpack_from
+        off, l = 12, len(buf)
+        while off + 4 <= l:
+            typ, flags, cklen = unpack_chk(buf, off)
+            if cklen < 4 or off + cklen > l:
+                return
+            yield typ, flags, off, cklen
+            # chunks are padded to 4 bytes
+            off += cklen + (-cklen % 4)
+
+    def data(self, off, cklen=None):
+        '''
+        returns (TSN, stream id, SSN, PPID, payload) of the DATA chunk at
+        offset off in buf, payload being a buffer() view on the user data
+        (without padding)
+        '''
+        if cklen is None:
+            cklen = _SCTP_CHUNK.unpack_from(self.buf, off)[2]
+        return _SCTP_DATA.unpack_from(self.buf, off+4) \
+               + (buffer(self.buf, off+16, cklen-16), )
+
+    def iter_data(self):
+        '''
+        yields (flags, TSN, stream id, SSN, PPID, payload) for each DATA
+        chunk, payload being a buffer() view on the user data
+        '''
+        buf, unpack_data = self.buf, _SCTP_DATA.unpack_from
+        for typ, flags, off, cklen in self:
+            if typ == 0 and cklen >= 16:
+                yield (flags, ) + unpack_data(buf, off+4) \
+                      + (buffer(buf, off+16, cklen-16), )
+
+    def layers(self, off=None):
+        '''
+        returns the SCTP Block with the full Layers of the packet, or only
+        with the header and the chunk at offset off in buf
+        '''
+        blk = SCTP()
+        if off is None:
+            blk.parse(self.buf)
+        else:
+            cklen = _SCTP_CHUNK.unpack_from(self.buf, off)[2]
+            blk.parse(self.buf[:12] + self.buf[off:off+cklen])
+        return blk
+
+
+###
+# SCTP association reassembly, for captured traffic
+#
+# SCTP packets are fed together with their source and destination IP
+# addresses; each direction of an association is tracked by its 4-tuple and
+# verification tag, DATA chunks are deduplicated with their TSN, fragmented
+# user messages are reassembled with their B / E bits, consecutive TSN and
+# stream id / SSN, and ordered messages are delivered per stream in SSN order
+###
+from collections import OrderedDict
+from libmich.formats.dissect import dissect, dissect_ip
+from libmich.formats.pcap import PcapReader
+
+_SCTP_INIT = Struct('>IIHHI')
+
+def _lt32(a, b):
+    # serial number arithmetic (RFC 1982), for 32-bit TSN
+    return 0 < (b - a) & 0xffffffff < 0x80000000
+
+def _lt16(a, b):
+    # serial number arithmetic (RFC 1982), for 16-bit SSN
+    return 0 < (b - a) & 0xffff < 0x8000
+
+class _SCTPDir(object):
+    # reassembly state for a single direction of an SCTP association
+    __slots__ = ('ctsn', 'tsns', 'frags', 'fraglen', 'streams', 'fresh')
+
+    def __init__(self, ctsn, fresh=False):
+        # cumulative TSN, and TSN received above it
+        self.ctsn = ctsn
+        self.tsns = set()
+        # fragments, per TSN: (flags, sid, ssn, ppid, data)
+        self.frags = {}
+        self.fraglen = 0
+        # per stream id: [next expected SSN, {SSN: (ppid, payload)}]
+        self.streams = {}
+        # True when the association setup has been seen (SSN start at 0)
+        self.fresh = fresh
+
+class SCTPReassembler(object):
+    '''
+    SCTP reassembly engine, for captured traffic
+
+    feed() takes an SCTP packet (starting with the SCTP common header), with
+    its source and destination IP addresses, and returns the list of user
+    messages completed by this packet, as (assoc, stream, ppid, payload)
+    records, where assoc is the (src, sport, dst, dport, vtag) key of the
+    sending direction of the association.
+
+    Each direction of an association is tracked by its 4-tuple and
+    verification tag (learnt from INIT / INIT-ACK when available, which also
+    give the initial TSN). Retransmitted DATA chunks are dropped with their
+    TSN, fragmented messages are reassembled with their B / E bits, and
+    ordered messages are delivered per stream in SSN order (unordered ones
+    as soon as they are complete).
+
+    Memory is bounded per direction by MAX_TSN (out-of-order TSN kept),
+    MAX_FRAG (bytes of pending fragments) and MAX_HELD (messages waiting for
+    a missing SSN, per stream), and globally by MAX_ASSOC (directions
+    tracked, least recently used is dropped): when a bound is reached, the
+    missing TSN, fragments or SSN are considered lost.
+
+    e.g. to get S1AP PDUs from a capture:
+    >>> for assoc, sid, ppid, pdu in SCTPReassembler().iter_pcap(path):
+    ...     if ppid == 18: ...
+    '''
+    # bounds
+    MAX_ASSOC = 4096
+    MAX_TSN = 1024
+    MAX_FRAG = 1<<20
+    MAX_HELD = 256
+    #
+    # to drop packets with an invalid CRC32-C
+    CHECK_CRC = False
+
+    def __init__(self):
+        # directions of associations, per (src, sport, dst, dport, vtag)
+        self._dirs = OrderedDict()
+        # INIT seen, waiting for INIT-ACK, per (src, sport, dst, dport):
+        # (initiate tag, initial TSN)
+        self._init = OrderedDict()
+        # statistics: duplicate DATA chunks, and TSN, fragments and SSN
+        # given up
+        self.dup = 0
+        self.lost = 0
+
+    def _get_dir(self, key, tsn):
+        d = self._dirs.pop(key, None)
+        if d is None:
+            # association taken on the fly
+            d = _SCTPDir((tsn - 1) & 0xffffffff)
+            if len(self._dirs) >= self.MAX_ASSOC:
+                self._dirs.popitem(last=False)
+        self._dirs[key] = d
+        return d
+
+    def feed(self, buf, src='', dst=''):
+        '''
+        feeds an SCTP packet buf sent from src to dst (IP addresses) and
+        returns the list of (assoc, stream, ppid, payload) user messages
+        completed
+        '''
+        out = []
+        if len(buf) < 12 or (self.CHECK_CRC and not sctp_crc_verify(buf)):
+            return out
+        chunks = SCTPChunks(buf)
+        sport, dport, vtag = chunks.src, chunks.dst, chunks.verif
+        tup = (src, sport, dst, dport)
+        for typ, flags, off, cklen in chunks:
+            if typ == 0 and cklen > 16:
+                tsn, sid, ssn, ppid, data = chunks.data(off, cklen)
+                self._data(tup + (vtag,), flags, tsn, sid, ssn, ppid,
+                           str(data), out)
+            elif typ == 1 and cklen >= 20:
+                itag, _, _, _, itsn = _SCTP_INIT.unpack_from(buf, off+4)
+                self._init[tup] = (itag, itsn)
+                if len(self._init) > self.MAX_ASSOC:
+                    self._init.popitem(last=False)
+            elif typ == 2 and cklen >= 20:
+                itag, _, _, _, itsn = _SCTP_INIT.unpack_from(buf, off+4)
+                peer = self._init.pop((dst, dport, src, sport), None)
+                if peer is not None:
+                    self._setup((dst, dport, src, sport, itag), peer[1],
+                                (src, sport, dst, dport, peer[0]), itsn, out)
+            elif typ in (6, 14):
+                # ABORT, SHUTDOWN COMPLETE
+                self._close(tup, out)
+        return out
+
+    def _setup(self, key_i, itsn_i, key_r, itsn_r, out):
+        # new association (or restart): both directions start again
+        for key, itsn in ((key_i, itsn_i), (key_r, itsn_r)):
+            if key in self._dirs:
+                self._flush_dir(key, self._dirs.pop(key), out)
+            if len(self._dirs) >= self.MAX_ASSOC:
+                self._dirs.popitem(last=False)
+            self._dirs[key] = _SCTPDir((itsn - 1) & 0xffffffff, fresh=True)
+
+    def _close(self, tup, out):
+        rev = (tup[2], tup[3], tup[0], tup[1])
+        for key in [k for k in self._dirs if k[:4] in (tup, rev)]:
+            self._flush_dir(key, self._dirs.pop(key), out)
+
+    def _data(self, key, flags, tsn, sid, ssn, ppid, data, out):
+        d = self._get_dir(key, tsn)
+        # duplicate TSN
+        if not _lt32(d.ctsn, tsn) or tsn in d.tsns:
+            self.dup += 1
+            return
+        d.tsns.add(tsn)
+        self._ack(d)
+        if len(d.tsns) > self.MAX_TSN:
+            # too many TSN out of order: missing ones are lost
+            first = min(d.tsns, key=lambda t: (t - d.ctsn) & 0xffffffff)
+            self.lost += (first - d.ctsn - 1) & 0xffffffff
+            d.ctsn = (first - 1) & 0xffffffff
+            self._ack(d)
+        #
+        if flags & 3 == 3:
+            # unfragmented
+            self._deliver(key, d, flags & 4, sid, ssn, ppid, data, out)
+            return
+        d.frags[tsn] = (flags, sid, ssn, ppid, data)
+        d.fraglen += len(data)
+        # look for the first and last fragments of the message around tsn
+        first = tsn
+        while not d.frags[first][0] & 2:
+            first = (first - 1) & 0xffffffff
+            if first not in d.frags:
+                break
+        else:
+            last = tsn
+            while not d.frags[last][0] & 1:
+                last = (last + 1) & 0xffffffff
+                if last not in d.frags:
+                    break
+            else:
+                self._reassemble(key, d, first, last, out)
+                return
+        if d.fraglen > self.MAX_FRAG:
+            # too many pending fragments: incomplete messages are lost
+            self.lost += len(d.frags)
+            d.frags.clear()
+            d.fraglen = 0
+
+    def _ack(self, d):
+        # advances the cumulative TSN
+        nxt = (d.ctsn + 1) & 0xffffffff
+        while nxt in d.tsns:
+            d.tsns.remove(nxt)
+            d.ctsn, nxt = nxt, (nxt + 1) & 0xffffffff
+
+    def _reassemble(self, key, d, first, last, out):
+        frags = [d.frags.pop((first + i) & 0xffffffff) \
+                 for i in range(((last - first) & 0xffffffff) + 1)]
+        data = ''.join([f[4] for f in frags])
+        d.fraglen -= len(data)
+        flags, sid, ssn, ppid = frags[0][:4]
+        unordered = flags & 4
+        for f in frags[1:]:
+            if f[1] != sid or (not unordered and f[2] != ssn):
+                # inconsistent fragments
+                self.lost += len(frags)
+                return
+        self._deliver(key, d, unordered, sid, ssn, ppid, data, out)
+
+    def _deliver(self, key, d, unordered, sid, ssn, ppid, data, out):
+        if unordered:
+            out.append((key, sid, ppid, data))
+            return
+        st = d.streams.get(sid)
+        if st is None:
+            st = d.streams[sid] = [(ssn, 0)[d.fresh], {}]
+        if ssn == st[0]:
+            out.append((key, sid, ppid, data))
+            st[0] = (ssn + 1) & 0xffff
+            self._drain(key, sid, st, out)
+        elif _lt16(st[0], ssn):
+            st[1][ssn] = (ppid, data)
+            if len(st[1]) > self.MAX_HELD:
+                # missing SSN are lost
+                first = min(st[1], key=lambda s: (s - st[0]) & 0xffff)
+                self.lost += (first - st[0]) & 0xffff
+                st[0] = first
+                self._drain(key, sid, st, out)
+        else:
+            # already delivered
+            self.dup += 1
+
+    def _drain(self, key, sid, st, out):
+        held = st[1]
+        while st[0] in held:
+            ppid, data = held.pop(st[0])
+            out.append((key, sid, ppid, data))
+            st[0] = (st[0] + 1) & 0xffff
+
+    def _flush_dir(self, key, d, out):
+        # delivers held messages, whatever missing SSN
+        for sid, st in d.streams.items():
+            for ssn in sorted(st[1], key=lambda s: (s - st[0]) & 0xffff):
+                ppid, data = st[1].pop(ssn)
+                out.append((key, sid, ppid, data))
+        self.lost += len(d.frags)
+
+    def flush(self):
+        '''
+        returns all messages held because of missing SSN (e.g. at the end of
+        a capture), and clears all associations
+        '''
+        out = []
+        for key, d in self._dirs.items():
+            self._flush_dir(key, d, out)
+        self._dirs.clear()
+        self._init.clear()
+        return out
+
+    def feed_ip(self, buf):
+        '''
+        feeds an IPv4 or IPv6 packet buf, and returns the list of user
+        messages completed (empty if buf is not an SCTP packet)
+        '''
+        pkt = dissect_ip(buf)
+        if pkt is None or pkt.proto != 132 or pkt.frag:
+            return []
+        return self.feed(buf[pkt.l4:pkt.end], pkt.src, pkt.dst)
+
+    def iter_pcap(self, path):
+        '''
+        yields all user messages of the SCTP associations in the pcap /
+        pcapng file path, and the held ones at the end
+        '''
+        rd = PcapReader(path)
+        try:
+            for ts, link, pay in rd:
+                pkt = dissect(pay, link)
+                if pkt is not None and pkt.proto == 132 and not pkt.frag:
+                    for rec in self.feed(pay[pkt.l4:pkt.end], pkt.src,
+                                         pkt.dst):
+                        yield rec
+        finally:
+            rd.close()
+        for rec in self.flush():
+            yield rec
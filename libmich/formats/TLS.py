@@ -30,6 +30,7 @@
 
 import time
 from random import _urandom as urandom
+from struct import Struct
 #
 from libmich.core.element import Str, Int, Bit, Layer, RawLayer, Block, show
 from libmich.core.IANA_dict import IANA_dict
@@ -75,10 +76,8 @@ class TLS(Block):
             elif t == 21:
                 self.append( Alert() )
             elif t == 22 and len(s) >= 4:
-                hst = ord(s[0])
-                if hst not in _HST_:
-                    self.append( RawLayer() )
-                self.append( _HST_[hst]() )
+                # unknown type, or continuation of a fragmented message
+                self.append( _HST_.get(ord(s[0]), RawLayer)() )
             elif t == 23:
                 self.append( RawLayer() )
             else:
@@ -621,7 +620,7 @@ AlertDescr_dict = {
     110 : 'unsupported_extension'
     }
 
-class Alert(RawLayer):
+class Alert(Layer):
     constructorList = [
         Int('level', Pt=0, Type='uint8', Dict=AlertLevel_dict),
         Int('description', Pt=0, Type='uint8', Dict=AlertDescr_dict),
@@ -631,7 +630,7 @@ class Alert(RawLayer):
 # TLS Change cipher spec struct, section
 ###
 
-class ChangeCipherSpec(RawLayer):
+class ChangeCipherSpec(Layer):
     constructorList = [
         Int('type', Pt=1, Type='uint8')
         ]
@@ -798,4 +797,169 @@ _HST_ = {
     22 : Handshake,
     23 : Handshake
     }
-#
\ No newline at end of file
+#
+
+
+###
+# TLS streaming parser, for captured TCP streams
+#
+# the stream is fed segment by segment: record headers are read with
+# precompiled structures, handshake messages are reassembled across records,
+# and application data record bodies are only counted, never copied
+###
+
+_TLS_REC = Struct('>BHH')
+_TLS_HS = Struct('>I')
+
+class TLSStream(object):
+    '''
+    incremental TLS parser, for a single direction of a TCP connection
+    
+    feed() takes the next bytes of the stream (e.g. the payload of the next
+    TCP segment, in sequence) and returns the list of records completed, as
+    (type, version, length, data) tuples:
+    - change_cipher_spec, alert and heartbeat records are returned as is,
+      data being the record body;
+    - plaintext handshake records are reassembled and split into handshake
+      messages, one tuple each: length is the handshake message length and 
+      data the whole message (including its 4 bytes header);
+    - after a change_cipher_spec, handshake records are encrypted and are
+      returned as is;
+    - application data record bodies are skipped without being copied nor
+      buffered: data is None.
+    
+    Memory is bounded per stream by MAX_REC (the record length, larger ones 
+    are invalid) and MAX_HS (the handshake message length, larger messages 
+    are skipped and returned with data None).
+    When a record header is invalid (e.g. the stream is not TLS, or a segment
+    is missing), error is set and the rest of the stream is ignored.
+    
+    layer() builds the Layer corresponding to a returned tuple.
+    
+    e.g. to get the cipher suite selected by a server:
+    >>> st = TLSStream()
+    >>> for rec in st.feed(seg):
+    ...     if rec[0] == 22 and rec[3] and rec[3][0] == '\x02':
+    ...         cs = TLSStream.layer(rec).cs()
+    '''
+    # bounds
+    MAX_REC = (1<<14) + 2048
+    MAX_HS = 1<<16
+    
+    def __init__(self):
+        # partial record header
+        self._hdr = ''
+        # current record (type, version, length), and its body
+        self._rec = None
+        self._body = []
+        self._blen = 0
+        # partial handshake message, and handshake bytes to skip
+        self._hs = ''
+        self._hskip = 0
+        # True after a change_cipher_spec
+        self.encrypted = False
+        self.error = False
+        # statistics
+        self.records = 0
+        self.appdata = 0
+    
+    def feed(self, data):
+        '''
+        feeds the next bytes data of the stream, and returns the list of 
+        (type, version, length, data) records and handshake messages 
+        completed
+        '''
+        out = []
+        off, l = 0, len(data)
+        while off < l and not self.error:
+            rec = self._rec
+            if rec is None:
+                # record header
+                if self._hdr or l - off < 5:
+                    n = 5 - len(self._hdr)
+                    self._hdr += data[off:off+n]
+                    off += n
+                    if len(self._hdr) < 5:
+                        break
+                    rec = _TLS_REC.unpack(self._hdr)
+                    self._hdr = ''
+                else:
+                    rec = _TLS_REC.unpack_from(data, off)
+                    off += 5
+                if not 20 <= rec[0] <= 24 or rec[1] >> 8 != 3 \
+                or rec[2] > self.MAX_REC:
+                    self.error = True
+                    break
+                self._rec, self._blen = rec, 0
+            # record body
+            typ, ver, ln = rec
+            n = min(ln - self._blen, l - off)
+            if typ == 23:
+                pass
+            elif n == ln:
+                body = data[off:off+n]
+            elif n:
+                self._body.append(data[off:off+n])
+            self._blen += n
+            off += n
+            if self._blen < ln:
+                break
+            self._rec = None
+            self.records += 1
+            if typ == 23:
+                self.appdata += ln
+                out.append((23, ver, ln, None))
+                continue
+            if self._body:
+                body = ''.join(self._body)
+                self._body = []
+            if typ == 22 and not self.encrypted:
+                self._handshake(ver, body, out)
+            else:
+                if typ == 20:
+                    self.encrypted = True
+                out.append((typ, ver, ln, body))
+        return out
+    
+    def _handshake(self, ver, body, out):
+        # splits handshake messages, and keeps the last one if incomplete
+        if self._hskip:
+            n = min(self._hskip, len(body))
+            self._hskip -= n
+            body = body[n:]
+        if self._hs:
+            body = self._hs + body
+        off, l = 0, len(body)
+        while l - off >= 4:
+            ln = _TLS_HS.unpack_from(body, off)[0] & 0xffffff
+            if ln > self.MAX_HS:
+                # too large: skipped
+                out.append((22, ver, ln, None))
+                self._hskip = max(0, off + 4 + ln - l)
+                off = min(l, off + 4 + ln)
+            elif off + 4 + ln <= l:
+                out.append((22, ver, ln, body[off:off+4+ln]))
+                off += 4 + ln
+            else:
+                break
+        self._hs = body[off:]
+    
+    @staticmethod
+    def layer(rec):
+        '''
+        returns the Layer (Handshake, Alert, ChangeCipherSpec or RawLayer) of
+        the (type, version, length, data) tuple rec returned by feed()
+        '''
+        typ, data = rec[0], rec[3]
+        if data is None:
+            return RawLayer()
+        if typ == 22 and len(data) == rec[2] + 4:
+            l = _HST_.get(ord(data[0]), Handshake)()
+        elif typ == 21 and len(data) == 2:
+            l = Alert()
+        elif typ == 20:
+            l = ChangeCipherSpec()
+        else:
+            l = RawLayer()
+        l.map(data)
+        return l
@@ -0,0 +1,317 @@
+# −*− coding: UTF−8 −*−
+#/**
+# * Software Name : libmich
+# * Version : 0.2.3
+# *
+# * Copyright © 2026. agent.
+# *
+# * This program is free software: you can redistribute it and/or modify
+# * it under the terms of the GNU General Public License version 2 as published
+# * by the Free Software Foundation.
+# *
+# * This program is distributed in the hope that it will be useful,
+# * but WITHOUT ANY WARRANTY; without even the implied warranty of
+# * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# * GNU General Public License for more details.
+# *
+# * You will find a copy of the terms and conditions of the GNU General Public
+# * License version 2 in the "license.txt" file or
+# * see http://www.gnu.org/licenses/ or write to the Free Software Foundation,
+# * Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+# *
+# *--------------------------------------------------------
+# * File Name : formats/dissect.py
+# * Created : 2026-10-19
+# * Authors : agent
+# *--------------------------------------------------------
+#*/
+
+###
+# header-only dissector for Ethernet / 802.1Q / IPv4 / IPv6 / UDP / TCP /
+# GTP-U packets
+#
+# headers are read with precompiled structures directly from the buffer,
+# without building any Layer, and summarized into a PktInfo record:
+# addresses, protocol, ports, TCP flags, GTP-U TEID and payload offset
+#
+# the full Layers can still be built from a record, on demand, with
+# PktInfo.layers()
+###
+
+from struct import Struct, error as struct_error
+from socket import inet_ntoa
+#
+from libmich.core.element import Block, RawLayer
+from libmich.formats.IP import Eth, Vlan, IPv4, IPv6, UDP, TCP
+from libmich.formats.GTP import GTPv1
+
+# link types, as in pcap
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_IPV4 = 228
+LINKTYPE_IPV6 = 229
+
+# GTP-U UDP port
+GTPU_PORT = 2152
+
+# precompiled structures
+_H = Struct('>H')
+_IPV4 = Struct('>BxHxxHxB2x4s4s')
+_IPV6 = Struct('>4xHBx16s16s')
+_IPV6_EXT = Struct('>BB')
+_IPV6_FRAG = Struct('>BxH')
+_PORTS = Struct('>HH')
+_TCP = Struct('>12xBB')
+_GTPU = Struct('>BBHI')
+
+# IPv6 extension headers walked through: hop-by-hop, routing, fragment,
+# destination options
+_IPV6_EXTS = (0, 43, 44, 60)
+
+class PktInfo(object):
+    '''
+    fixed record of the headers of a packet, filled by dissect()
+
+    buf: the dissected buffer
+    link: link type of buf (None for the inner packet of a GTP-U T-PDU)
+    ip: offset of the IP header in buf
+    ver: IP version (4 or 6)
+    src, dst: source and destination IP addresses (packed str)
+    proto: transport protocol number
+    frag: True if the packet is a non-first IP fragment (no transport header)
+    end: offset of the end of the IP datagram in buf
+    l4: offset of the transport header in buf
+    sport, dport: transport ports (UDP, TCP, SCTP), or None
+    flags: TCP flags (from FIN to NS), or None
+    teid, msg: GTP-U TEID and message type, or None
+    gtp_end: offset of the end of the GTP-U message in buf (as given by its
+             length), or None
+    off: offset of the payload in buf (after the transport header, or after
+         the GTP-U header)
+    inner: PktInfo of the inner IP packet of a GTP-U T-PDU, or None
+    '''
+    __slots__ = ('buf', 'link', 'ip', 'ver', 'src', 'dst', 'proto', 'frag',
+                 'end', 'l4', 'sport', 'dport', 'flags', 'teid', 'msg',
+                 'gtp_end', 'off', 'inner')
+
+    def __init__(self, buf, link, ip):
+        self.buf, self.link, self.ip = buf, link, ip
+        self.frag = False
+        self.sport, self.dport, self.flags = None, None, None
+        self.teid, self.msg, self.inner = None, None, None
+        self.gtp_end = None
+
+    def __repr__(self):
+        if self.ver is None:
+            return '<PktInfo GTP-U TEID 0x%.8x, inner %r>' \
+                   % (self.teid, self.inner)
+        elif self.ver == 4:
+            src, dst = inet_ntoa(self.src), inet_ntoa(self.dst)
+        else:
+            src, dst = self.src.encode('hex'), self.dst.encode('hex')
+        r = '<PktInfo IPv%i %s:%s -> %s:%s, proto %i' \
+            % (self.ver, src, self.sport, dst, self.dport, self.proto)
+        if self.teid is not None:
+            r += ', TEID 0x%.8x' % self.teid
+        if self.inner is not None:
+            r += ', inner %r' % self.inner
+        return r + '>'
+
+    def src_ip(self):
+        # IPv4 source address, in dotted notation
+        return inet_ntoa(self.src)
+
+    def dst_ip(self):
+        # IPv4 destination address, in dotted notation
+        return inet_ntoa(self.dst)
+
+    def _pay_end(self):
+        # offset of the end of the payload: end of the GTP-U message, or of
+        # the IP datagram
+        return self.end if self.gtp_end is None else self.gtp_end
+
+    def payload(self):
+        # payload, without copy
+        return buffer(self.buf, self.off, self._pay_end() - self.off)
+
+    def layers(self):
+        '''
+        returns a Block with the full Layers (Eth, IPv4 / IPv6, UDP / TCP,
+        GTPv1, and the inner IP Layers) mapped on the buffer, and the payload
+        as a RawLayer
+        '''
+        blk = Block('pkt')
+        self._layers(blk)
+        return blk
+
+    def _layers(self, blk):
+        buf = self.buf
+        if self.ver is None:
+            # from dissect_gtpu()
+            blk.append(GTPv1())
+            blk[-1].map(buf[:self.off])
+        elif self.link == LINKTYPE_ETHERNET:
+            blk.append(Eth())
+            blk[-1].map(buf[:14])
+            off = 14
+            while off < self.ip:
+                blk.append(Vlan())
+                blk[-1].map(buf[off:off+4])
+                off += 4
+        elif self.link is not None and self.ip:
+            # Linux cooked header
+            blk.append(RawLayer(buf[:self.ip]))
+        if self.ver is not None:
+            blk.append((IPv4, IPv6)[self.ver == 6]())
+            blk[-1].map(buf[self.ip:self.l4])
+        if self.ver is not None and self.l4 < self.off:
+            if self.proto == 17:
+                blk.append(UDP())
+                blk[-1].map(buf[self.l4:self.l4+8])
+                if self.teid is not None:
+                    blk.append(GTPv1())
+                    blk[-1].map(buf[self.l4+8:self.off])
+            elif self.proto == 6:
+                blk.append(TCP())
+                blk[-1].map(buf[self.l4:self.off])
+            else:
+                blk.append(RawLayer(buf[self.l4:self.off]))
+        if self.inner is not None:
+            self.inner._layers(blk)
+        else:
+            blk.append(RawLayer(buf[self.off:self._pay_end()]))
+
+
+def dissect(buf, link=LINKTYPE_RAW):
+    '''
+    dissects the headers of the packet buf, of the given link type (as in
+    pcap: Ethernet, raw IP, Linux cooked, IPv4 or IPv6)
+
+    returns a PktInfo, or None if buf does not contain a (complete) IPv4 or
+    IPv6 header
+    '''
+    try:
+        if link == LINKTYPE_ETHERNET:
+            typ, off = _H.unpack_from(buf, 12)[0], 14
+            # 802.1Q / 802.1ad tags
+            while typ in (0x8100, 0x88a8):
+                typ, off = _H.unpack_from(buf, off+2)[0], off+4
+            if typ not in (0x0800, 0x86dd):
+                return None
+        elif link == LINKTYPE_LINUX_SLL:
+            if _H.unpack_from(buf, 14)[0] not in (0x0800, 0x86dd):
+                return None
+            off = 16
+        elif link in (LINKTYPE_RAW, LINKTYPE_IPV4, LINKTYPE_IPV6):
+            off = 0
+        else:
+            return None
+    except struct_error:
+        return None
+    return dissect_ip(buf, off, link)
+
+def dissect_ip(buf, off=0, link=LINKTYPE_RAW):
+    '''
+    dissects the headers of the IPv4 or IPv6 packet starting at offset off
+    in buf
+
+    returns a PktInfo, or None if there is no (complete) IP header
+    '''
+    pkt = PktInfo(buf, link, off)
+    try:
+        ver = ord(buf[off]) >> 4
+        if ver == 4:
+            vihl, tlen, frag, pkt.proto, pkt.src, pkt.dst = \
+                _IPV4.unpack_from(buf, off)
+            l4 = off + (vihl & 0xf)*4
+            pkt.end = min(off + tlen, len(buf))
+            pkt.frag = frag & 0x1fff > 0
+        elif ver == 6:
+            plen, nh, pkt.src, pkt.dst = _IPV6.unpack_from(buf, off)
+            l4 = off + 40
+            pkt.end = min(l4 + plen, len(buf))
+            while nh in _IPV6_EXTS:
+                if nh == 44:
+                    nh, frag = _IPV6_FRAG.unpack_from(buf, l4)
+                    l4 += 8
+                    if frag & 0xfff8:
+                        pkt.frag = True
+                        break
+                else:
+                    nh, hl = _IPV6_EXT.unpack_from(buf, l4)
+                    l4 += 8 + hl*8
+            pkt.proto = nh
+        else:
+            return None
+    except (struct_error, IndexError):
+        return None
+    pkt.ver, pkt.l4, pkt.off = ver, l4, l4
+    if pkt.frag:
+        return pkt
+    #
+    proto = pkt.proto
+    try:
+        if proto == 17:
+            pkt.sport, pkt.dport = _PORTS.unpack_from(buf, l4)
+            pkt.off = l4 + 8
+            if pkt.dport == GTPU_PORT or pkt.sport == GTPU_PORT:
+                _dissect_gtpu(pkt)
+        elif proto == 6:
+            pkt.sport, pkt.dport = _PORTS.unpack_from(buf, l4)
+            doff, flags = _TCP.unpack_from(buf, l4)
+            pkt.flags = flags | (doff & 1) << 8
+            pkt.off = l4 + (doff >> 4)*4
+        elif proto == 132:
+            pkt.sport, pkt.dport = _PORTS.unpack_from(buf, l4)
+            pkt.off = l4 + 12
+    except struct_error:
+        pass
+    return pkt
+
+def _dissect_gtpu(pkt):
+    # GTPv1-U header, TS 29.281
+    buf, start = pkt.buf, pkt.off
+    try:
+        flags, msg, ln, teid = _GTPU.unpack_from(buf, start)
+        if flags >> 5 != 1:
+            return
+        off = start + 8
+        if flags & 0x07:
+            nh = ord(buf[off+3])
+            off += 4
+            # extension headers
+            if flags & 0x04:
+                while nh:
+                    el = 4*ord(buf[off])
+                    if not el:
+                        return
+                    nh = ord(buf[off+el-1])
+                    off += el
+    except (struct_error, IndexError):
+        return
+    pkt.teid, pkt.msg, pkt.off = teid, msg, off
+    # GTP length: after the mandatory header
+    pkt.gtp_end = min(pkt.end, start + 8 + ln)
+    if msg == 0xff and off < pkt.gtp_end:
+        pkt.inner = dissect_ip(buf, off, None)
+        if pkt.inner is not None:
+            pkt.inner.end = min(pkt.inner.end, pkt.gtp_end)
+
+def dissect_gtpu(buf):
+    '''
+    dissects the GTP-U packet buf, as received on a GTP-U UDP socket
+
+    returns a PktInfo with only the GTP-U TEID and message type, the payload
+    offset, the end of the GTP-U message and the inner IP packet record set
+    (end being the length of buf), or None if buf does not start with a 
+    GTPv1-U header
+    '''
+    pkt = PktInfo(buf, None, None)
+    pkt.ver, pkt.src, pkt.dst, pkt.proto = None, None, None, None
+    pkt.l4, pkt.off, pkt.end = 0, 0, len(buf)
+    _dissect_gtpu(pkt)
+    if pkt.teid is None:
+        return None
+    return pkt
+
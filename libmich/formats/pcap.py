@@ -100,3 +100,696 @@ class gsmtap(Layer):
         Int('sub_slot', Pt=0, Type='uint8'),
         Int('res', Pt=0, Type='uint8')
         ]
+
+
+###
+# streaming pcap / pcapng reader
+# pcapng from http://xml2rfc.tools.ietf.org/cgi-bin/xml2rfc.cgi?url=https://raw.githubusercontent.com/pcapng/pcapng/master/draft-tuexen-opsawg-pcapng.xml
+###
+import os
+import mmap
+from hashlib import md5
+from StringIO import StringIO
+from struct import Struct, pack
+
+PCAP_MAGIC_US = 0xa1b2c3d4
+PCAP_MAGIC_NS = 0xa1b23c4d
+PCAPNG_SHB = 0x0a0d0d0a
+PCAPNG_BOM = 0x1a2b3c4d
+# pcapng block types
+PCAPNG_IDB = 1
+PCAPNG_PB = 2
+PCAPNG_SPB = 3
+PCAPNG_EPB = 6
+# pcapng interface option for timestamp resolution
+PCAPNG_IF_TSRESOL = 9
+
+# precompiled structures, per endianness
+_U32 = {'<':Struct('<I'), '>':Struct('>I')}
+_REC = {'<':Struct('<IIII'), '>':Struct('>IIII')}
+_BLK = {'<':Struct('<II'), '>':Struct('>II')}
+_IDB = {'<':Struct('<HHI'), '>':Struct('>HHI')}
+_EPB = {'<':Struct('<IIIII'), '>':Struct('>IIIII')}
+_PB = {'<':Struct('<HHIIII'), '>':Struct('>HHIIII')}
+_OPT = {'<':Struct('<HH'), '>':Struct('>HH')}
+
+# sidecar offset index:
+# header: magic, version, captured file size, modification time and MD5 
+#         digest of its first and last _IDX_DIG_LEN bytes, number of records,
+#         number of interfaces
+# interfaces: endianness, link type, timestamp resolution code
+# records: offset (uint64) and interface number (uint16)
+_IDX_MAGIC = 'LMPI'
+_IDX_VERS = 2
+_IDX_HDR = Struct('<4sIQd16sQI')
+_IDX_DIG_LEN = 4096
+_IDX_IF = Struct('<cIB')
+_IDX_REC = Struct('<QH')
+
+class PcapError(Exception):
+    pass
+
+def _mmap_file(path):
+    fd = open(path, 'rb')
+    try:
+        return mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+    finally:
+        fd.close()
+
+def _ts_factor(code):
+    # pcapng if_tsresol code: negative power of 10, or of 2 if MSB is set
+    if code & 0x80:
+        return 2.0 ** -(code & 0x7f)
+    else:
+        return 10.0 ** -code
+
+class PcapReader(object):
+    '''
+    streaming reader for pcap and pcapng files
+    
+    The file is mmap'd, and records are read lazily when iterating over the 
+    reader, which yields (timestamp, link type, payload) for each of them:
+    - timestamp is a float, in seconds since the epoch (pcapng Simple Packet
+      Blocks having no timestamp, it is None for them)
+    - payload is a buffer on the mmap'd file, without any copy (use str() to 
+      get the corresponding string), which remains valid until the reader is 
+      closed
+    
+    Classic pcap (little and big endian, micro and nanosecond resolution) 
+    and pcapng (all sections, Enhanced / Simple / obsolete Packet Blocks, 
+    with the if_tsresol option of each interface) are supported.
+    
+    Records can also be accessed by index, after their offsets have been 
+    recorded in a sidecar index file (path + '.idx'), which is built on the 
+    first call to load_index() (or when opening the reader with index=True,
+    or with index set to the path of the index file), and then mmap'd too: 
+    memory usage does not depend on the size of the capture.
+    
+    >>> with PcapReader('trace.pcapng', index=True) as pcap:
+    ...     ts, linktype, pay = pcap[1000]
+    ...     for ts, linktype, pay in pcap:
+    ...         [...]
+    '''
+    
+    def __init__(self, path, index=False):
+        self.path = path
+        self.buf = _mmap_file(path)
+        self._idx = None
+        self._idx_buf = None
+        try:
+            self._init()
+            if index:
+                self.load_index(None if index is True else index)
+        except:
+            self.close()
+            raise
+    
+    def _init(self):
+        buf = self.buf
+        if len(buf) < 4:
+            raise(PcapError('%s: not a pcap / pcapng file' % self.path))
+        magic = _U32['<'].unpack_from(buf, 0)[0]
+        self.ng = False
+        if magic == PCAPNG_SHB:
+            self.ng = True
+        elif magic in (PCAP_MAGIC_US, PCAP_MAGIC_NS):
+            self._endian = '<'
+        else:
+            magic = _U32['>'].unpack_from(buf, 0)[0]
+            if magic in (PCAP_MAGIC_US, PCAP_MAGIC_NS):
+                self._endian = '>'
+            else:
+                raise(PcapError('%s: not a pcap / pcapng file' % self.path))
+        if not self.ng:
+            if len(buf) < 24:
+                raise(PcapError('%s: truncated pcap global header' \
+                      % self.path))
+            # single interface: (endianness, link type, timestamp resolution)
+            self._if = [(self._endian,
+                         _U32[self._endian].unpack_from(buf, 20)[0],
+                         9 if magic == PCAP_MAGIC_NS else 6)]
+    
+    def close(self):
+        if self._idx_buf is not None:
+            self._idx_buf.close()
+            self._idx_buf = None
+        self.buf.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *args):
+        self.close()
+    
+    #--------------------------------------------------------------------------#
+    # sequential access
+    #--------------------------------------------------------------------------#
+    def __iter__(self):
+        for off, ifn, ifs in self._iter_offsets():
+            yield self._read(off, ifs[ifn])
+    
+    def _iter_offsets(self):
+        # yields (offset, interface number, interfaces) for each record, 
+        # interfaces being the list of all interfaces seen so far
+        if self.ng:
+            for r in self._iter_offsets_ng():
+                yield r
+            return
+        buf, end, off = self.buf, len(self.buf), 24
+        unpack = _REC[self._endian].unpack_from
+        ifs = self._if
+        while off + 16 <= end:
+            nxt = off + 16 + unpack(buf, off)[2]
+            if nxt > end:
+                # truncated capture
+                return
+            yield off, 0, ifs
+            off = nxt
+    
+    def _iter_offsets_ng(self):
+        buf, end, off = self.buf, len(self.buf), 0
+        # interfaces are numbered over the whole file, base being the number
+        # of the first interface of the current section
+        ifs, base, E = [], 0, '<'
+        while off + 12 <= end:
+            typ = _U32['<'].unpack_from(buf, off)[0]
+            if typ == PCAPNG_SHB:
+                # new section, with its own endianness and interfaces
+                bom = _U32['<'].unpack_from(buf, off+8)[0]
+                if bom == PCAPNG_BOM:
+                    E = '<'
+                elif bom == 0x4d3c2b1a:
+                    E = '>'
+                else:
+                    raise(PcapError('%s: invalid pcapng section at offset %i'\
+                          % (self.path, off)))
+                base = len(ifs)
+            else:
+                typ = _U32[E].unpack_from(buf, off)[0]
+            blen = _U32[E].unpack_from(buf, off+4)[0]
+            if blen < 12 or off + blen > end:
+                # truncated capture
+                return
+            if typ == PCAPNG_EPB or typ == PCAPNG_PB:
+                if typ == PCAPNG_EPB:
+                    ifn = _U32[E].unpack_from(buf, off+8)[0]
+                else:
+                    ifn = _OPT[E].unpack_from(buf, off+8)[0]
+                if base+ifn >= len(ifs):
+                    raise(PcapError('%s: undefined interface %i for the '\
+                          'packet block at offset %i' % (self.path, ifn, off)))
+                yield off, base+ifn, ifs
+            elif typ == PCAPNG_SPB:
+                if base >= len(ifs):
+                    raise(PcapError('%s: undefined interface 0 for the '\
+                          'packet block at offset %i' % (self.path, off)))
+                yield off, base, ifs
+            elif typ == PCAPNG_IDB:
+                ifs.append(self._read_idb(off, blen, E))
+            off += blen
+    
+    def _read_idb(self, off, blen, E):
+        buf = self.buf
+        linktype, res, snaplen = _IDB[E].unpack_from(buf, off+8)
+        tsres = 6
+        # options
+        o, end = off+16, off+blen-4
+        unpack = _OPT[E].unpack_from
+        while o + 4 <= end:
+            code, olen = unpack(buf, o)
+            if code == 0:
+                break
+            elif code == PCAPNG_IF_TSRESOL and olen >= 1:
+                tsres = ord(buf[o+4])
+            o += 4 + olen + (-olen % 4)
+        return (E, linktype, tsres)
+    
+    def _read(self, off, iface):
+        # returns (timestamp, link type, payload) of the record at offset off
+        E, linktype, tsres = iface
+        buf = self.buf
+        if not self.ng:
+            sec, frac, incl_len, orig_len = _REC[E].unpack_from(buf, off)
+            return sec + frac * _ts_factor(tsres), linktype, \
+                   buffer(buf, off+16, incl_len)
+        typ, blen = _BLK[E].unpack_from(buf, off)
+        if typ == PCAPNG_EPB:
+            ifn, tsh, tsl, cap_len, orig_len = _EPB[E].unpack_from(buf, off+8)
+            pay = off+28
+        elif typ == PCAPNG_PB:
+            ifn, drops, tsh, tsl, cap_len, orig_len = \
+                _PB[E].unpack_from(buf, off+8)
+            pay = off+28
+        else:
+            # SPB: captured length is bounded by the block length
+            orig_len = _U32[E].unpack_from(buf, off+8)[0]
+            return None, linktype, \
+                   buffer(buf, off+12, min(orig_len, blen-16))
+        return ((tsh<<32) + tsl) * _ts_factor(tsres), linktype, \
+               buffer(buf, pay, cap_len)
+    
+    #--------------------------------------------------------------------------#
+    # indexed access
+    #--------------------------------------------------------------------------#
+    def _idx_sig(self):
+        # returns the size, modification time and digest of the capture, 
+        # recorded in the index header
+        buf, n = self.buf, _IDX_DIG_LEN
+        dig = md5(buf[:n] + buf[max(n, len(buf)-n):]).digest()
+        return len(buf), os.path.getmtime(self.path), dig
+    
+    def build_index(self, path=None):
+        '''
+        scans the whole capture and writes the offsets of all records into 
+        the sidecar index file (path + '.idx' by default)
+        returns the number of records
+        '''
+        if path is None:
+            path = self.path + '.idx'
+        fd = open(path + '.tmp', 'wb')
+        try:
+            try:
+                num = self._write_index(fd)
+            finally:
+                fd.close()
+            os.rename(path + '.tmp', path)
+        except:
+            if os.path.exists(path + '.tmp'):
+                os.remove(path + '.tmp')
+            raise
+        return num
+    
+    def _write_index(self, fd):
+        # writes the index into the file object fd, returns the number of 
+        # records
+        num, ifs = 0, self._if if not self.ng else []
+        # header is written again at the end, when counts are known
+        fd.write(_IDX_HDR.pack(_IDX_MAGIC, 0, 0, 0, '', 0, 0))
+        pack, chunk = _IDX_REC.pack, []
+        for off, ifn, ifs in self._iter_offsets():
+            chunk.append(pack(off, ifn))
+            if len(chunk) == 4096:
+                fd.write(''.join(chunk))
+                chunk = []
+            num += 1
+        fd.write(''.join(chunk))
+        for E, linktype, tsres in ifs:
+            fd.write(_IDX_IF.pack(E, linktype, tsres))
+        fd.seek(0)
+        fd.write(_IDX_HDR.pack(*(_IDX_MAGIC, _IDX_VERS) + self._idx_sig() \
+                                + (num, len(ifs))))
+        return num
+    
+    def load_index(self, path=None):
+        '''
+        mmaps the sidecar index file (path + '.idx' by default), building it
+        first if it does not exist or does not correspond to the capture 
+        (i.e. its size, modification time, or first and last bytes changed)
+        
+        When the index file cannot be written (e.g. in a read-only directory),
+        the index is built in memory.
+        '''
+        if path is None:
+            path = self.path + '.idx'
+        if self._idx_buf is not None:
+            self._idx_buf.close()
+            self._idx_buf = None
+        sig = (_IDX_MAGIC, _IDX_VERS) + self._idx_sig()
+        idx = self._open_index(path, sig)
+        if idx is None:
+            try:
+                self.build_index(path)
+            except (IOError, OSError):
+                idx = self._mem_index()
+            else:
+                idx = self._open_index(path, sig)
+                if idx is None:
+                    raise(PcapError('%s: invalid index file' % path))
+        hdr = _IDX_HDR.unpack_from(idx, 0)
+        self._idx_buf = idx
+        num, numif = hdr[5], hdr[6]
+        off = _IDX_HDR.size + num * _IDX_REC.size
+        self._idx = [_IDX_IF.unpack_from(idx, off + i*_IDX_IF.size) \
+                     for i in range(numif)]
+        self._idx_num = num
+        return num
+    
+    def _open_index(self, path, sig):
+        # returns the mmap'd index file, if it corresponds to the capture
+        try:
+            idx = _mmap_file(path)
+        except (EnvironmentError, ValueError):
+            # missing, unreadable or empty file
+            return None
+        if len(idx) >= _IDX_HDR.size \
+        and _IDX_HDR.unpack_from(idx, 0)[:5] == sig:
+            return idx
+        idx.close()
+        return None
+    
+    def _mem_index(self):
+        # returns the index built into an anonymous mmap
+        fd = StringIO()
+        self._write_index(fd)
+        buf = fd.getvalue()
+        idx = mmap.mmap(-1, len(buf))
+        idx.write(buf)
+        return idx
+    
+    def __len__(self):
+        if self._idx_buf is None:
+            raise(PcapError('%s: no index loaded' % self.path))
+        return self._idx_num
+    
+    def __getitem__(self, i):
+        num = len(self)
+        if i < 0:
+            i += num
+        if not 0 <= i < num:
+            raise(IndexError('record index out of range'))
+        off, ifn = _IDX_REC.unpack_from(self._idx_buf, 
+                                        _IDX_HDR.size + i*_IDX_REC.size)
+        return self._read(off, self._idx[ifn])
+    
+    def iter_from(self, i):
+        '''
+        yields (timestamp, link type, payload) for all records starting 
+        from index i, using the sidecar index
+        '''
+        for j in xrange(i, len(self)):
+            yield self[j]
+
+
+###
+# buffered pcap writer
+###
+from time import time
+from threading import Lock
+from socket import inet_aton, error as socket_error
+from libmich.utils.inet import checksum
+
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+
+# record header, same format as Record
+_REC_HDR = Struct('<IIII')
+# IPv4 header (without options), UDP header, 
+# SCTP common header and DATA chunk header
+_IPV4_HDR = Struct('>BBHHHBBH4s4s')
+_UDP_HDR = Struct('>HHHH')
+_SCTP_HDR = Struct('>HHII')
+_SCTP_DATA = Struct('>BBHIHHI')
+
+def _inet_aton(ip):
+    try:
+        return inet_aton(ip)
+    except (socket_error, TypeError):
+        # IPv6 or invalid address
+        return '\0\0\0\0'
+
+def ipv4_hdr(src, dst, proto, pay_len, ident=0):
+    '''
+    returns an IPv4 header (with its checksum), for a payload of length 
+    pay_len from the src to the dst IPv4 addresses (str)
+    '''
+    hdr = _IPV4_HDR.pack(0x45, 0, 20+pay_len, ident & 0xffff, 0x4000, 64, 
+                         proto, 0, _inet_aton(src), _inet_aton(dst))
+    return '%s%s%s' % (hdr[:10], pack('>H', checksum(hdr)), hdr[12:])
+
+def ipv4_udp(buf, src, dst, sport, dport):
+    '''
+    returns buf encapsulated into synthetic IPv4 / UDP headers (with a null
+    UDP checksum)
+    '''
+    return ''.join((ipv4_hdr(src, dst, 17, 8+len(buf)),
+                    _UDP_HDR.pack(sport, dport, 8+len(buf), 0),
+                    buf))
+
+def ipv4_sctp(buf, src, dst, sport, dport, ppid=0, stream=0, tsn=0, ssn=0):
+    '''
+    returns buf encapsulated into synthetic IPv4 / SCTP headers, with a 
+    single unfragmented DATA chunk (with a null verification tag and SCTP
+    checksum)
+    '''
+    pad = '\0' * (-len(buf) % 4)
+    sctp_len = 28 + len(buf) + len(pad)
+    return ''.join((ipv4_hdr(src, dst, 132, sctp_len),
+                    _SCTP_HDR.pack(sport, dport, 0, 0),
+                    _SCTP_DATA.pack(0, 3, 16+len(buf), tsn, stream, ssn, ppid),
+                    buf, pad))
+
+class PcapWriter(object):
+    '''
+    buffered pcap writer
+    
+    Records are appended into a preallocated write buffer, which is written
+    to the file when full, when flush() is called, or when more than 
+    FLUSH_PERIOD seconds elapsed since the last flush (this is checked when 
+    writing records, and when calling poll(), e.g. from an idle loop).
+    
+    When rotate_size (in bytes) or rotate_time (in seconds) are set, a new 
+    file is started each time the current one is over the given size or 
+    age: files are then named path_0000.ext, path_0001.ext, ...
+    
+    All methods can be called from several threads.
+    
+    write(buf, ts=None): records the packet buf (a string, with the link 
+        layer of the writer), at timestamp ts (default to now)
+    write_udp(buf, src, dst, sport, dport, ts=None): records buf within 
+        synthetic IPv4 / UDP headers (LINKTYPE_RAW writer only)
+    write_sctp(buf, src, dst, sport, dport, ppid=0, stream=0, ts=None): 
+        records buf within synthetic IPv4 / SCTP DATA chunk headers, with 
+        TSN and stream sequence numbers maintained for each association
+        (LINKTYPE_RAW writer only)
+    
+    >>> with PcapWriter('s1ap.pcap', rotate_size=100*1024*1024) as pcap:
+    ...     pcap.write_sctp(buf, '10.1.1.1', '10.1.1.100', 36412, 36412, 
+    ...                     ppid=18)
+    '''
+    # size of the write buffer
+    BUFLEN = 1<<20
+    # maximum duration between 2 flushes
+    FLUSH_PERIOD = 1.0
+    
+    def __init__(self, path, linktype=LINKTYPE_RAW, snaplen=65535, 
+                 rotate_size=None, rotate_time=None):
+        self.path = path
+        self.linktype = linktype
+        self.snaplen = snaplen
+        self.rotate_size = rotate_size
+        self.rotate_time = rotate_time
+        self._hdr = str(Global(magic=PCAP_MAGIC_US, vers_maj=2, vers_min=4,
+                               snaplen=snaplen, link_type=linktype))
+        self._buf = bytearray(self.BUFLEN)
+        self._pos = 0
+        self._lock = Lock()
+        # SCTP associations: (src, dst, sport, dport): [TSN, {stream: SSN}]
+        self._sctp = {}
+        self._num = -1
+        self._fd = None
+        self._open()
+    
+    def _open(self):
+        if self.rotate_size or self.rotate_time:
+            self._num += 1
+            root, ext = os.path.splitext(self.path)
+            path = '%s_%04i%s' % (root, self._num, ext)
+        else:
+            path = self.path
+        self._fd = open(path, 'wb')
+        self._fd.write(self._hdr)
+        self._size = len(self._hdr)
+        self._t0 = self._tf = time()
+    
+    def _flush(self):
+        if self._pos:
+            self._fd.write(buffer(self._buf, 0, self._pos))
+            self._pos = 0
+        self._fd.flush()
+        self._tf = time()
+    
+    def flush(self):
+        with self._lock:
+            self._flush()
+    
+    def poll(self):
+        '''
+        flushes the write buffer if more than FLUSH_PERIOD seconds elapsed
+        since the last flush, and rotates the file if required
+        '''
+        t = time()
+        with self._lock:
+            if self._pos and t - self._tf > self.FLUSH_PERIOD:
+                self._flush()
+            if self.rotate_time and t - self._t0 >= self.rotate_time:
+                self._rotate()
+    
+    def _rotate(self):
+        self._flush()
+        self._fd.close()
+        self._open()
+    
+    def close(self):
+        with self._lock:
+            if self._fd is not None:
+                self._flush()
+                self._fd.close()
+                self._fd = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *args):
+        self.close()
+    
+    def write(self, buf, ts=None):
+        if ts is None:
+            ts = time()
+        sec = int(ts)
+        incl = min(len(buf), self.snaplen)
+        hdr = _REC_HDR.pack(sec, int((ts - sec) * 1000000), incl, len(buf))
+        with self._lock:
+            if self.rotate_size and self._size + 16 + incl > self.rotate_size\
+            and self._size > len(self._hdr):
+                self._rotate()
+            elif self.rotate_time and ts - self._t0 >= self.rotate_time:
+                self._rotate()
+            pos = self._pos
+            if pos + 16 + incl > self.BUFLEN:
+                self._flush()
+                pos = 0
+                if 16 + incl > self.BUFLEN:
+                    # larger than the write buffer
+                    self._fd.write(hdr)
+                    self._fd.write(buffer(buf, 0, incl))
+                    self._size += 16 + incl
+                    return
+            self._buf[pos:pos+16] = hdr
+            self._buf[pos+16:pos+16+incl] = buf if incl == len(buf) \
+                                            else buffer(buf, 0, incl)
+            self._pos = pos + 16 + incl
+            self._size += 16 + incl
+            if ts - self._tf > self.FLUSH_PERIOD:
+                self._flush()
+    
+    def write_udp(self, buf, src, dst, sport, dport, ts=None):
+        self.write(ipv4_udp(buf, src, dst, sport, dport), ts)
+    
+    def write_sctp(self, buf, src, dst, sport, dport, ppid=0, stream=0, 
+                   ts=None):
+        with self._lock:
+            key = (src, dst, sport, dport)
+            if key not in self._sctp:
+                self._sctp[key] = assoc = [0, {}]
+            else:
+                assoc = self._sctp[key]
+            tsn = assoc[0]
+            assoc[0] = (tsn + 1) & 0xffffffff
+            ssn = assoc[1].get(stream, 0)
+            assoc[1][stream] = (ssn + 1) & 0xffff
+        self.write(ipv4_sctp(buf, src, dst, sport, dport, ppid, stream, tsn, 
+                             ssn), ts)
+
+
+###
+# multi-process dissection pipeline
+###
+from collections import deque
+from multiprocessing import Pool, cpu_count
+
+class PcapPipeline(object):
+    '''
+    multi-process dissection of a pcap / pcapng file
+    
+    The capture is indexed first (see PcapReader.load_index()), and split 
+    into ranges of num records. Each range is dissected by one of the 
+    worker processes, each one having its own PcapReader on the file, so 
+    that only ranges and results go through IPC. Results are yielded in the
+    order of the records, and at most 2 ranges per worker are pending at any
+    time.
+    
+    func(ts, linktype, payload) is called for each record, payload being a 
+    string, and must return a picklable result (e.g. the decoded value). 
+    init(*initargs), when given, is called once in each worker process at 
+    startup, e.g. to load ASN.1 modules.
+    
+    index is the path of the sidecar index file (path + '.idx' by default).
+    When it cannot be written (e.g. in a read-only directory), the main 
+    process and each worker build the index in memory.
+    
+    After a run, the pkts, duration and rate (records per second) 
+    attributes give the pipeline throughput.
+    
+    >>> def dissect(ts, linktype, pay):
+    ...     pdu.decode(pay[48:])
+    ...     return pdu()
+    >>> pipe = PcapPipeline('s1ap.pcap', dissect, workers=8)
+    >>> for val in pipe:
+    ...     [...]
+    >>> pipe.rate
+    '''
+    
+    def __init__(self, path, func, workers=None, num=512, init=None, 
+                 initargs=(), index=None):
+        self.path = path
+        self.index = index if index is not None else path + '.idx'
+        self.func = func
+        self.workers = workers if workers else cpu_count()
+        self.num = num
+        self.init = init
+        self.initargs = initargs
+        self.pkts = 0
+        self.duration = 0.0
+    
+    @property
+    def rate(self):
+        return self.pkts / self.duration if self.duration else 0.0
+    
+    def __iter__(self):
+        T0 = time()
+        self.pkts = 0
+        with PcapReader(self.path, index=self.index) as pcap:
+            total = len(pcap)
+        ranges = ((i, min(i+self.num, total)) \
+                  for i in xrange(0, total, self.num))
+        # worker processes are forked, hence func and init need not be 
+        # picklable
+        pool = Pool(self.workers, _pipe_init, 
+                    (self.path, self.func, self.init, self.initargs, 
+                     self.index))
+        try:
+            pending = deque()
+            for rng in ranges:
+                pending.append(pool.apply_async(_pipe_dissect, (rng, )))
+                if len(pending) == 2*self.workers:
+                    break
+            while pending:
+                rets = pending.popleft().get()
+                for rng in ranges:
+                    pending.append(pool.apply_async(_pipe_dissect, (rng, )))
+                    break
+                for ret in rets:
+                    self.pkts += 1
+                    yield ret
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+            self.duration = time() - T0
+
+# PcapReader and dissection function of a worker process, for PcapPipeline
+_WORKER_PIPE = [None, None]
+
+def _pipe_init(path, func, init, initargs, index):
+    if init is not None:
+        init(*initargs)
+    _WORKER_PIPE[0] = PcapReader(path, index=index)
+    _WORKER_PIPE[1] = func
+
+def _pipe_dissect(rng):
+    pcap, func = _WORKER_PIPE
+    rets = []
+    for i in xrange(*rng):
+        ts, linktype, pay = pcap[i]
+        rets.append(func(ts, linktype, str(pay)))
+    return rets
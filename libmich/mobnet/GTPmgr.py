@@ -53,6 +53,7 @@ GTPUd.BLACKHOLING = True, False or 'ext', to filter out all the mobile trafic, n
 GTPUd.WL_ACTIVE = True or False, to allow specific IP packets to be forwarded to the external network, bypassing the BLACKHOLING directive
 GTPUd.WL_PORTS = [('UDP', 53), ('UDP', 123)], to specify to list of IP protocol / port to allow in case WL_ACTIVE is True
 GTPUd.DPI = True or False, to store packet statistics (protocol / port / DNS requests, see the class DPI) in GTPUd.stats 
+GTPUd.PCAP = PcapWriter('gtpu.pcap') (from libmich.formats.pcap), to record GTP-U packets exchanged with the RAN into a pcap file
 
 2) To use the GTPUd, you need to be root or have the capability to start raw sockets:
 
@@ -94,6 +95,7 @@ else:
 
 #from libmich.formats.GTP import *
 from libmich.formats.IP import *
+from libmich.formats.dissect import dissect_ip, dissect_gtpu
 from libmich.core.element import Block
 from .utils import *
 #
@@ -456,8 +458,18 @@ class GTPUd(object):
     #WL_ACTIVE = True
     WL_PORTS = [('UDP', 53), ('UDP', 123)]
     #
+    # in case we want to decrement the TTL of IPv4 packets forwarded to / from
+    # the external IF, as a router does (packets whose TTL expires are
+    # dropped): IPv4 and UDP / TCP checksums are updated incrementally
+    TTL_DEC = False
+    #
     # in case we want to generate traffic statistics (available in .stats)
     DPI = True
+    #
+    # for recording GTP-U packets received from / sent to RNC / eNodeBs into a
+    # pcap file, with synthetic IPv4 / UDP headers, 
+    # e.g. PCAP = libmich.formats.pcap.PcapWriter(path)
+    PCAP = None
     
     def __init__(self):
         #
@@ -554,6 +566,8 @@ class GTPUd(object):
                  self._listening = False
             else:
                 r = select(self._sk, [], [], self.SELECT_TO)[0]
+                if self.PCAP is not None:
+                    self.PCAP.poll()
                 while r:
                     # read ext and int sockets until they are empty
                     for sk in r:
@@ -579,7 +593,7 @@ class GTPUd(object):
                         else:
                             # sk is self.int_sk
                             try:
-                                bufint = sk.recv(self.BUFLEN)
+                                bufint, addr = sk.recvfrom(self.BUFLEN)
                             except timeout:
                                 # nothing to read anymore
                                 r.remove(sk)
@@ -590,8 +604,14 @@ class GTPUd(object):
                                 r.remove(sk)
                                 self._sk.remove(sk)
                             else:
+                                if self.PCAP is not None:
+                                    self.PCAP.write_udp(bufint, addr[0], 
+                                                        self.INT_IP, addr[1],
+                                                        self.INT_PORT)
                                 self.transfer_to_ext(bufint)
         #
+        if self.PCAP is not None:
+            self.PCAP.flush()
         self._log('INF', 'GTPU handler stopped')
     
     def transfer_to_ext(self, buf='\0'):
@@ -600,12 +620,12 @@ class GTPUd(object):
         # except to avoid IP spoofing from malicious mobile 
         # (damned ! Would it be possible ?!?)
         #
-        # extract the GTP header
-        try:
-            flags, msgtype, msglen, teid = unpack('>BBHI', buf[:8])
-        except:
+        # extract the GTP header, and the headers of the IP packet
+        gtp = dissect_gtpu(buf)
+        if gtp is None:
             self._log('WNG', 'invalid GTP packet from RAN')
             return
+        teid, msgtype = gtp.teid, gtp.msg
         #
         # in case GTP TEID is not correct, drop it 
         if teid not in self._mobiles_teid:
@@ -618,10 +638,7 @@ class GTPUd(object):
             return
         #
         # get the IP packet: use the length in GTPv1 header to cut the buffer
-        if flags & 0x04:
-            # GTP header extended
-            msglen -= 4
-        ipbuf = buf[-msglen:]
+        ipbuf = buf[gtp.off:gtp.gtp_end]
         #
         # drop dummy IP packets
         if len(ipbuf) < 24:
@@ -630,23 +647,24 @@ class GTPUd(object):
             return
         #
         # drop packet other than IPv4
-        ipver = ord(ipbuf[0]) >> 4
-        if ipver != 4:
+        ip = gtp.inner
+        if ip is None or ip.ver != 4:
+            ipver = ord(ipbuf[0]) >> 4
             self._log('WNG', 'unsupported IPv{0} packet from UE'.format(ipver))
             return
         #
         # drop spoofed IP packet
-        if ipbuf[12:16] not in self._mobiles_ip:
+        if ip.src not in self._mobiles_ip:
             self._log('WNG', 'spoofed IPv4 source address from UE: {0}'.format(
-                      inet_ntoa(ipbuf[12:16])))
+                      ip.src_ip()))
             return
         #
-        ipsrc = inet_ntoa(ipbuf[12:16])
-        ipdst = inet_ntoa(ipbuf[16:20])
+        ipsrc = ip.src_ip()
+        ipdst = ip.dst_ip()
         #
         # analyze the packet content for statistics
         if self.DPI:
-            self._analyze(ipsrc, ipbuf)
+            self._analyze(ipsrc, ipbuf, ip)
         #
         # possibly process the UL GTP-U payload within modules
         try:
@@ -685,6 +703,10 @@ class GTPUd(object):
     
     def _transfer_to_ext(self, macdst=bytes(), ipbuf='\0'):
         # forward to the external PF_PACKET socket, over the Gi interface
+        if self.TTL_DEC:
+            ipbuf = self._dec_ttl(ipbuf)
+            if ipbuf is None:
+                return
         try:
             self.ext_sk.sendto('{0}{1}\x08\0{2}'.format(
                                 macdst, self.GGSN_MAC_BUF, ipbuf),
@@ -712,12 +734,26 @@ class GTPUd(object):
             # check dest IP
             ipdst = buf[16:20]
             if ipdst in self._mobiles_ip:
+                if self.TTL_DEC:
+                    buf = self._dec_ttl(buf)
+                    if buf is None:
+                        return
                 # GTP header
                 gtphdr = pack('>BBHI', 0x30, 0xff, len(buf),
                                        self._mobiles_ip[ipdst][1])
                 self._transfer_to_int(ipdst, gtphdr + buf)
                 #threadit(self._transfer_to_int, ipdst, gtphdr + buf)
     
+    def _dec_ttl(self, ipbuf):
+        # returns the IPv4 packet with its TTL decremented, or None if it
+        # expired
+        ttl = ord(ipbuf[8])
+        if ttl <= 1:
+            self._log('WNG', 'IPv4 packet with expired TTL dropped: {0}'\
+                      .format(inet_ntoa(ipbuf[16:20])))
+            return None
+        return ipv4_rewrite(ipbuf, ttl=ttl-1)
+    
     def _transfer_to_int(self, ipdst=bytes(), gtpbuf=bytes()):
         try:
             ret = self.int_sk.sendto(gtpbuf,
@@ -726,6 +762,10 @@ class GTPUd(object):
             self._log('ERR', 'internal network IF error (sendto): {0}'\
                       .format(err))
         else:
+            if self.PCAP is not None:
+                self.PCAP.write_udp(gtpbuf, self.INT_IP, 
+                                    self._mobiles_ip[ipdst][0], self.INT_PORT,
+                                    self.INT_PORT)
             self._log('DBG', '{0} bytes transferred from RAW to GTPU'.format(
                       ret))
     
@@ -771,30 +811,36 @@ class GTPUd(object):
         self.GTP_TEID += 1
         return self.GTP_TEID
     
-    def _analyze(self, ipsrc, ipbuf):
+    def _analyze(self, ipsrc, ipbuf, ip=None):
+        # ip: record of the IP packet headers, from dissect_ip(), with offsets
+        # into ip.buf
         #
         if ipsrc not in self.stats:
             self.init_stats(ipsrc)
         stats = self.stats[ipsrc]
         #
-        dst, prot, pay = DPI.get_ip_dst_pay(ipbuf)
+        if ip is None:
+            ip = dissect_ip(ipbuf)
+        if ip is None or ip.ver != 4:
+            stats['alien'].append(hexlify(ipbuf))
+            return
+        dst, prot, port = ip.dst_ip(), ip.proto, ip.dport
+        pay = ip.l4 < ip.end
         # UDP
-        if prot == 17 and pay:
-            port = DPI.get_port(pay)
+        if prot == 17 and port is not None:
             if (dst, port) not in stats['UDP']:
                 stats['UDP'].append((dst, port))
             # DNS
             if port == 53:
                 if dst not in stats['DNS']:
                     stats['DNS'].append(dst)
-                name = DPI.get_dn_req(pay[8:])
+                name = DPI.get_dn_req(ip.buf[ip.off:ip.end])
                 if name not in stats['resolved']:
                     stats['resolved'].append(name)
             elif port == 123 and dst not in stats['NTP']:
                 stats['NTP'].append(dst)
         # TCP
-        elif prot == 6 and pay:
-            port = DPI.get_port(pay)
+        elif prot == 6 and port is not None:
             if (dst, port) not in stats['TCP']:
                 stats['TCP'].append((dst, port))
         # ICMP
@@ -809,14 +855,10 @@ class DPI:
     @staticmethod
     def get_ip_dst_pay(ipbuf):
         # returns a 3-tuple: dst IP, protocol, payload buffer
-        # get IP header length
-        l = (ord(ipbuf[0]) & 0x0F) * 4
-        # get dst IP
-        dst = inet_ntoa(ipbuf[16:20])
-        # get protocol
-        prot = ord(ipbuf[9:10])
-        #
-        return (dst, prot, ipbuf[l:])
+        ip = dissect_ip(ipbuf)
+        if ip is None or ip.ver != 4:
+            return (None, None, '')
+        return (ip.dst_ip(), ip.proto, ipbuf[ip.l4:ip.end])
     
     @staticmethod
     def get_port(pay):
@@ -78,6 +78,9 @@ class MMEd(object):
     TRACE_NAS = True
     # for logging SMS-CP PDU decoded / encoded
     TRACE_SMS = True
+    # for recording S1AP PDU sent / received into a pcap file, with synthetic
+    # IPv4 / SCTP headers, e.g. PCAP = libmich.formats.pcap.PcapWriter(path)
+    PCAP = None
     #
     #---------------------#
     # MME server settings #
@@ -232,6 +235,8 @@ class MMEd(object):
         self._log('DBG', 'eNodeB Global ID configured: {0}'.format(self.ENB.keys()))
         # for all SCTP sockets established for each eNB (sk:enb_gid)
         self.ENBSk = {}
+        # for all eNB SCTP addresses, when recording into PCAP (sk:(ip, port))
+        self._pcap_addr = {}
         # for all Tracking Areas handled by attached eNB (ta:[enb_gid, ...])
         self.TA = {}
         # for keeping a cache of all randomly attributed downlink TEID
@@ -443,6 +448,10 @@ class MMEd(object):
                     # (whatever S1AP PDU)
                     self.handle_stream_msg(sk)
             #
+            # flush S1AP PDU recorded into the pcap file periodically
+            if self.PCAP is not None:
+                self.PCAP.poll()
+            #
             # clean-up potential signalling procedures in timeout
             if self.SCHED_UE_TO:
                 if not len(sk_ready) or time() - T_lto > self.SCHED_RES:
@@ -464,6 +473,8 @@ class MMEd(object):
                 self.del_enb(enb_gid)
             # close the main SCTP listener
             self._sk.close()
+            if self.PCAP is not None:
+                self.PCAP.flush()
     
     
     def add_enb(self, enb_gid):
@@ -501,6 +512,8 @@ class MMEd(object):
         # remove the eNB sk from the socket list of the MME
         if sk in self.ENBSk:
             del self.ENBSk[sk]
+        if sk in self._pcap_addr:
+            del self._pcap_addr[sk]
         # remove S1 info from UE previously attached to this eNB
         for ue in self.UE.values():
             if ue.ENB is not None and ue.ENB.GID == enb_gid:
@@ -529,6 +542,8 @@ class MMEd(object):
             self._log('DBG', '[eNB: {0}] S1AP stream closed by eNB'.format(enb_gid))
             return
         self._log('TRACE_SK_UL', buf)
+        if self.PCAP is not None:
+            self._pcap_s1ap(sk, buf, True)
         #
         try:
             self._S1AP_PDU.decode(buf)
@@ -771,6 +786,27 @@ class MMEd(object):
                           .format(enb_gid, err))
             else:
                 self._log('TRACE_SK_DL', buf)
+                if self.PCAP is not None:
+                    self._pcap_s1ap(sk, buf, False, stream_id)
+    
+    def _pcap_s1ap(self, sk, buf, ul, stream_id=0):
+        # record the S1AP PDU into the pcap file
+        # eNB addresses are only cached for established S1AP streams
+        if sk in self._pcap_addr:
+            enb_ip, enb_port = self._pcap_addr[sk]
+        else:
+            try:
+                enb_ip, enb_port = sk.getpeername()[:2]
+            except Exception:
+                enb_ip, enb_port = '0.0.0.0', 0
+            if sk in self.ENBSk:
+                self._pcap_addr[sk] = (enb_ip, enb_port)
+        if ul:
+            self.PCAP.write_sctp(buf, enb_ip, self.SERVER_IP, enb_port, 
+                                 self.SERVER_PORT, ppid=18, stream=stream_id)
+        else:
+            self.PCAP.write_sctp(buf, self.SERVER_IP, enb_ip, self.SERVER_PORT,
+                                 enb_port, ppid=18, stream=stream_id)
     
     #--------------------#
     # eNB errors handler #
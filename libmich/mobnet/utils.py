@@ -38,6 +38,7 @@ from libmich.formats.L3Mobile_IE import ID, GUTI, PLMN, LAI
 from libmich.asn1.utils import _make_GLOBAL
 from libmich.asn1.processor import PER, ASN1, load_module, GLOBAL
 ASN1Obj = ASN1.ASN1Obj
+ASN1Ctx = ASN1.ASN1Ctx
 ASN1Obj._DEBUG = 0
 ASN1Obj._SAFE = True
 #ASN1Obj._SAFE = False
@@ -147,6 +148,32 @@ def get_ue_s1ap_id(s1appdu):
     #
     return mme_ue_id, enb_ue_id
 
+# S1AP-PDU components required to route an S1AP message
+S1AP_ROUTE_SELECT = \
+    [(msg, 'procedureCode') for msg in \
+     ('initiatingMessage', 'successfulOutcome', 'unsuccessfulOutcome')] + \
+    [(msg, 'value', '*', 'protocolIEs', 'value', ie) for msg in \
+     ('initiatingMessage', 'successfulOutcome', 'unsuccessfulOutcome') \
+     for ie in ('MME-UE-S1AP-ID', 'ENB-UE-S1AP-ID')]
+
+def get_s1ap_route(buf=''):
+    '''
+    decodes only the procedure code and the UE S1AP identifiers of the S1AP
+    PDU in buf, within its own context (so it can be called from any thread)
+    
+    returns (S1AP-PDU message, procedureCode, MME-UE-S1AP-ID, ENB-UE-S1AP-ID)
+    or None if buf cannot be decoded
+    '''
+    ctx = ASN1Ctx()
+    S1AP_PDU = GLOBAL.TYPE['S1AP-PDU']
+    try:
+        S1AP_PDU.decode(buf, ctx=ctx, select=S1AP_ROUTE_SELECT)
+        s1appdu = ctx.get(S1AP_PDU)
+        mme_ue_id, enb_ue_id = get_ue_s1ap_id(s1appdu)
+    except:
+        return None
+    return s1appdu[0], s1appdu[1]['procedureCode'], mme_ue_id, enb_ue_id
+
 def get_tmsi(naspdu):
     ident = None
     #
@@ -207,54 +234,50 @@ def convert_eutran_cgi(eutran_cgi):
     return (plmn, '%.7x' % eutran_cgi['cell-ID'][0])
 
 def decode_UERadioCapability(buf=''):
-    per_v = PER.VARIANT
-    PER.VARIANT = 'U'
+    # RRC is PER unaligned: decoding is done within a context, which leaves
+    # the PER variant (and ASN.1 objects) used for S1AP unchanged
+    ctx = ASN1Ctx(VARIANT='U')
+    UECapInfo = GLOBAL_RRCLTE.TYPE['UERadioAccessCapabilityInformation']
     try:
-        GLOBAL_RRCLTE.TYPE['UERadioAccessCapabilityInformation'].decode(buf)
+        UECapInfo.decode(buf, ctx=ctx)
     except:
-        PER.VARIANT = per_v
         return None
-    UERadCap = GLOBAL_RRCLTE.TYPE['UERadioAccessCapabilityInformation']()
+    UERadCap = ctx.get(UECapInfo)
     if UERadCap['criticalExtensions'][0] != 'c1':
-        PER.VARIANT = per_v
         return UERadCap
     if UERadCap['criticalExtensions'][1][0] != 'ueRadioAccessCapabilityInformation-r8':
-        PER.VARIANT = per_v
         return UERadCap
     if 'ue-RadioAccessCapabilityInfo' not in UERadCap['criticalExtensions'][1][1]:
-        PER.VARIANT = per_v
         return UERadCap
     if UERadCap['criticalExtensions'][1][1]['ue-RadioAccessCapabilityInfo'][0] != 'UECapabilityInformation':
-        PER.VARIANT = per_v
         return UERadCap
     #
     uecapinfo = UERadCap['criticalExtensions'][1][1]['ue-RadioAccessCapabilityInfo'][1]
     #uecapinfo['rrc-TransactionIdentifier']
     if uecapinfo['criticalExtensions'][0] != 'c1':
-        PER.VARIANT = per_v
         return UERadCap
     if uecapinfo['criticalExtensions'][1][0] != 'ueCapabilityInformation-r8':
-        PER.VARIANT = per_v
         return UERadCap
     if 'ue-CapabilityRAT-ContainerList' not in uecapinfo['criticalExtensions'][1][1]:
-        PER.VARIANT = per_v
         return UERadCap
     #
     for rat in uecapinfo['criticalExtensions'][1][1]['ue-CapabilityRAT-ContainerList']:
         if rat['rat-Type'] == 'eutra':
+            EUTRACap = GLOBAL_RRCLTE.TYPE['UE-EUTRA-Capability']
             try:
-                GLOBAL_RRCLTE.TYPE['UE-EUTRA-Capability'].decode(rat['ueCapabilityRAT-Container'])
+                EUTRACap.decode(rat['ueCapabilityRAT-Container'], ctx=ctx)
             except:
                 pass
             else:
-                rat['ueCapabilityRAT-Container'] = GLOBAL_RRCLTE.TYPE['UE-EUTRA-Capability']()
+                rat['ueCapabilityRAT-Container'] = ctx.get(EUTRACap)
         elif rat['rat-Type'] == 'utra':
+            InterRATInfo = GLOBAL_RRC3G.TYPE['InterRATHandoverInfo']
             try:
-                GLOBAL_RRC3G.TYPE['InterRATHandoverInfo'].decode(rat['ueCapabilityRAT-Container'])
+                InterRATInfo.decode(rat['ueCapabilityRAT-Container'], ctx=ctx)
             except:
                 pass
             else:
-                rat['ueCapabilityRAT-Container'] = GLOBAL_RRC3G.TYPE['InterRATHandoverInfo']()
+                rat['ueCapabilityRAT-Container'] = ctx.get(InterRATInfo)
         elif rat['rat-Type'] == 'geran-cs':
             # MSCm2 || MSCm3
             pass
@@ -264,7 +287,6 @@ def decode_UERadioCapability(buf=''):
         elif rat['rat-Type'] == 'cdma2000-1XRTT':
             pass
     #
-    PER.VARIANT = per_v
     return UERadCap
 
 def map_bytes(arg):
@@ -7,6 +7,7 @@
 """
 
 from array import array
+from libmich.utils.CrcMoose import CrcAlgorithm
 
 
 def reflect(crc, bitnum):
@@ -24,6 +25,7 @@ def reflect(crc, bitnum):
 
 def crcbitbybit(p):
      # bit by bit algorithm with augmented zero bytes.
+     # reference implementation for CRC16_KERMIT
      crc = 0
      
      for i in range(len(p)):
@@ -52,6 +54,17 @@ def crcbitbybit(p):
      return crc
 
 
+# same CRC as crcbitbybit() (CCITT polynomial, reflected, null seed and
+# xorMask), computed a byte at a time with the CrcMoose engine
+CRC16_KERMIT = CrcAlgorithm(
+     name         = "CRC-16-KERMIT",
+     width        = 16,
+     polynomial   = (16, 12, 5, 0),
+     seed         = 0x0000,
+     lsbFirst     = True,
+     xorMask      = 0x0000)
+
+
 class CRC16(object):
      """ 
      Class interface, like the Python library's cryptographic
@@ -64,7 +77,7 @@ class CRC16(object):
                self.update(string)
                
      def update(self, string):
-          self.val = crcbitbybit(string)
+          self.val = int(CRC16_KERMIT.calcString(string))
                     
      def checksum(self):
           return chr(self.val >> 8) + chr(self.val & 0xff)
@@ -6,6 +6,16 @@
 # from googlecode, r23 by dugsong on Nov 08, 2006
 #############################
 from array import array
+from struct import unpack_from
+from itertools import izip
+#
+# numpy is used for computing checksums of many buffers at once,
+# see crc32c_many()
+try:
+    import numpy as np
+    _with_numpy = True
+except ImportError:
+    _with_numpy = False
 
 
 crc32c_table = (
@@ -63,7 +73,38 @@ crc32c_table = (
     0xAD7D5351L
     )
 
+# slicing-by-8 tables: _T8[k][i] is the CRC of byte i followed by k null bytes
+def _make_slicing_tables(num=8):
+    tables = [tuple(map(int, crc32c_table))]
+    for k in range(1, num):
+        prev = tables[-1]
+        tables.append(tuple([(c >> 8) ^ tables[0][c & 0xff] for c in prev]))
+    return tuple(tables)
+
+_T8 = _make_slicing_tables()
+
 def add(crc, buf):
+    # buf: str, buffer, bytearray, or any sequence of bytes' values
+    if not isinstance(buf, (str, buffer, bytearray)):
+        buf = array('B', buf).tostring()
+    T0, T1, T2, T3, T4, T5, T6, T7 = _T8
+    crc = int(crc)
+    n8 = len(buf) & ~7
+    if n8:
+        # 8 bytes at a time, as 2 little endian 32 bits words
+        words = iter(unpack_from('<%iI' % (n8 >> 2), buf))
+        for lo, hi in izip(words, words):
+            crc ^= lo
+            crc = T7[crc & 0xff] ^ T6[(crc >> 8) & 0xff] \
+                ^ T5[(crc >> 16) & 0xff] ^ T4[crc >> 24] \
+                ^ T3[hi & 0xff] ^ T2[(hi >> 8) & 0xff] \
+                ^ T1[(hi >> 16) & 0xff] ^ T0[hi >> 24]
+    for b in bytearray(buf[n8:]):
+        crc = (crc >> 8) ^ T0[(crc ^ b) & 0xff]
+    return crc
+
+def add_bytewise(crc, buf):
+    # reference implementation for add()
     buf = array('B', buf)
     for b in buf:
         crc = (crc >> 8) ^ crc32c_table[(crc ^ b) & 0xff]
@@ -82,3 +123,47 @@ def crc32c(buf):
     #"""Return computed CRC-32c checksum."""
     return done(add(0xffffffffL, buf))
 
+def crc32c_many(bufs, zero=None):
+    """
+    Return the list of CRC-32c checksums of all strings in bufs.
+    
+    If zero is given as (start, stop), bytes in this range are taken as null
+    (e.g. (8, 12) for the checksum field of SCTP packets).
+    
+    With numpy, checksums of buffers of the same length are computed all 
+    at once, byte after byte.
+    """
+    if not _with_numpy:
+        return [_crc32c_zero(buf, zero) for buf in bufs]
+    # group buffers by length
+    lens = {}
+    for i, buf in enumerate(bufs):
+        lens.setdefault(len(buf), []).append(i)
+    ret = [None] * len(bufs)
+    table = np.array(crc32c_table, dtype=np.uint32)
+    for l, ind in lens.items():
+        if len(ind) == 1:
+            ret[ind[0]] = _crc32c_zero(bufs[ind[0]], zero)
+            continue
+        crc = np.full(len(ind), 0xffffffff, dtype=np.uint32)
+        if l:
+            arr = np.frombuffer(''.join([bufs[i] for i in ind]), 
+                                dtype=np.uint8).reshape(len(ind), l)
+            if zero is not None:
+                arr = arr.copy()
+                arr[:, zero[0]:zero[1]] = 0
+            for j in range(l):
+                crc = (crc >> 8) ^ table[(crc ^ arr[:, j]) & 0xff]
+        # done(): inversion and byte swap
+        crc = (~crc).byteswap()
+        for i, c in izip(ind, crc.tolist()):
+            ret[i] = c
+    return ret
+
+def _crc32c_zero(buf, zero=None):
+    if zero is None:
+        return crc32c(buf)
+    start, stop = zero
+    crc = add(0xffffffff, buffer(buf, 0, start))
+    crc = add(crc, (stop - start) * '\0')
+    return done(add(crc, buffer(buf, stop)))
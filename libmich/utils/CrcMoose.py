@@ -33,8 +33,9 @@
 """
 This module can model common CRC algorithms given the set of defining
 parameters.  This is intended to be easy to use for experimentation
-rather than optimized for speed.  It is slow even for a native Python
-CRC implementation.
+rather than optimized for speed.  However, strings are processed a
+byte at a time, with a 256-entry table generated (with the bitwise
+implementation) and cached for each algorithm on first use.
 
 Several common CRC algorithms are predefined in this module.
 
@@ -71,6 +72,11 @@ Calculating in parts:
   >>> '%X' % CRC32.calcString('56789', value)
   'CBF43926'
 
+Calculating the CRC of many strings at once:
+
+  >>> ['%X' % v for v in CRC32.calcMany(['1234', '56789'])]
+  ['9BE3E0A3', '131DA070']
+
 Or, done a different way:
 
   >>> crc = CrcRegister(CRC32)
@@ -131,6 +137,10 @@ class CrcAlgorithm:
     # FIXME: Instances are supposed to be immutable, but attributes are
     # writable.
 
+    # Cached tables for processing a byte at a time, together with the
+    # parameters they were generated for (see `_getTable`).
+    _table = None
+
     def __init__(self, width, polynomial, name=None, seed=0,
                  lsbFirst=False, lsbFirstData=None, xorMask=0):
         """
@@ -248,9 +258,95 @@ class CrcAlgorithm:
         """
         Calculate the CRC of the 8-bit string *s*.
         """
-        r = CrcRegister(self, value)
-        r.takeString(s)
-        return r.getFinalValue()
+        if value is None:
+            crc = long(self.seed)
+        else:
+            crc = value ^ self.xorMask
+        return self._update(crc, s) ^ self.xorMask
+
+    def calcMany(self, strings, value=None):
+        """
+        Calculate the CRC of each 8-bit string in *strings*, and
+        return the list of results.  If *value* is given, it is used
+        as the initial value for each string.
+        """
+        if value is None:
+            crc = long(self.seed)
+        else:
+            crc = value ^ self.xorMask
+        xorMask = self.xorMask
+        update = self._update
+        return [update(crc, s) ^ xorMask for s in strings]
+
+    def _getTable(self):
+        """
+        Return the tables used by `_update`, generating them if the
+        parameters of the algorithm changed since the last call.
+        """
+        key = (self.width, tuple(self.polynomial), self.lsbFirst,
+               self.lsbFirstData)
+        if self._table is None or self._table[0] != key:
+            self._table = (key, self._makeTable())
+        return self._table[1]
+
+    def _makeTable(self):
+        # All tables are generated with the bitwise implementation.
+        r = CrcRegister(self)
+        def step(value, byte):
+            r.value = value
+            r.takeWord(byte, 8)
+            return r.value
+        w = self.width
+        if w >= 8:
+            # The input byte is combined with the 8 register bits
+            # that are shifted out first; when data is not taken in
+            # the same bit order as the register shifts, the byte is
+            # reflected first.
+            if self.lsbFirst:
+                table = [step(i, 0) for i in range(256)]
+            else:
+                table = [step(i << (w - 8), 0) for i in range(256)]
+            if r.lsbFirstData != self.lsbFirst:
+                trans = "".join(chr(reflect(i, 8)) for i in range(256))
+            else:
+                trans = None
+            return (table, trans)
+        else:
+            # The whole register is shifted out by a single byte: the
+            # contributions of the register and of the input byte are
+            # tabulated separately.
+            return ([step(i, 0) for i in range(1 << w)],
+                    [step(0, i) for i in range(256)])
+
+    def _update(self, crc, s):
+        """
+        Process the 8-bit string *s* with the register value *crc*
+        (without *xorMask* applied), and return the new register
+        value.
+        """
+        t1, t2 = self._getTable()
+        w = self.width
+        if isinstance(s, (str, bytearray, buffer)):
+            data = bytearray(s)
+        else:
+            # e.g. unicode, or a sequence of characters: the low 8 bits
+            # of each character are taken, as CrcRegister.takeString()
+            data = bytearray([ord(c) & 0xFF for c in s])
+        if w < 8:
+            for b in data:
+                crc = t1[crc] ^ t2[b]
+            return crc
+        if t2 is not None:
+            data = data.translate(t2)
+        if self.lsbFirst:
+            for b in data:
+                crc = t1[(crc ^ b) & 0xFF] ^ (crc >> 8)
+        else:
+            shift = w - 8
+            mask = (1 << w) - 1
+            for b in data:
+                crc = t1[((crc >> shift) ^ b) & 0xFF] ^ ((crc << 8) & mask)
+        return crc
 
     def calcWord(self, word, width, value=None):
         """
@@ -412,6 +508,13 @@ class CrcRegister:
         Process a string as input.  It is handled as a sequence of
         8-bit integers.
         """
+        self.value = self.crcAlgorithm._update(self.value, s)
+
+    def takeStringBitwise(self, s):
+        """
+        Process a string as input, one bit at a time.  This is the
+        reference implementation for `takeString`.
+        """
         for c in s:
             self.takeWord(ord(c))
 
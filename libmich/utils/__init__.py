@@ -1,2 +1,2 @@
 # -*- coding: UTF-8 -*-
-__all__ = ['conv', 'CRC16', 'CRC32C', 'DH', 'inet', 'PRF1862', 'perf']
+__all__ = ['conv', 'CRC16', 'CRC32C', 'DH', 'inet', 'PRF1862', 'perf', 'cache']
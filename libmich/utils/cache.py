@@ -0,0 +1,127 @@
+# -*- coding: UTF-8 -*-
+#/**
+# * Software Name : libmich 
+# * Version : 0.2.3
+# *
+# * Copyright © 2026. agent.
+# *
+# * This program is free software: you can redistribute it and/or modify
+# * it under the terms of the GNU General Public License version 2 as published
+# * by the Free Software Foundation. 
+# *
+# * This program is distributed in the hope that it will be useful,
+# * but WITHOUT ANY WARRANTY; without even the implied warranty of
+# * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# * GNU General Public License for more details. 
+# *
+# * You will find a copy of the terms and conditions of the GNU General Public
+# * License version 2 in the "license.txt" file or
+# * see http://www.gnu.org/licenses/ or write to the Free Software Foundation,
+# * Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+# *
+# *--------------------------------------------------------
+# * File Name : utils/cache.py
+# * Created : 2026-10-19
+# * Authors : agent 
+# *--------------------------------------------------------
+#*/
+
+# export filter
+__all__ = ['LRUCache', 'copy_val']
+
+from collections import OrderedDict
+from threading import Lock
+
+class LRUCache(object):
+    '''
+    Least-recently-used cache, bounded by its number of entries (num) and by 
+    the sum of the sizes given for each entry (size, e.g. the length in bytes
+    of the buffer which is part of the key).
+    
+    It counts hits and misses, and can be shared between threads.
+    
+    >>> cache = LRUCache(num=256, size=1<<20)
+    >>> cache.set(('PDU', buf), val, len(buf))
+    >>> cache.get(('PDU', buf))
+    '''
+    
+    def __init__(self, num=1024, size=1048576):
+        self.num = num
+        self.size = size
+        self._lock = Lock()
+        self.clear()
+    
+    def clear(self):
+        with self._lock:
+            # key: (value, size)
+            self._ent = OrderedDict()
+            self._size = 0
+            self.hits = 0
+            self.misses = 0
+    
+    def __len__(self):
+        return len(self._ent)
+    
+    def __repr__(self):
+        return '<LRUCache: %i entries, %i / %i bytes, %i hits, %i misses>' \
+               % (len(self._ent), self._size, self.size, self.hits, 
+                  self.misses)
+    
+    def get(self, key, default=None):
+        '''
+        returns the value cached for key, or default
+        '''
+        with self._lock:
+            try:
+                ent = self._ent.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            # most recently used entries are kept at the end
+            self._ent[key] = ent
+            self.hits += 1
+            return ent[0]
+    
+    def set(self, key, val, size=0):
+        '''
+        caches val for key, evicting least recently used entries if required
+        entries bigger than the cache size are not cached
+        '''
+        if size > self.size:
+            return
+        with self._lock:
+            if key in self._ent:
+                self._size -= self._ent.pop(key)[1]
+            while self._ent and (len(self._ent) >= self.num \
+                                 or self._size + size > self.size):
+                self._size -= self._ent.popitem(last=False)[1][1]
+            self._ent[key] = (val, size)
+            self._size += size
+    
+    def stats(self):
+        '''
+        returns a dict with the number of entries, their total size, and 
+        the number of hits and misses
+        '''
+        return {'num': len(self._ent), 'size': self._size, 
+                'hits': self.hits, 'misses': self.misses}
+
+def copy_val(val):
+    '''
+    returns a copy of val which can be changed without changing val: 
+    dicts and lists are copied recursively, objects with a __copy__ method
+    are copied with it, while immutable values (str, int, ..., and tuples 
+    of those) are shared with val
+    '''
+    if isinstance(val, dict):
+        return dict([(k, copy_val(v)) for k, v in val.items()])
+    elif isinstance(val, list):
+        return map(copy_val, val)
+    elif isinstance(val, tuple):
+        new = tuple(map(copy_val, val))
+        if all([a is b for a, b in zip(new, val)]):
+            return val
+        return new
+    elif hasattr(val, '__copy__'):
+        return val.__copy__()
+    return val
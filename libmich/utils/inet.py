@@ -1,7 +1,7 @@
 # -*- coding: UTF-8 -*-
 
 import array
-from struct import pack
+from struct import pack, unpack
 
 # BIG UP to scapy
 # see scapy code: http://hg.secdev.org/scapy/file/7a97e2f3db67/scapy/utils.py
@@ -26,6 +26,55 @@ else:
         s = ~s
         return (((s>>8)&0xff)|s<<8) & 0xffff
 
+#
+# numpy is used for computing checksums of many buffers at once,
+# see checksum_many()
+try:
+    import numpy as np
+    _with_numpy = True
+except ImportError:
+    _with_numpy = False
 
+# RFC 1624: incremental update of the Internet checksum
+# HC' = ~(~HC + ~m + m'), with one's complement additions
 
+def checksum_update(cs, old, new):
+    '''
+    returns the checksum cs updated for the 16-bit aligned string old being 
+    replaced with the string new (of the same length) in the checksummed 
+    buffer, without walking over the rest of the buffer
+    '''
+    if len(old) != len(new):
+        raise ValueError('old and new must have the same length')
+    if len(old) % 2 == 1:
+        old += "\0"
+        new += "\0"
+    fmt = ">%iH" % (len(old)//2)
+    s = (~cs & 0xffff) + sum(unpack(fmt, new)) \
+        + 0xffff*(len(old)//2) - sum(unpack(fmt, old))
+    while s >> 16:
+        s = (s >> 16) + (s & 0xffff)
+    return ~s & 0xffff
 
+def checksum_many(bufs):
+    '''
+    returns the list of Internet checksums of all strings in bufs
+    
+    With numpy, all buffers are concatenated and summed at once.
+    '''
+    if not _with_numpy:
+        return map(checksum, bufs)
+    ret = [0xffff] * len(bufs)
+    # empty buffers are left apart, as reduceat() does not handle them
+    ind = [i for i in range(len(bufs)) if bufs[i]]
+    if not ind:
+        return ret
+    words = np.frombuffer(''.join([bufs[i] + '\0'*(len(bufs[i])&1) \
+                                   for i in ind]), dtype='>u2')
+    off = np.cumsum([0] + [(len(bufs[i])+1)//2 for i in ind[:-1]])
+    s = np.add.reduceat(words.astype(np.uint64), off)
+    while (s >> 16).any():
+        s = (s >> 16) + (s & 0xffff)
+    for i, c in zip(ind, (~s & 0xffff).tolist()):
+        ret[i] = int(c)
+    return ret
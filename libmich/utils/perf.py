@@ -26,9 +26,13 @@
 # *--------------------------------------------------------
 #*/
 
+import os
 import time
+import json
+from struct import pack
+from multiprocessing import Process, Queue
 from libmich.core.element import Element, Str, Bit, Int, Layer, \
-    testTLV
+    RawLayer, Block, testTLV
 from libmich.core.element import test as test_tlv
 from libmich.formats.BMP import BMP
 from libmich.formats.BGP4 import BGP4, testbuf
@@ -36,7 +40,21 @@ from libmich.formats.L3Mobile import test_regr
 from libmich.asn1.test import test_def, test_per_integer, test_per_choice, \
     test_per_sequence
 from libmich.asn1.test import _test_rrc3g_prep, _test_rrc3g, \
-    _test_s1ap_prep, _test_s1ap, _test_x2ap_prep, _test_x2ap
+    _test_s1ap_prep, _test_s1ap, _test_x2ap_prep, _test_x2ap, \
+    _test_map_prep, _test_pdus, _test_ranap_prep, _test_rrclte_prep, \
+    _test_tcap_prep
+from libmich.asn1.processor import load_module, GLOBAL, MODULES, \
+    get_asn_dir, get_module_files, compile as compile_asn1, ASN1, PER, BER
+from libmich.asn1.utils import clean_text, tokenize
+from libmich.asn1.TAP3 import TAP3Reader, write_tap3
+from libmich.formats.pcap import PcapReader, PcapWriter, PcapPipeline, \
+    ipv4_hdr, ipv4_udp
+from libmich.utils import CrcMoose, CRC32C, inet
+from libmich.formats.IP import IPv4, UDP
+from libmich.formats.dissect import dissect, LINKTYPE_ETHERNET
+from libmich.formats.SCTP import SCTP, SCTPChunks, SCTPReassembler
+from libmich.formats.TLS import TLS, TLSStream
+from libmich.utils.CRC16 import CRC16_KERMIT, crcbitbybit
 
 import libmich as _lm
 bmp_fd = open(_lm.__path__[0] + '/utils/test.bmp', 'rb')
@@ -59,12 +77,578 @@ RND_T7 = 12
 RND_T8 = 5
 RND_T9 = 20
 RND_T10 = 30
+RND_T13 = 2000
+RND_T14 = 200
+RND_T15 = 20
+RND_T16 = 2000
+RND_T17 = 200
+RND_T18 = 2000
+RND_T19 = 20000
+RND_T20 = 2000
+RND_T21 = 2000
+RND_T22 = 200
+
+# ASN.1 modules and PDU looked-up at startup, for load_module() statistics
+LOAD_PDU = [('S1AP', 'S1AP-PDU'), ('X2AP', 'X2AP-PDU'),
+            ('RRC3G', 'DL-DCCH-Message')]
+# ASN.1 modules compiled from asn/, for compile_module_stats()
+COMPILE_MODS = ['TCAP', 'TAP3', 'S1AP', 'RANAP', 'MAP', 'RRC3G']
+# CallEventDetail records and number of workers, for tap3_decode_stats()
+TAP3_CDRS = [
+    ('mobileOriginatedCall', {'basicCallInformation': {
+        'chargeableSubscriber': ('simChargeableSubscriber', {
+            'imsi': '\x02\x08\x01\x00\x00\x00\x00\xf1',
+            'msisdn': '\x33\x61\x00\x00\x00\xf1'}),
+        'callEventStartTimeStamp': {'localTimeStamp': '20161019120000',
+                                    'utcTimeOffsetCode': 1},
+        'totalCallEventDuration': 42}}),
+    ('mobileTerminatedCall', {'basicCallInformation': {
+        'chargeableSubscriber': ('simChargeableSubscriber', {
+            'imsi': '\x02\x08\x01\x00\x00\x00\x00\xf2'}),
+        'callEventStartTimeStamp': {'localTimeStamp': '20161019120500',
+                                    'utcTimeOffsetCode': 1},
+        'totalCallEventDuration': 300}}),
+    ]
+TAP3_WORKERS = [1, 2, 4]
+# ASN.1 modules with a fixed corpus, for asn1_codec_stats()
+CODEC_MODS = ['S1AP', 'X2AP', 'RANAP', 'RRC3G', 'RRCLTE', 'MAP', 'TCAP', 
+              'TAP3']
 
 def texec(procedure):
     t0=time.time()
     procedure()
     return time.time()-t0
 
+def get_rss():
+    # returns the resident set size of the current process, in kB
+    try:
+        fd = open('/proc/self/status', 'r')
+    except IOError:
+        # not on Linux: returns the peak resident set size instead
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    for line in fd.readlines():
+        if line[:6] == 'VmRSS:':
+            fd.close()
+            return int(line.split()[1])
+    fd.close()
+    return 0
+
+def _load_module_stats(name, pdu, lazy, queue):
+    rss_0 = get_rss()
+    T0 = time.time()
+    load_module(name, lazy=lazy)
+    t_load = time.time() - T0
+    GLOBAL.TYPE[pdu]
+    t_pdu = time.time() - T0
+    queue.put( (t_load, t_pdu, rss_0, get_rss()) )
+
+def load_module_stats(mods=LOAD_PDU):
+    '''
+    reports startup time and RSS before and after loading each ASN.1 module, 
+    with and without lazy loading, and up to the 1st lookup of its PDU
+    (each measure is run in a new process)
+    '''
+    ret = {}
+    for name, pdu in mods:
+        for lazy in (False, True):
+            queue = Queue()
+            proc = Process(target=_load_module_stats,
+                           args=(name, pdu, lazy, queue))
+            proc.start()
+            t_load, t_pdu, rss_0, rss_1 = queue.get()
+            proc.join()
+            ret[(name, lazy)] = (t_load, t_pdu, rss_0, rss_1)
+            print('%s (%s): load %.4f sec., 1st lookup of %s %.4f sec., '\
+                  'RSS %i kB -> %i kB' % (name, ('eager', 'lazy')[lazy], 
+                  t_load, pdu, t_pdu, rss_0, rss_1))
+    return ret
+
+def _compile_module_stats(name, queue):
+    asndir = '%s%s%s' % (get_asn_dir(), MODULES[name], os.path.sep)
+    texts = []
+    for asn in get_module_files(MODULES[name]):
+        fd = open('%s%s' % (asndir, asn), 'r')
+        texts.append( fd.read() )
+        fd.close()
+    # text front-end only: comments removal and tokenization
+    T0 = time.time()
+    tok_num = sum([len(tokenize(clean_text(text)).tok) for text in texts])
+    t_lex = time.time() - T0
+    # complete compilation
+    GLOBAL.clear()
+    T0 = time.time()
+    for text in texts:
+        compile_asn1(text)
+    t_comp = time.time() - T0
+    obj_num = len(GLOBAL.TYPE) + len(GLOBAL.VALUE) + len(GLOBAL.SET)
+    queue.put( (sum(map(len, texts)), tok_num, t_lex, obj_num, t_comp) )
+
+def compile_module_stats(mods=COMPILE_MODS):
+    '''
+    reports the compilation time of each ASN.1 module from its asn/ files, 
+    and the time spent in the text front-end (comments removal and 
+    tokenization) alone
+    (each measure is run in a new process)
+    '''
+    ret = {}
+    for name in mods:
+        queue = Queue()
+        proc = Process(target=_compile_module_stats, args=(name, queue))
+        proc.start()
+        ret[name] = queue.get()
+        proc.join()
+    for name in mods:
+        print('%s: %i bytes, %i tokens in %.4f sec., %i objects compiled in '\
+              '%.4f sec.' % ((name, ) + ret[name]))
+    return ret
+
+def tap3_decode_stats(num=RND_T13, workers=TAP3_WORKERS, 
+                      path='/tmp/libmich_perf.tap'):
+    '''
+    writes a TAP3 file with num CallEventDetail records encoded with BER,
+    and reports the number of records decoded per second by a TAP3Reader,
+    sequentially and with each number of worker processes in workers
+    '''
+    T0 = time.time()
+    write_tap3(path, TAP3_CDRS, num, 
+               info={'batchControlInfo': {'sender': 'FRAXX', 
+                                          'recipient': 'GBRYY',
+                                          'fileSequenceNumber': '00001'},
+                     'auditControlInfo': {'callEventDetailsCount': num}})
+    print('TAP3 file of %i records (%i bytes) written in %.4f sec.'\
+          % (num, os.path.getsize(path), time.time() - T0))
+    ret = {}
+    tap = TAP3Reader(path)
+    for w in [0] + list(workers):
+        T0 = time.time()
+        if w == 0:
+            cnt = sum([1 for val in tap])
+        else:
+            cnt = sum([1 for val in tap.iter_parallel(w)])
+        ret[w] = cnt / (time.time() - T0)
+        print('%s: %i records decoded, %.1f records/s'\
+              % (('%i workers' % w, 'sequential')[w == 0], cnt, ret[w]))
+    tap.close()
+    os.remove(path)
+    return ret
+
+def _s1ap_dissect(ts, linktype, pay):
+    # S1AP-PDU within synthetic IPv4 / SCTP headers, see PcapWriter
+    pdu = GLOBAL.TYPE['S1AP-PDU']
+    pdu.decode(pay[48:])
+    val = pdu()
+    return val[1]['value'][0]
+
+def pcap_pipeline_stats(num=RND_T16, workers=TAP3_WORKERS, 
+                        path='/tmp/libmich_perf.pcap'):
+    '''
+    writes a pcap file with num S1AP PDU (taken in turn from the S1AP test 
+    corpus) recorded with the PcapWriter, and reports the number of PDU 
+    decoded per second, sequentially and by a PcapPipeline with each number
+    of worker processes in workers
+    '''
+    pkts = _test_s1ap_prep()
+    if pkts is None:
+        return
+    T0 = time.time()
+    pcap = PcapWriter(path)
+    for i in range(num):
+        pcap.write_sctp(pkts[i % len(pkts)], '10.0.0.1', '10.0.0.2', 36412,
+                        36412, ppid=18)
+    pcap.close()
+    print('pcap file of %i records (%i bytes) written in %.4f sec.'\
+          % (num, os.path.getsize(path), time.time() - T0))
+    ret = {}
+    for w in [0] + list(workers):
+        if w == 0:
+            T0 = time.time()
+            with PcapReader(path) as pcap:
+                cnt = sum([1 for ts, lt, pay in pcap \
+                           if _s1ap_dissect(ts, lt, str(pay))])
+            ret[w] = cnt / (time.time() - T0)
+        else:
+            pipe = PcapPipeline(path, _s1ap_dissect, workers=w)
+            cnt = sum([1 for val in pipe if val])
+            ret[w] = pipe.rate
+        print('%s: %i PDU decoded, %.1f PDU/s'\
+              % (('%i workers' % w, 'sequential')[w == 0], cnt, ret[w]))
+    os.remove(path)
+    if os.path.exists(path + '.idx'):
+        os.remove(path + '.idx')
+    return ret
+
+def crc_stats(num=RND_T17, size=64):
+    '''
+    checks the CRC computed by each algorithm predefined in CrcMoose (and 
+    CRC16) over num random buffers of size bytes against the bitwise 
+    reference, and reports the throughput of both implementations
+    
+    the same is done for CRC32C, with the bytewise reference, slicing-by-8 
+    and batch (numpy) implementations
+    '''
+    bufs = [os.urandom(size) for i in range(num)]
+    algs = sorted([v for v in CrcMoose.__dict__.values() \
+                   if isinstance(v, CrcMoose.CrcAlgorithm)], 
+                  key=lambda a: (a.width, a.name)) + [CRC16_KERMIT]
+    ret = {}
+    for alg in algs:
+        T0 = time.time()
+        ref = []
+        for buf in bufs:
+            r = CrcMoose.CrcRegister(alg)
+            r.takeStringBitwise(buf)
+            ref.append(r.getFinalValue())
+        Tb = time.time() - T0
+        T0 = time.time()
+        val = alg.calcMany(bufs)
+        Tt = time.time() - T0
+        assert( val == ref )
+        if alg is CRC16_KERMIT:
+            assert( val == map(crcbitbybit, bufs) )
+        ret[alg.name] = (num*size / Tb, num*size / Tt)
+        print('%s: bitwise %.1f kB/s, table %.1f kB/s (x %.1f)'\
+              % (alg.name, ret[alg.name][0] / 1000, ret[alg.name][1] / 1000,
+                 Tb / Tt))
+    #
+    T0 = time.time()
+    ref = [CRC32C.done(CRC32C.add_bytewise(0xffffffff, buf)) for buf in bufs]
+    Tb = time.time() - T0
+    T0 = time.time()
+    val = map(CRC32C.crc32c, bufs)
+    Ts = time.time() - T0
+    T0 = time.time()
+    val_many = CRC32C.crc32c_many(bufs)
+    Tm = time.time() - T0
+    assert( val == ref and val_many == ref )
+    ret['CRC32C'] = (num*size / Tb, num*size / Ts, num*size / Tm)
+    print('CRC32C: bytewise %.1f kB/s, slicing-by-8 %.1f kB/s, batch%s '\
+          '%.1f kB/s' % (ret['CRC32C'][0] / 1000, ret['CRC32C'][1] / 1000,
+                         ('', ' (numpy)')[CRC32C._with_numpy], 
+                         ret['CRC32C'][2] / 1000))
+    return ret
+
+def inet_checksum_stats(num=RND_T18, size=1400):
+    '''
+    updates the TTL and UDP source port of num IPv4 / UDP packets of size 
+    bytes of payload, with full and incremental (RFC 1624) checksums, and 
+    computes checksums of the num packets one by one and in a batch
+    '''
+    pay = os.urandom(size)
+    # IPv4 header and UDP datagram (with its pseudo-header) to checksum
+    hdr = pack('>BBHIBBH4s4s', 0x45, 0, 28+size, 0, 64, 17, 0, 
+               '\x0a\x01\x01\x01', '\x0a\x01\x01\x02')
+    dgm = ''.join((hdr[12:20], '\0\x11', pack('>H', 8+size), 
+                   pack('>HHH', 1024, 2152, 8+size), '\0\0', pay))
+    ret = {}
+    hdr0, dgm0 = hdr, dgm
+    for name in ('full', 'incremental'):
+        ttl, port, hdr, dgm = 64, 1024, hdr0, dgm0
+        cs_ip, cs_udp = inet.checksum(hdr), inet.checksum(dgm)
+        T0 = time.time()
+        cs = []
+        for i in range(num):
+            ttl_new, port_new = 1 + i % 255, 1024 + i % 60000
+            if name == 'full':
+                hdr = ''.join((hdr[:8], chr(ttl_new), hdr[9:]))
+                dgm = ''.join((dgm[:12], pack('>H', port_new), dgm[14:]))
+                cs_ip, cs_udp = inet.checksum(hdr), inet.checksum(dgm)
+            else:
+                cs_ip = inet.checksum_update(cs_ip, chr(ttl), chr(ttl_new))
+                cs_udp = inet.checksum_update(cs_udp, pack('>H', port), 
+                                              pack('>H', port_new))
+            ttl, port = ttl_new, port_new
+            cs.append((cs_ip, cs_udp))
+        ret[name] = num / (time.time() - T0)
+        if name == 'full':
+            ref = cs
+        else:
+            assert( cs == ref )
+        print('%s checksums: %.1f pkt/s' % (name, ret[name]))
+    #
+    bufs = [''.join((hdr, dgm[12:20], pay[:-i%size])) for i in range(num)]
+    T0 = time.time()
+    ref = map(inet.checksum, bufs)
+    Tc = time.time() - T0
+    T0 = time.time()
+    val = inet.checksum_many(bufs)
+    Tm = time.time() - T0
+    assert( val == ref )
+    ret['checksum'], ret['checksum_many'] = num / Tc, num / Tm
+    print('checksum: %.1f pkt/s, checksum_many%s: %.1f pkt/s' \
+          % (num / Tc, ('', ' (numpy)')[inet._with_numpy], num / Tm))
+    return ret
+
+def dissect_stats(num=RND_T19):
+    '''
+    dissects num Ethernet / IPv4 / UDP / GTP-U / IPv4 / UDP or TCP packets 
+    with the header-only dissector, and num/100 of them with the full Layers,
+    and reports the packet rate of both
+    '''
+    pkts = []
+    for i in range(16):
+        if i % 2:
+            l4 = pack('>HHHH', 1024+i, 53, 8+i*16, 0) + i*16*'\0'
+        else:
+            l4 = pack('>HHIIBBHHH', 1024+i, 80, i, 0, 0x50, 0x18, 8192, 0, 0)\
+                 + i*16*'\0'
+        inner = ''.join((ipv4_hdr('192.168.1.%i' % i, '8.8.8.8', 
+                                  (6, 17)[i%2], len(l4)), l4))
+        gtp = pack('>BBHI', 0x30, 0xff, len(inner), i) + inner
+        pkts.append(''.join(('\xff'*6, '\0'*6, '\x08\0', 
+                             ipv4_udp(gtp, '10.1.1.1', '10.1.1.2', 2152, 
+                                      2152))))
+    pkts = (num//16 + 1) * pkts
+    T0 = time.time()
+    for pkt in pkts[:num]:
+        info = dissect(pkt, LINKTYPE_ETHERNET)
+        tup = (info.teid, info.inner.src, info.inner.dst, info.inner.proto,
+               info.inner.sport, info.inner.dport)
+    Td = time.time() - T0
+    T0 = time.time()
+    for pkt in pkts[:num//100]:
+        dissect(pkt, LINKTYPE_ETHERNET).layers()
+    Tl = time.time() - T0
+    ret = (num / Td, (num//100) / Tl)
+    print('header-only: %.1f pkt/s, full Layers: %.1f pkt/s (x %.1f)' \
+          % (ret[0], ret[1], ret[0] / ret[1]))
+    return ret
+
+def _sctp_data_pkts(num, size=3000, frag=1000, dup=True):
+    # returns num random messages, and the SCTP packets (from the same 
+    # association) transporting them over 4 streams, fragmented into DATA 
+    # chunks of at most frag bytes, and with 10% of packets retransmitted
+    # if dup
+    msgs, pkts, tsn, ssn = [], [], 0, [0, 0, 0, 0]
+    for i in range(num):
+        msg = os.urandom(1 + (i * 7919) % size)
+        sid = i % 4
+        msgs.append((sid, msg))
+        frags = [msg[j:j+frag] for j in range(0, len(msg), frag)]
+        for j, f in enumerate(frags):
+            flags = (j == 0) << 1 | (j == len(frags)-1)
+            ln = 16 + len(f)
+            pkts.append(''.join((pack('>HHIIBBHIHHI', 36412, 36412, 1, 0, 0,
+                                      flags, ln, tsn, sid, ssn[sid], 18), 
+                                 f, '\0' * (-ln % 4))))
+            if dup and tsn % 10 == 9:
+                pkts.append(pkts[-1])
+            tsn += 1
+        ssn[sid] += 1
+    return msgs, pkts
+
+def sctp_reasm_stats(num=RND_T20):
+    '''
+    reassembles num random messages fragmented into SCTP DATA chunks, with
+    retransmitted packets, and reports the message rate
+    '''
+    msgs, pkts = _sctp_data_pkts(num)
+    r = SCTPReassembler()
+    out = []
+    T0 = time.time()
+    for pkt in pkts:
+        out.extend(r.feed(pkt, '\x0a\0\0\x01', '\x0a\0\0\x02'))
+    T = time.time() - T0
+    assert( [(sid, msg) for _, sid, _, msg in out] == msgs )
+    print('%i packets, %i duplicates: %.1f msg/s' % (len(pkts), r.dup, num/T))
+    return num / T
+
+def sctp_chunks_stats(num=RND_T21):
+    '''
+    gets DATA chunk payloads of num SCTP packets bundling a SACK and 3 DATA
+    chunks, with the zero-copy chunk iterator and with SCTP().parse(), and
+    reports the packet rate of both
+    '''
+    msgs, pkts = _sctp_data_pkts(3*num, size=300, dup=False)
+    sack = pack('>BBHIIHHHH', 3, 0, 20, 0, 0x10000, 1, 0, 2, 4)
+    pkts = [pkts[0][:12] + sack + ''.join([p[12:] for p in pkts[i:i+3]]) \
+            for i in range(0, 3*num, 3)]
+    T0 = time.time()
+    val = []
+    for pkt in pkts:
+        val.extend([str(d[5]) for d in SCTPChunks(pkt).iter_data()])
+    Ti = time.time() - T0
+    assert( val == [msg for sid, msg in msgs] )
+    # BMP sets Int default endianness to little
+    endian, Int._endian = Int._endian, 'big'
+    T0 = time.time()
+    for i in range(num//10):
+        sk = SCTP()
+        sk.parse(pkts[i])
+        ref = [str(l.data) for l in sk if l.CallName == 'data']
+    Tp = time.time() - T0
+    Int._endian = endian
+    assert( ref == val[3*i:3*i+3] )
+    ret = (num / Ti, (num//10) / Tp)
+    print('chunk iterator: %.1f pkt/s, SCTP().parse: %.1f pkt/s (x %.1f)' \
+          % (ret[0], ret[1], ret[0] / ret[1]))
+    return ret
+
+def tls_stream_stats(num=RND_T22, seg=1460):
+    '''
+    parses num TLS server streams (handshake with a certificate spanning 2
+    records, change cipher spec, 8 application data records), cut into TCP
+    segments of seg bytes, with TLSStream and with TLS().parse() on the
+    whole stream, and reports the stream rate of both
+    '''
+    rec = lambda t, body: pack('>BHH', t, 0x0303, len(body)) + body
+    hs = lambda t, body: pack('>I', t<<24 | len(body)) + body
+    hsbuf = ''.join((hs(2, os.urandom(70)), hs(11, os.urandom(20000)),
+                     hs(14, '')))
+    stream = ''.join([rec(22, hsbuf[i:i+16384]) \
+                      for i in range(0, len(hsbuf), 16384)] \
+                     + [rec(20, '\x01'), rec(22, os.urandom(40))] \
+                     + [rec(23, os.urandom(16384)) for i in range(8)])
+    segs = [stream[i:i+seg] for i in range(0, len(stream), seg)]
+    T0 = time.time()
+    for i in range(num):
+        st = TLSStream()
+        out = []
+        for s in segs:
+            out.extend(st.feed(s))
+    Ts = time.time() - T0
+    assert( [r[0] for r in out] == [22, 22, 22, 20, 22] + [23]*8 )
+    assert( ''.join([r[3] for r in out[:3]]) == hsbuf )
+    # BMP sets Int default endianness to little
+    endian, Int._endian = Int._endian, 'big'
+    T0 = time.time()
+    for i in range(num//10):
+        tls = TLS()
+        tls.parse(''.join(segs))
+    Tp = time.time() - T0
+    Int._endian = endian
+    ret = (num / Ts, (num//10) / Tp)
+    print('%i bytes per stream, TLSStream: %.1f stream/s, TLS().parse: %.1f '\
+          'stream/s (x %.1f)' % (len(stream), ret[0], ret[1], ret[0] / ret[1]))
+    return ret
+
+def _asn1_corpus(name):
+    # loads the ASN.1 module, and returns its fixed corpus as a list of 
+    # (type name, buffer), with the codec and PER variant of the buffers
+    if name in ('S1AP', 'X2AP'):
+        pkts = (_test_s1ap_prep, _test_x2ap_prep)[name == 'X2AP']()
+        if pkts is not None:
+            pkts = [('%s-PDU' % name, buf) for buf in pkts]
+    elif name == 'RRC3G':
+        pkts = _test_rrc3g_prep()[0]
+        if pkts is not None:
+            pkts = [('PCCH-Message', buf) for buf in pkts[0:3]] \
+                 + [('DL-DCCH-Message', buf) for buf in pkts[3:14]] \
+                 + [('UL-DCCH-Message', buf) for buf in pkts[14:]]
+    elif name == 'TAP3':
+        GLOBAL.clear()
+        load_module('TAP3')
+        ASN1.ASN1Obj.CODEC = BER
+        cdr = GLOBAL.TYPE['CallEventDetail']
+        pkts = []
+        for val in TAP3_CDRS:
+            cdr.encode(val)
+            pkts.append( ('CallEventDetail', str(cdr)) )
+    else:
+        pkts = {'RANAP': _test_ranap_prep, 'RRCLTE': _test_rrclte_prep,
+                'MAP': _test_map_prep, 'TCAP': _test_tcap_prep}[name]()
+    return pkts, ASN1.ASN1Obj.CODEC, PER.VARIANT
+
+def _asn1_msg_type(val):
+    # returns the message type of a PDU value: the CHOICE alternative 
+    # (or OPEN TYPE) selected at its root, or within its 'message' / 'value' 
+    # component, c1 / c2 alternatives being skipped
+    name = None
+    while True:
+        if isinstance(val, dict) and ('message' in val or 'value' in val):
+            val = val.get('message', val.get('value'))
+            name = None
+        elif isinstance(val, tuple) and len(val) == 2 \
+        and isinstance(val[0], str) and name in (None, 'c1', 'c2'):
+            name, val = val
+        else:
+            return name
+
+def asn1_codec_stats(mods=CODEC_MODS, num=RND_T15, path=None):
+    '''
+    reports the encoding and decoding throughput of each message type of 
+    the fixed corpus of each ASN.1 module (with both aligned and unaligned 
+    variants for PER), and the module's loading time, eager and lazy 
+    (each loading is run in a new process)
+    
+    returns a dict {module: {'load': {'eager': sec, 'lazy': sec},
+                             'types': {type: {variant: {'enc': msg/s, 
+                                                        'dec': msg/s,
+                                                        'len': bytes}}}}}
+    variant being 'A' or 'U' for PER and 'BER' for BER,
+    which is also written as JSON to path if given
+    '''
+    ret = {}
+    for name in mods:
+        pkts, codec, variant = _asn1_corpus(name)
+        if pkts is None:
+            print('unable to load %s ASN.1 module' % name)
+            continue
+        ret[name] = {'load': {}, 'types': {}}
+        #
+        # 1) loading time
+        for lazy in (False, True):
+            queue = Queue()
+            proc = Process(target=_load_module_stats,
+                           args=(name, pkts[0][0], lazy, queue))
+            proc.start()
+            ret[name]['load'][('eager', 'lazy')[lazy]] = queue.get()[0]
+            proc.join()
+        #
+        # 2) values and message types of the corpus
+        msgs = {}
+        for pdu_name, buf in pkts:
+            pdu = GLOBAL.TYPE[pdu_name]
+            pdu.decode(buf)
+            val = pdu()
+            typ = _asn1_msg_type(val)
+            if typ is None:
+                typ = pdu_name
+            else:
+                typ = '%s/%s' % (pdu_name, typ)
+            if typ not in msgs:
+                msgs[typ] = []
+            msgs[typ].append( (pdu, val) )
+        #
+        # 3) encoding and decoding throughput, for each variant
+        if codec == PER:
+            variants = ['A', 'U']
+        else:
+            variants = ['BER']
+        for typ in sorted(msgs):
+            ret[name]['types'][typ] = {}
+            for v in variants:
+                if codec == PER:
+                    PER.VARIANT = v
+                bufs = []
+                for pdu, val in msgs[typ]:
+                    pdu.encode(val)
+                    bufs.append( (pdu, val, str(pdu)) )
+                T0 = time.time()
+                for i in range(num):
+                    for pdu, val, buf in bufs:
+                        pdu.encode(val)
+                t_enc = time.time() - T0
+                T0 = time.time()
+                for i in range(num):
+                    for pdu, val, buf in bufs:
+                        pdu.decode(buf)
+                t_dec = time.time() - T0
+                cnt = num * len(bufs)
+                ret[name]['types'][typ][v] = {
+                    'enc': cnt / t_enc, 'dec': cnt / t_dec,
+                    'len': sum([len(b[2]) for b in bufs]) / len(bufs)}
+                print('%s %s (%s): encoding %.1f msg/s, decoding %.1f msg/s'\
+                      % (name, typ, v, cnt / t_enc, cnt / t_dec))
+            PER.VARIANT = variant
+        print('%s: load %.4f sec. (eager), %.4f sec. (lazy)'\
+              % (name, ret[name]['load']['eager'], ret[name]['load']['lazy']))
+    if path:
+        fd = open(path, 'w')
+        json.dump(ret, fd, indent=1, sort_keys=True)
+        fd.close()
+    return ret
+
 def t1():
     Int._endian = 'big'
     print('test 1: assigning Str() %i times' % RND_T1)
@@ -161,7 +745,72 @@ def t10():
     for i in range(RND_T10):
         _test_x2ap(pkts)
 
-TESTS = [t1, t2, t3, t4, t5, t6, t7, t8, t9, t10]
+def t11():
+    print('test 11: loading S1AP, X2AP and RRC3G modules eagerly and lazily')
+    load_module_stats()
+
+def t12():
+    print('test 12: compiling TCAP, TAP3, S1AP, RANAP, MAP and RRC3G modules')
+    compile_module_stats()
+
+def t13():
+    print('test 13: decoding %i TAP3 BER records sequentially and in '\
+          'parallel' % RND_T13)
+    tap3_decode_stats()
+
+def t14():
+    Int._endian = 'big'
+    print('test 14: loading MAP module and encoding / decoding MAP ASN.1 BER '\
+          'structures %i times' % RND_T14)
+    pkts = _test_map_prep()
+    if pkts is None:
+        print('unable to load MAP ASN.1 module')
+        return
+    for i in range(RND_T14):
+        _test_pdus(pkts)
+
+def t15():
+    print('test 15: encoding / decoding the corpus of each ASN.1 module %i '\
+          'times, for each message type and PER variant' % RND_T15)
+    asn1_codec_stats()
+
+def t16():
+    print('test 16: dissecting a pcap file of %i S1AP PDU sequentially and in '\
+          'parallel' % RND_T16)
+    pcap_pipeline_stats()
+
+def t17():
+    print('test 17: computing CRC of %i buffers with each CrcMoose algorithm, '\
+          'bitwise and table-driven' % RND_T17)
+    crc_stats()
+
+def t18():
+    print('test 18: updating the checksums of %i IPv4 / UDP packets, and '\
+          'computing them in a batch' % RND_T18)
+    inet_checksum_stats()
+
+def t19():
+    print('test 19: dissecting %i Ethernet / IPv4 / GTP-U packets, '\
+          'header-only and with the full Layers' % RND_T19)
+    dissect_stats()
+
+def t20():
+    print('test 20: reassembling %i messages fragmented over SCTP DATA '\
+          'chunks' % RND_T20)
+    sctp_reasm_stats()
+
+def t21():
+    print('test 21: getting DATA chunks of %i SCTP packets, with the chunk '\
+          'iterator and with SCTP().parse()' % RND_T21)
+    sctp_chunks_stats()
+
+def t22():
+    print('test 22: parsing %i segmented TLS streams, with TLSStream and with '\
+          'TLS().parse()' % RND_T22)
+    tls_stream_stats()
+
+TESTS = [t1, t2, t3, t4, t5, t6, t7, t8, t9, t10, t11, t12, t13, t14, t15, 
+         t16, t17, t18, t19, t20, t21, t22]
 #TESTS = [t3]
 
 def main(tests=TESTS):
@@ -3,8 +3,8 @@
 
 def main():
     print('[install] compiling ASN.1 modules... be patient')
-    from libmich.asn1.processor import generate_modules, MODULES
-    generate_modules(MODULES)
+    from libmich.asn1.processor import build_modules, MODULES
+    build_modules(MODULES)
     print('[install] compiling ASN.1 modules... done')
 
 if __name__ == '__main__':